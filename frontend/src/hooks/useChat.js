@@ -19,8 +19,23 @@ export const useChat = () => {
     socket.on('connect', () => setStatus('연결됨'));
     socket.on('disconnect', () => setStatus('연결 끊김'));
 
+    socket.on('assistantToken', (payload) => {
+      // 스트리밍 중인 답변에 토큰 이어붙이기
+      setMessages((prev) => {
+        const last = prev[prev.length - 1];
+        if (last?.streaming) {
+          return [...prev.slice(0, -1), { ...last, content: last.content + payload.content }];
+        }
+        return [...prev, { role: 'assistant', content: payload.content, timestamp: Date.now(), streaming: true }];
+      });
+    });
+
     socket.on('assistantMessage', (payload) => {
-      setMessages((prev) => [...prev, payload]);
+      // 스트리밍으로 표시하던 답변은 최종 메시지로 교체
+      setMessages((prev) => {
+        const last = prev[prev.length - 1];
+        return last?.streaming ? [...prev.slice(0, -1), payload] : [...prev, payload];
+      });
     });
 
     socket.on('conversationInit', (payload) => {
@@ -29,7 +44,7 @@ export const useChat = () => {
 
     socket.on('serverError', (payload) => {
       setMessages((prev) => [
-        ...prev,
+        ...prev.filter((message) => !message.streaming),
         { role: 'system', content: payload.message || '알 수 없는 오류가 발생했습니다.' }
       ]);
     });
@@ -0,0 +1,194 @@
+"""OpenAI 호환 로컬 스텁 서버 (LLM 클라이언트의 연결 풀 / 재시도 / 헤징 / 병합 확인용)
+
+POST /v1/chat/completions 를 일반 응답과 스트리밍(SSE) 모두 지원하며, 지연 시간과 오류를 흉내 냅니다.
+GET /stats 는 지금까지 받은 요청 수 / 동시 요청 최댓값 / 주입한 오류 수를 돌려줍니다.
+
+    python -m benchmarks.openai_stub --port 8099 --latency-ms 300 --error-rate 0.1 --tail-rate 0.05 --tail-ms 3000
+    OPENAI_BASE_URL=http://127.0.0.1:8099/v1 python main.py
+    python -m benchmarks.run_benchmark --llm-base-url http://127.0.0.1:8099/v1
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+from benchmarks.stubs import STUB_ANSWER
+
+
+class StubState:
+    """요청 통계 (여러 요청 스레드에서 갱신)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.errors = 0
+        self.connections = 0
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "errors": self.errors,
+                "connections": self.connections,
+            }
+
+
+def _split_tokens(text: str, size: int = 4) -> List[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive (클라이언트 연결 재사용 확인)
+
+    def setup(self):
+        super().setup()
+        with self.server.state.lock:
+            self.server.state.connections += 1
+
+    def log_message(self, format, *args):
+        if self.server.options.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, payload: Dict):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            self._send_json(200, self.server.state.snapshot())
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.path.rstrip("/") not in ("/v1/chat/completions", "/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        state, options = self.server.state, self.server.options
+        with state.lock:
+            state.requests += 1
+            state.in_flight += 1
+            state.max_in_flight = max(state.max_in_flight, state.in_flight)
+        try:
+            self._complete(request, options, state)
+        except (BrokenPipeError, ConnectionResetError):
+            # 클라이언트가 먼저 끊은 요청 (헤징에서 진 쪽 / 취소된 스트림)
+            self.close_connection = True
+        finally:
+            with state.lock:
+                state.in_flight -= 1
+
+    def _complete(self, request: Dict, options: argparse.Namespace, state: StubState):
+        # 오류 주입 (클라이언트 재시도 확인)
+        roll = random.random()
+        if roll < options.error_rate + options.rate_limit_rate:
+            with state.lock:
+                state.errors += 1
+            status = 429 if roll < options.rate_limit_rate else 500
+            self._send_json(status, {"error": {"message": "injected error", "type": "stub_error"}})
+            return
+
+        # 첫 응답까지 지연 (tail_rate 비율로 긴 지연 → 헤징 확인)
+        delay_ms = options.tail_ms if random.random() < options.tail_rate else options.latency_ms
+        time.sleep(delay_ms / 1000)
+
+        model = request.get("model", "stub")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        prompt_tokens = sum(len(str(message.get("content", ""))) for message in request.get("messages", [])) // 2
+        tokens = _split_tokens(options.answer)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                 "total_tokens": prompt_tokens + len(tokens)}
+
+        if not request.get("stream"):
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": options.answer},
+                             "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(choices: list, extra: Dict = None):
+            payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                       "model": model, "choices": choices}
+            payload.update(extra or {})
+            self._write_chunk(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+        event([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+        for token in tokens:
+            if options.token_delay_ms > 0:
+                time.sleep(options.token_delay_ms / 1000)
+            event([{"index": 0, "delta": {"content": token}, "finish_reason": None}])
+        event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if (request.get("stream_options") or {}).get("include_usage"):
+            event([], {"usage": usage})
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="OpenAI 호환 로컬 스텁 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="첫 응답(스트리밍은 첫 토큰)까지 지연 시간")
+    parser.add_argument("--token-delay-ms", type=float, default=5.0, help="스트리밍 토큰 사이 지연 시간")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="긴 지연(--tail-ms)으로 응답할 비율")
+    parser.add_argument("--tail-ms", type=float, default=3000.0, help="긴 지연 시간")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="500 오류로 응답할 비율")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="429 오류로 응답할 비율")
+    parser.add_argument("--answer", default=STUB_ANSWER, help="응답 본문")
+    parser.add_argument("--verbose", action="store_true", help="요청 로그 출력")
+    return parser.parse_args(argv)
+
+
+def create_server(options: argparse.Namespace) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((options.host, options.port), StubHandler)
+    server.daemon_threads = True
+    server.options = options
+    server.state = StubState()
+    return server
+
+
+def main(argv: List[str] = None):
+    options = parse_args(argv)
+    server = create_server(options)
+    print(f"[스텁] OpenAI 호환 서버 실행 중: http://{options.host}:{server.server_port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"[스텁] 종료 {json.dumps(server.state.snapshot())}")
+
+
+if __name__ == "__main__":
+    main()
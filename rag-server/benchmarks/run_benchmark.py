@@ -0,0 +1,360 @@
+"""검색 품질 / 질의 지연 시간 / 수집 처리량 벤치마크 (네트워크 없이 재현 가능)
+
+픽스처 코퍼스(benchmarks/fixtures/corpus)를 임시 DB에 수집하고 LLM은 고정 응답 스텁으로 대체하여
+다음을 측정합니다. 결과는 JSON으로 저장하므로 검색/캐시 변경 전후를 같은 조건에서 비교할 수 있습니다.
+- 수집 처리량 (chunks/sec)
+- 동시성 수준별 지연 시간 p50/p95/p99 (retrieve: 검색만, query: 검색 + 프롬프트 구성 + 스텁 LLM)
+- 라벨링된 질문 세트(benchmarks/fixtures/questions.json) 기준 recall@k, MRR
+
+    python -m benchmarks.run_benchmark
+    python -m benchmarks.run_benchmark --concurrency 1,8,32 --requests 200 --llm-latency-ms 300
+    python -m benchmarks.run_benchmark --embedder model --output after.json --baseline before.json
+    python -m benchmarks.run_benchmark --llm-base-url http://127.0.0.1:8099/v1   # benchmarks/openai_stub.py
+
+기본 임베더(hash)는 모델 다운로드 없이 동작하는 문자 n-gram 해싱이며, --embedder model은
+EMBEDDING_MODEL(로컬 캐시 필요)로 실제 검색 품질을 측정합니다. 캐시는 기본적으로 끄고 측정합니다.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+DEFAULT_CORPUS = BENCHMARK_DIR / "fixtures" / "corpus"
+DEFAULT_QUESTIONS = BENCHMARK_DIR / "fixtures" / "questions.json"
+DEFAULT_RESULTS_DIR = BENCHMARK_DIR / "results"
+
+# --scale로 복제한 파일 이름 접미사 (정답 판정 시 원본 파일명으로 되돌림)
+COPY_SUFFIX = "__copy"
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="RAG 검색/지연 시간/수집 벤치마크")
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS), help="수집할 문서 디렉토리")
+    parser.add_argument("--questions", default=str(DEFAULT_QUESTIONS), help="라벨링된 질문 세트 (JSON)")
+    parser.add_argument("--embedder", choices=["hash", "model"], default="hash",
+                        help="hash: 해싱 임베딩 (네트워크 불필요), model: EMBEDDING_MODEL")
+    parser.add_argument("--scale", type=int, default=1, help="수집 처리량 측정용 코퍼스 복제 배수")
+    parser.add_argument("--concurrency", default="1,4,16", help="동시 요청 수 목록 (쉼표 구분)")
+    parser.add_argument("--requests", type=int, default=100, help="동시성 수준별 요청 수")
+    parser.add_argument("--modes", default="retrieve,query", help="지연 시간 측정 대상 (retrieve, query, batch)")
+    parser.add_argument("--k", default="1,3,5,10", help="recall@k를 계산할 k 목록")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="스텁 LLM 응답 지연 시간")
+    parser.add_argument("--llm-base-url", help="OpenAI 호환 서버 주소 (지정 시 스텁 대신 실제 LLM 클라이언트로 호출)")
+    parser.add_argument("--vector-backend", choices=["chroma", "numpy"], default="chroma", help="벡터 저장소 백엔드")
+    parser.add_argument("--with-cache", action="store_true", help="질의 임베딩/검색/답변 캐시를 켠 상태로 측정")
+    parser.add_argument("--output", help="결과 JSON 경로 (기본: benchmarks/results/<시각>.json)")
+    parser.add_argument("--baseline", help="비교할 이전 결과 JSON")
+    parser.add_argument("--keep-db", action="store_true", help="임시 DB 디렉토리를 지우지 않음")
+    return parser.parse_args(argv)
+
+
+def configure_environment(db_dir: Path, with_cache: bool, vector_backend: str = "chroma", llm_base_url: str = None):
+    """src.config import 전에 임시 DB 경로 / 캐시 설정 지정 (Config는 import 시점에 환경 변수를 읽음)"""
+    os.environ["CHROMA_DB_PATH"] = str(db_dir)
+    os.environ["INGEST_MANIFEST_PATH"] = str(db_dir / "ingest_manifest.json")
+    os.environ["KEYWORD_INDEX_PATH"] = str(db_dir / "keyword_index.json")
+    os.environ["VECTOR_BACKEND"] = vector_backend
+    os.environ["NUMPY_INDEX_DIR"] = str(db_dir / "numpy_index")
+    os.environ["QUERY_CACHE_DIR"] = ""
+    if not with_cache:
+        os.environ["QUERY_CACHE_SIZE"] = "0"
+        os.environ["ANSWER_CACHE_SIZE"] = "0"
+    if llm_base_url:
+        os.environ["OPENAI_BASE_URL"] = llm_base_url
+    # 스텁 LLM / 로컬 스텁 서버를 사용하므로 키는 검증만 통과하면 됨
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+
+def prepare_corpus(source: Path, target: Path, scale: int) -> int:
+    """코퍼스를 임시 디렉토리로 복사 (scale > 1이면 내용이 다른 사본을 추가해 해시 중복 방지)"""
+    count = 0
+    for path in sorted(source.rglob("*.txt")):
+        relative = path.relative_to(source)
+        text = path.read_text(encoding="utf-8")
+        for copy in range(scale):
+            name = relative.name if copy == 0 else f"{relative.stem}{COPY_SUFFIX}{copy}{relative.suffix}"
+            destination = target / relative.parent / name
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            destination.write_text(text if copy == 0 else f"[사본 {copy}]\n{text}", encoding="utf-8")
+            count += 1
+    return count
+
+
+def percentiles(samples_ms: List[float]) -> Dict:
+    """지연 시간 표본의 p50/p95/p99 (선형 보간)"""
+    ordered = sorted(samples_ms)
+
+    def at(p: float) -> float:
+        if not ordered:
+            return 0.0
+        position = (len(ordered) - 1) * p
+        lower = int(position)
+        upper = min(lower + 1, len(ordered) - 1)
+        return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered), 2) if ordered else 0.0,
+        "p50_ms": round(at(0.50), 2),
+        "p95_ms": round(at(0.95), 2),
+        "p99_ms": round(at(0.99), 2),
+        "max_ms": round(ordered[-1], 2) if ordered else 0.0,
+    }
+
+
+def _original_name(source_file: str) -> str:
+    stem, dot, suffix = source_file.rpartition(".")
+    return f"{stem.split(COPY_SUFFIX)[0]}{dot}{suffix}"
+
+
+def is_relevant(doc, label: Dict) -> bool:
+    """정답 청크 판정: 라벨의 파일(사본 포함)에서 나온 청크이고 정답 문구를 포함"""
+    return (_original_name(doc.metadata.get("source_file", "")) == label["source_file"]
+            and label["answer_contains"] in doc.page_content)
+
+
+def evaluate_retrieval(rag_service, questions: List[Dict], ks: List[int]) -> Dict:
+    """recall@k / MRR 계산 (질문마다 정답 청크의 첫 순위 기준)"""
+    max_k = max(ks)
+    hits = {k: 0 for k in ks}
+    reciprocal_ranks = []
+    misses = []
+    for label in questions:
+        docs = rag_service.retrieve(label["question"], k=max_k)
+        rank = next((i for i, doc in enumerate(docs, 1) if is_relevant(doc, label)), None)
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+        for k in ks:
+            if rank and rank <= k:
+                hits[k] += 1
+        if rank is None:
+            misses.append(label["question"])
+
+    total = len(questions)
+    result = {"questions": total, "mrr": round(sum(reciprocal_ranks) / total, 4) if total else 0.0}
+    result.update({f"recall@{k}": round(hits[k] / total, 4) if total else 0.0 for k in ks})
+    result["misses"] = misses
+    return result
+
+
+async def measure_latency(rag_service, mode: str, questions: List[str], concurrency: int, total: int) -> Dict:
+    """동시 요청 concurrency개로 total개 요청을 보내며 요청별 지연 시간 측정"""
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(questions[i % len(questions)])
+    samples: List[float] = []
+
+    async def worker():
+        while True:
+            try:
+                question = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            if mode == "retrieve":
+                await rag_service.aretrieve(question)
+            else:
+                await rag_service.aquery(question)
+            samples.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {**percentiles(samples), "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0}
+
+
+async def measure_batch(rag_service, questions: List[str], total: int) -> Dict:
+    """질문 total개를 aquery_batch 한 번으로 보내며 질문별 결과 도착 시간 측정"""
+    batch = [questions[i % len(questions)] for i in range(total)]
+    samples: List[float] = []
+    started = time.perf_counter()
+    async for event in rag_service.aquery_batch(batch):
+        if event["type"] != "done":
+            samples.append((time.perf_counter() - started) * 1000)
+    elapsed = time.perf_counter() - started
+    return {**percentiles(samples), "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0}
+
+
+async def measure_all(rag_service, modes: List[str], questions: List[str], levels: List[int], total: int) -> Dict:
+    """측정 대상 × 동시성 수준별 지연 시간"""
+    latency: Dict[str, Dict] = {}
+    for mode in modes:
+        latency[mode] = {}
+        if mode == "batch":
+            # 동시성 수준 대신 배치 크기(total) 하나로 측정
+            print(f"[지연] batch {total}개 질문 측정 중...")
+            latency[mode][str(total)] = await measure_batch(rag_service, questions, total)
+            continue
+        # 첫 요청의 초기화 비용 제외
+        await measure_latency(rag_service, mode, questions, 1, 1)
+        for level in levels:
+            print(f"[지연] {mode} 동시 {level}개 × {total}건 측정 중...")
+            latency[mode][str(level)] = await measure_latency(rag_service, mode, questions, level, total)
+    return latency
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=BENCHMARK_DIR
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+def run(args: argparse.Namespace) -> Dict:
+    """임시 DB에 수집 → 검색 품질 → 동시성별 지연 시간 측정"""
+    work_dir = Path(tempfile.mkdtemp(prefix="rag-benchmark-"))
+    configure_environment(work_dir / "chroma_db", args.with_cache, args.vector_backend, args.llm_base_url)
+
+    # 환경 변수 지정 후 import
+    from src.config import Config
+    from src.document_loader import DocumentProcessor
+    from src.embeddings import EmbeddingService
+    from src.ingest import run_ingestion
+    from src.llm_client import LLMClient
+    from src.rag_service import RAGService
+    from src.telemetry import metrics, setup_logging
+    from src.vector_store import VectorStoreManager
+    from benchmarks.stubs import HashEmbeddingService, StubChatModel
+
+    setup_logging(level=os.getenv("LOG_LEVEL", "WARNING"))
+    ks = sorted(int(k) for k in args.k.split(","))
+    levels = [int(c) for c in args.concurrency.split(",")]
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    questions = json.loads(Path(args.questions).read_text(encoding="utf-8"))
+
+    try:
+        corpus_dir = work_dir / "corpus"
+        file_count = prepare_corpus(Path(args.corpus), corpus_dir, args.scale)
+        embedding_service = HashEmbeddingService() if args.embedder == "hash" else EmbeddingService()
+        vector_store = VectorStoreManager(embedding_service)
+
+        print(f"[수집] {file_count}개 파일 수집 중...")
+        started = time.perf_counter()
+        ingest_result = run_ingestion(str(corpus_dir), processor=DocumentProcessor(), vector_store=vector_store)
+        ingest_seconds = time.perf_counter() - started
+
+        rag_service = RAGService(vector_store)
+        if not args.llm_base_url:
+            rag_service.llm = LLMClient(StubChatModel(latency_ms=args.llm_latency_ms))
+
+        print(f"[품질] 질문 {len(questions)}개로 recall@k / MRR 계산 중...")
+        quality = evaluate_retrieval(rag_service, questions, ks)
+
+        texts = [label["question"] for label in questions]
+        # RAGService의 세마포어는 처음 사용한 이벤트 루프에 묶이므로 한 루프에서 모두 측정
+        latency = asyncio.run(measure_all(rag_service, modes, texts, levels, args.requests))
+        rag_service.close()
+
+        return {
+            "meta": {
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "git_commit": _git_commit(),
+                "python": platform.python_version(),
+                "embedder": args.embedder,
+                "embedding_model": Config.EMBEDDING_MODEL if args.embedder == "model" else "hash-ngram-384",
+                "llm_latency_ms": args.llm_latency_ms,
+                "llm_base_url": args.llm_base_url,
+                "with_cache": args.with_cache,
+                "vector_backend": args.vector_backend,
+                "config": {
+                    "CHUNK_SIZE": Config.CHUNK_SIZE,
+                    "CHUNK_OVERLAP": Config.CHUNK_OVERLAP,
+                    "EMBED_BATCH_SIZE": Config.EMBED_BATCH_SIZE,
+                    "TOP_K_RESULTS": Config.TOP_K_RESULTS,
+                    "HYBRID_CANDIDATES": Config.HYBRID_CANDIDATES,
+                    "RERANKER_ENABLED": Config.RERANKER_ENABLED,
+                    "RAG_WORKER_THREADS": Config.RAG_WORKER_THREADS,
+                    "MAX_CONCURRENT_QUERIES": Config.MAX_CONCURRENT_QUERIES,
+                    "LLM_COALESCE": Config.LLM_COALESCE,
+                    "LLM_HEDGE_AFTER_MS": Config.LLM_HEDGE_AFTER_MS,
+                },
+            },
+            "ingest": {
+                "files": file_count,
+                "chunks": ingest_result["added_chunks"],
+                "seconds": round(ingest_seconds, 3),
+                "chunks_per_sec": round(ingest_result["added_chunks"] / ingest_seconds, 1) if ingest_seconds else 0.0,
+            },
+            "quality": quality,
+            "latency": latency,
+            "stages": metrics.snapshot()["stages"],
+        }
+    finally:
+        if args.keep_db:
+            print(f"[안내] 임시 DB: {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _flatten(result: Dict) -> Dict[str, float]:
+    """비교 대상 지표만 평탄화 (이름 → 값)"""
+    values = {"ingest.chunks_per_sec": result["ingest"]["chunks_per_sec"], "quality.mrr": result["quality"]["mrr"]}
+    values.update({f"quality.{key}": value for key, value in result["quality"].items() if key.startswith("recall@")})
+    for mode, levels in result["latency"].items():
+        for level, stats in levels.items():
+            for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+                values[f"latency.{mode}.c{level}.{key}"] = stats[key]
+    return values
+
+
+def compare(result: Dict, baseline: Dict) -> List[Dict]:
+    """이전 결과 대비 변화량 (양쪽에 모두 있는 지표만)"""
+    current, previous = _flatten(result), _flatten(baseline)
+    rows = []
+    for name, value in current.items():
+        if name not in previous:
+            continue
+        before = previous[name]
+        rows.append({
+            "metric": name,
+            "baseline": before,
+            "current": value,
+            "change_pct": round((value - before) / before * 100, 1) if before else None,
+        })
+    return rows
+
+
+def print_summary(result: Dict):
+    ingest, quality = result["ingest"], result["quality"]
+    print("=" * 80)
+    print(f"수집: {ingest['files']}개 파일, {ingest['chunks']}개 청크, {ingest['seconds']}초 ({ingest['chunks_per_sec']} chunks/sec)")
+    recalls = ", ".join(f"{key} {value}" for key, value in quality.items() if key.startswith("recall@"))
+    print(f"품질: {recalls}, MRR {quality['mrr']} (미검색 {len(quality['misses'])}/{quality['questions']})")
+    for mode, levels in result["latency"].items():
+        for level, stats in levels.items():
+            print(f"지연 [{mode}] 동시 {level}: p50 {stats['p50_ms']}ms, p95 {stats['p95_ms']}ms, "
+                  f"p99 {stats['p99_ms']}ms, {stats['throughput_rps']} req/s")
+    print("=" * 80)
+
+
+def main(argv: List[str] = None):
+    args = parse_args(argv)
+    result = run(args)
+
+    if args.baseline:
+        result["comparison"] = compare(result, json.loads(Path(args.baseline).read_text(encoding="utf-8")))
+
+    output = Path(args.output) if args.output else DEFAULT_RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    print_summary(result)
+    for row in result.get("comparison", []):
+        change = f"{row['change_pct']:+.1f}%" if row["change_pct"] is not None else "-"
+        print(f"{row['metric']:<40} {row['baseline']:>10} → {row['current']:>10} ({change})")
+    print(f"[저장] 결과: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""벤치마크용 네트워크 없는 대체 구현 (해시 임베딩 / 고정 응답 LLM)"""
+
+import asyncio
+import math
+import time
+import zlib
+from typing import Any, List, Optional
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from src.embeddings import EmbeddingService
+
+STUB_ANSWER = "제공된 문서에 따르면 관련 규정은 다음과 같습니다. (벤치마크용 고정 응답)"
+
+
+class HashEmbeddings(Embeddings):
+    """문자 n-gram 해싱 임베딩 (모델 다운로드 없이 결정적인 벡터)
+
+    의미 검색 품질은 실제 모델보다 낮지만, 같은 입력에는 항상 같은 벡터를 내므로
+    검색 파이프라인(저장/검색/RRF/캐시)의 지연 시간과 변경 전후 비교에 사용합니다.
+    """
+
+    def __init__(self, dim: int = 384, ngram_sizes: tuple = (1, 2, 3)):
+        self.dim = dim
+        self.ngram_sizes = ngram_sizes
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dim
+        text = " ".join(text.split())
+        for n in self.ngram_sizes:
+            for i in range(len(text) - n + 1):
+                # hash()는 프로세스마다 달라지므로 crc32 사용 (상위 비트로 부호 결정)
+                h = zlib.crc32(text[i:i + n].encode("utf-8"))
+                vector[h % self.dim] += 1.0 if h >> 31 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class HashEmbeddingService(EmbeddingService):
+    """HashEmbeddings를 사용하는 EmbeddingService (모델 로딩 생략)"""
+
+    def __init__(self, dim: int = 384):
+        self.model_name = f"hash-ngram-{dim}"
+        self.embeddings = HashEmbeddings(dim)
+
+
+class StubChatModel(BaseChatModel):
+    """고정 응답을 돌려주는 LLM (latency_ms만큼 대기하여 API 지연 시간 모사)"""
+
+    answer: str = STUB_ANSWER
+    latency_ms: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "benchmark-stub"
+
+    def _result(self) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.answer))])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000)
+        return self._result()
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.latency_ms > 0:
+            await asyncio.sleep(self.latency_ms / 1000)
+        return self._result()
@@ -1,13 +1,30 @@
-from fastapi import FastAPI, HTTPException
+import time
+_import_started = time.perf_counter()
+
+from fastapi import BackgroundTasks, FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, TYPE_CHECKING
+import asyncio
+import json
+import logging
+import threading
+from pathlib import Path
 import uvicorn
 
 from src.config import Config
-from src.rag_service import RAGService
-from src.document_loader import DocumentProcessor
-from src.vector_store import VectorStoreManager
+from src.telemetry import metrics, setup_logging
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# langchain/chromadb/torch 등 무거운 모듈은 백그라운드 워밍업에서 import
+if TYPE_CHECKING:
+    from src.rag_service import RAGService
+    from src.services import ServiceContainer
+    from src.sessions import ConversationSession
+    from src.tenants import TenantServices
 
 # FastAPI 앱 초기화
 app = FastAPI(
@@ -25,26 +42,71 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 전역 서비스 인스턴스
-rag_service: Optional[RAGService] = None
+@app.middleware("http")
+async def track_requests(request: Request, call_next):
+    """요청 수 / 처리 중 요청 수 / 응답 시간 집계 (엔드포인트는 경로 템플릿 기준)"""
+    metrics.add_gauge("rag_http_requests_in_flight", 1)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.add_gauge("rag_http_requests_in_flight", -1)
+        route = request.scope.get("route")
+        endpoint = getattr(route, "path", "unmatched")
+        metrics.inc("rag_http_requests_total", endpoint=endpoint, method=request.method, status=status)
+        metrics.observe("rag_http_request_duration_seconds", (time.perf_counter() - started) * 1000, endpoint=endpoint)
+
+# 전역 서비스 인스턴스 (질의와 수집이 같은 임베딩 모델 / 벡터 스토어를 공유)
+services: Optional["ServiceContainer"] = None
+rag_service: Optional["RAGService"] = None
+
+# 시작 상태 (liveness와 readiness 분리)
+startup_state = {
+    "phase": "starting",  # starting → loading → ready | failed
+    "error": None,
+    "timings_ms": {}
+}
 
 # Request/Response 모델
 class Message(BaseModel):
     role: str
     content: str
 
+class QueryFilters(BaseModel):
+    """검색 범위 (같은 항목의 값들은 OR, 항목끼리는 AND)"""
+    source_files: Optional[List[str]] = None  # 파일명 (예: "취업규칙.docx")
+    file_types: Optional[List[str]] = None  # 확장자 (예: "pdf", ".docx")
+    departments: Optional[List[str]] = None  # 수집 디렉토리의 최상위 하위 폴더명
+    path_prefix: Optional[str] = None  # 수집 디렉토리 기준 상대 경로 접두사 (예: "인사/규정")
+
 class QueryRequest(BaseModel):
     question: str
-    history: Optional[List[Message]] = []
+    history: Optional[List[Message]] = []  # session_id가 있으면 새 세션을 채울 때만 사용
+    session_id: Optional[str] = None  # 서버 측 대화 세션 ID (지정 시 이전 대화는 서버에 저장된 세션 사용)
     top_k: Optional[int] = None
+    filters: Optional[QueryFilters] = None
+    tenant: Optional[str] = None  # 테넌트 ID (없으면 X-Tenant-ID 헤더, 둘 다 없으면 기본 테넌트)
+    include_timings: bool = False  # 응답에 단계별 소요 시간 포함
+
+class BatchQueryRequest(BaseModel):
+    questions: List[str]
+    filters: Optional[QueryFilters] = None
+    tenant: Optional[str] = None
 
 class QueryResponse(BaseModel):
     answer: str
     sources: List[Dict]
+    request_id: Optional[str] = None
+    session_id: Optional[str] = None
+    timings: Optional[Dict[str, Optional[float]]] = None
 
 class IngestRequest(BaseModel):
     directory: str = "./documents"
     clear_existing: bool = False
+    tenant: Optional[str] = None
 
 class StatusResponse(BaseModel):
     status: str
@@ -52,18 +114,115 @@ class StatusResponse(BaseModel):
     embedding_model: str
     llm_model: str
 
-@app.on_event("startup")
-async def startup_event():
-    """서버 시작 시 RAG 서비스 초기화"""
-    global rag_service
+def _search_filter(request: BaseModel):
+    """요청의 filters → SearchFilter (조건이 없으면 None)"""
+    if request.filters is None:
+        return None
+    from src.search_filter import SearchFilter
+    return SearchFilter.create(**request.filters.model_dump())
+
+MAX_SESSION_ID_LENGTH = 128
+
+def _conversation(request: QueryRequest, tenant_id: str) -> tuple:
+    """요청의 대화 히스토리 → (세션, 히스토리). session_id가 없으면 요청에 담긴 history를 그대로 사용"""
+    history_list = [msg.model_dump() for msg in request.history] if request.history else []
+    if not request.session_id:
+        return None, history_list
+    if len(request.session_id) > MAX_SESSION_ID_LENGTH:
+        raise HTTPException(status_code=400, detail=f"session_id는 {MAX_SESSION_ID_LENGTH}자 이내여야 합니다.")
+    # 클라이언트가 보낸 history의 마지막 메시지가 현재 질문이면 세션 시드에서 제외
+    if history_list and history_list[-1]['role'] == 'user' and history_list[-1]['content'] == request.question:
+        history_list = history_list[:-1]
+    session = services.sessions.open(tenant_id, request.session_id, seed=history_list)
+    return session, session.history(request.question)
+
+def _record_turn(session: Optional["ConversationSession"], question: str, answer: str) -> bool:
+    """세션에 질문/답변 추가 → 이전 대화 요약이 필요하면 True"""
+    if session is None:
+        return False
+    return services.sessions.append_turn(session, question, answer)
+
+async def _tenant_services(tenant_id: Optional[str]) -> "TenantServices":
+    """테넌트 서비스 조회 (처음 요청된 테넌트는 모델/DB 로딩을 스레드에서 수행, 미등록이면 404)"""
+    from src.tenants import UnknownTenantError
+    try:
+        tenant = services.tenants.get_loaded(tenant_id)
+        if tenant is None:
+            tenant = await asyncio.to_thread(services.tenants.get, tenant_id)
+        return tenant
+    except UnknownTenantError:
+        raise HTTPException(status_code=404, detail=f"등록되지 않은 테넌트입니다: {tenant_id}")
+
+def _warm_up():
+    """백그라운드 워밍업: 무거운 모듈 import, 임베딩 모델/ChromaDB 로딩, 첫 추론 (단계별 시간 기록)"""
+    global services, rag_service
+    timings = startup_state["timings_ms"]
+
+    def stage(name: str, started: float):
+        timings[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    startup_state["phase"] = "loading"
     try:
-        Config.validate()
-        print("\n[시작] RAG 서버 시작 중...")
-        rag_service = RAGService()
-        print("[완료] RAG 서비스 초기화 완료\n")
+        started = time.perf_counter()
+        from src.embeddings import EmbeddingService
+        from src.vector_store import VectorStoreManager
+        from src.rag_service import RAGService
+        from src.services import ServiceContainer
+        stage("imports", started)
+
+        started = time.perf_counter()
+        embedding_service = EmbeddingService()
+        stage("embedding_model", started)
+
+        started = time.perf_counter()
+        vector_store = VectorStoreManager(embedding_service)
+        stage("vector_store", started)
+
+        started = time.perf_counter()
+        service = RAGService(vector_store)
+        stage("rag_service", started)
+
+        # 첫 추론은 커널 초기화로 느리므로 트래픽 전에 한 번 실행
+        started = time.perf_counter()
+        embedding_service.get_embeddings().embed_query("연차 휴가 워밍업")
+        stage("warmup_query", started)
+
+        services = ServiceContainer(embedding_service, vector_store, service)
+        rag_service = service
+        startup_state["phase"] = "ready"
+        timings["total"] = round((time.perf_counter() - _import_started) * 1000, 1)
+        breakdown = ", ".join(f"{name}={ms:.0f}ms" for name, ms in timings.items())
+        logger.info(f"[완료] RAG 서비스 준비 완료 ({breakdown})")
     except Exception as e:
-        print(f"[오류] 초기화 실패: {e}")
-        raise
+        startup_state["phase"] = "failed"
+        startup_state["error"] = f"{type(e).__name__}: {e}"
+        logger.exception(f"[오류] 초기화 실패: {e}")
+
+@app.on_event("startup")
+async def startup_event():
+    """서버 시작: 포트는 바로 열고 RAG 서비스는 백그라운드에서 초기화"""
+    Config.validate()
+    startup_state["timings_ms"]["server_boot"] = round((time.perf_counter() - _import_started) * 1000, 1)
+    logger.info("[시작] RAG 서버 시작 중... (모델/DB는 백그라운드에서 로딩)")
+    threading.Thread(target=_warm_up, name="rag-warmup", daemon=True).start()
+
+@app.get("/health")
+async def health():
+    """liveness: 프로세스가 응답 가능한지 (모델 로딩 여부와 무관)"""
+    return {"status": "alive", "phase": startup_state["phase"]}
+
+@app.get("/ready")
+async def ready():
+    """readiness: 질의를 처리할 준비가 되었는지 (준비 전에는 503)"""
+    if startup_state["phase"] != "ready":
+        raise HTTPException(status_code=503, detail=startup_state)
+    return {"status": "ready", "timings_ms": startup_state["timings_ms"]}
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """서버 종료 시 수집 작업 취소 및 스레드 풀 정리"""
+    if services:
+        services.close()
 
 @app.get("/", response_model=StatusResponse)
 async def root():
@@ -80,65 +239,219 @@ async def root():
     }
 
 @app.post("/query", response_model=QueryResponse)
-async def query(request: QueryRequest):
-    """RAG 질의 처리"""
+async def query(
+    request: QueryRequest,
+    background_tasks: BackgroundTasks,
+    x_request_id: Optional[str] = Header(None),
+    x_tenant_id: Optional[str] = Header(None)
+):
+    """RAG 질의 처리 (X-Request-ID 헤더가 있으면 해당 ID로 로그/타이밍 기록, 테넌트별 컬렉션에서 검색)
+    
+    session_id를 보내면 이전 대화는 서버에 저장된 세션에서 가져오고, 답변 후 세션에 이번 턴을 추가합니다.
+    """
     if not rag_service:
         raise HTTPException(status_code=503, detail="RAG 서비스가 초기화되지 않았습니다.")
     
     if not request.question.strip():
         raise HTTPException(status_code=400, detail="질문이 비어있습니다.")
     
+    tenant = await _tenant_services(request.tenant or x_tenant_id)
+    session, history_list = _conversation(request, tenant.config.tenant_id)
     try:
-        # history를 dict 리스트로 변환
-        history_list = [msg.model_dump() for msg in request.history] if request.history else []
-        result = rag_service.query(request.question, history=history_list)
+        result = await tenant.rag_service.aquery(
+            request.question,
+            history=history_list,
+            request_id=x_request_id,
+            search_filter=_search_filter(request)
+        )
+        if not request.include_timings:
+            result.pop("timings", None)
+        if _record_turn(session, request.question, result["answer"]):
+            # 윈도우에서 밀려난 대화 요약은 응답을 보낸 뒤 실행
+            background_tasks.add_task(services.sessions.compact, session)
+        if session is not None:
+            result["session_id"] = session.session_id
         return result
     except Exception as e:
-        print(f"\n[오류] RAG 처리 중 예외 발생:")
-        print(f"   질문: {request.question}")
-        print(f"   히스토리: {len(request.history) if request.history else 0}개")
-        print(f"   오류 타입: {type(e).__name__}")
-        print(f"   오류 메시지: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"[오류] RAG 처리 중 예외 발생 (히스토리: {len(history_list)}개, "
+                         f"{type(e).__name__}: {e})")
         raise HTTPException(status_code=500, detail=f"RAG 처리 중 오류: {str(e)}")
 
-@app.post("/ingest")
-async def ingest_documents(request: IngestRequest):
-    """문서 수집 및 벡터 DB 저장"""
-    try:
-        processor = DocumentProcessor()
-        vector_store = VectorStoreManager()
-        
-        if request.clear_existing:
-            vector_store.clear_database()
-        
-        documents = processor.load_directory(request.directory)
-        if not documents:
-            raise HTTPException(
-                status_code=404, 
-                detail=f"{request.directory}에서 문서를 찾을 수 없습니다."
-            )
-        
-        chunks = processor.split_documents(documents)
-        vector_store.add_documents(chunks)
-        
-        stats = vector_store.get_stats()
-        return {
-            "status": "success",
-            "message": f"{len(chunks)}개 청크를 벡터 DB에 저장했습니다.",
-            "total_documents": stats.get("total_documents", 0)
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"문서 수집 실패: {str(e)}")
+@app.post("/query/stream")
+async def query_stream(
+    request: QueryRequest,
+    x_request_id: Optional[str] = Header(None),
+    x_tenant_id: Optional[str] = Header(None)
+):
+    """RAG 스트리밍 질의 (NDJSON: sources → token... → done)"""
+    if not rag_service:
+        raise HTTPException(status_code=503, detail="RAG 서비스가 초기화되지 않았습니다.")
+    
+    if not request.question.strip():
+        raise HTTPException(status_code=400, detail="질문이 비어있습니다.")
+    
+    tenant = await _tenant_services(request.tenant or x_tenant_id)
+    session, history_list = _conversation(request, tenant.config.tenant_id)
+    search_filter = _search_filter(request)
+    
+    async def event_stream():
+        answer_parts = []
+        try:
+            async for event in tenant.rag_service.astream_query(
+                request.question, history=history_list, request_id=x_request_id, search_filter=search_filter
+            ):
+                if event["type"] == "token":
+                    answer_parts.append(event["content"])
+                elif event["type"] == "done" and session is not None:
+                    event["session_id"] = session.session_id
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+            # 끝까지 전달된 답변만 세션에 추가 (빈 답변 제외, 요약은 완료 프레임을 보낸 뒤 실행)
+            answer = "".join(answer_parts)
+            if answer.strip() and _record_turn(session, request.question, answer):
+                await asyncio.to_thread(services.sessions.compact, session)
+        except Exception as e:
+            # 스트림이 이미 시작되었으므로 상태 코드 대신 오류 프레임 전달
+            logger.exception(f"[오류] RAG 스트리밍 중 예외 발생: {type(e).__name__}: {e}")
+            yield json.dumps({"type": "error", "message": f"RAG 처리 중 오류: {str(e)}"}, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/query/batch")
+async def query_batch(
+    request: BatchQueryRequest,
+    x_request_id: Optional[str] = Header(None),
+    x_tenant_id: Optional[str] = Header(None)
+):
+    """배치 질의 (NDJSON: 질문 순서대로 result/error → done, 검색은 한 번에 / LLM 호출은 동시 실행 수 제한)"""
+    if not rag_service:
+        raise HTTPException(status_code=503, detail="RAG 서비스가 초기화되지 않았습니다.")
+    
+    if not request.questions or any(not question.strip() for question in request.questions):
+        raise HTTPException(status_code=400, detail="비어 있는 질문이 있습니다.")
+    if len(request.questions) > Config.MAX_BATCH_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"질문은 최대 {Config.MAX_BATCH_QUESTIONS}개까지 보낼 수 있습니다.")
+    
+    tenant = await _tenant_services(request.tenant or x_tenant_id)
+    search_filter = _search_filter(request)
+    
+    async def event_stream():
+        try:
+            async for event in tenant.rag_service.aquery_batch(
+                request.questions, search_filter=search_filter, request_id=x_request_id
+            ):
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        except Exception as e:
+            logger.exception(f"[오류] 배치 질의 중 예외 발생: {type(e).__name__}: {e}")
+            yield json.dumps({"type": "error", "message": f"RAG 처리 중 오류: {str(e)}"}, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _get_job(job_id: str):
+    """수집 작업 조회 (없으면 404)"""
+    job = services.jobs.get(job_id) if services else None
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"수집 작업을 찾을 수 없습니다: {job_id}")
+    return job
+
+@app.post("/ingest", status_code=202)
+async def ingest_documents(request: IngestRequest, x_tenant_id: Optional[str] = Header(None)):
+    """문서 증분 수집 작업 등록 (백그라운드 실행, 작업 ID로 진행률 조회)"""
+    if not services:
+        raise HTTPException(status_code=503, detail="RAG 서비스가 초기화되지 않았습니다.")
+    
+    if not Path(request.directory).exists():
+        raise HTTPException(status_code=404, detail=f"{request.directory}에서 문서를 찾을 수 없습니다.")
+    
+    tenant = request.tenant or x_tenant_id
+    if tenant and tenant not in services.tenants.tenants:
+        raise HTTPException(status_code=404, detail=f"등록되지 않은 테넌트입니다: {tenant}")
+    
+    job = services.jobs.submit(request.directory, request.clear_existing, tenant=tenant)
+    return {
+        "status": "accepted",
+        "message": f"수집 작업을 시작했습니다. GET /ingest/{job.job_id}로 진행 상황을 확인하세요.",
+        **job.to_dict()
+    }
+
+@app.get("/ingest")
+async def list_ingest_jobs():
+    """최근 수집 작업 목록"""
+    if not services:
+        raise HTTPException(status_code=503, detail="RAG 서비스가 초기화되지 않았습니다.")
+    return {"jobs": [job.to_dict() for job in services.jobs.list()]}
+
+@app.get("/ingest/{job_id}")
+async def get_ingest_job(job_id: str):
+    """수집 작업 상태 / 진행률 / 결과"""
+    return _get_job(job_id).to_dict()
+
+@app.post("/ingest/{job_id}/cancel")
+async def cancel_ingest_job(job_id: str):
+    """수집 작업 취소 (완료된 파일까지만 반영)"""
+    job = _get_job(job_id)
+    services.jobs.cancel(job_id)
+    return job.to_dict()
 
 @app.get("/stats")
-async def get_stats():
-    """벡터 스토어 통계"""
+async def get_stats(tenant: Optional[str] = None, x_tenant_id: Optional[str] = Header(None)):
+    """벡터 스토어 통계 (?tenant=ID 또는 X-Tenant-ID 헤더로 테넌트 지정)"""
     if not rag_service:
         raise HTTPException(status_code=503, detail="RAG 서비스가 초기화되지 않았습니다.")
     
-    return rag_service.vector_store.get_stats()
+    tenant_rag_service = (await _tenant_services(tenant or x_tenant_id)).rag_service
+    stats = tenant_rag_service.vector_store.get_stats()
+    stats["cache"] = tenant_rag_service.get_cache_stats()
+    if tenant_rag_service.reranker:
+        stats["reranker"] = tenant_rag_service.reranker.stats()
+    stats["sessions"] = services.sessions.stats()
+    return stats
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str, tenant: Optional[str] = None, x_tenant_id: Optional[str] = Header(None)):
+    """대화 세션 상태 (메시지 수 / 요약 여부 / 토큰 윈도우 / 메모리 사용량)"""
+    if not services:
+        raise HTTPException(status_code=503, detail="RAG 서비스가 초기화되지 않았습니다.")
+    session = services.sessions.get(tenant or x_tenant_id or services.tenants.default_id, session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="세션이 없거나 만료되었습니다.")
+    return session.describe()
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str, tenant: Optional[str] = None, x_tenant_id: Optional[str] = Header(None)):
+    """대화 세션 삭제 (클라이언트 연결 종료 시 호출)"""
+    if not services:
+        raise HTTPException(status_code=503, detail="RAG 서비스가 초기화되지 않았습니다.")
+    deleted = services.sessions.delete(tenant or x_tenant_id or services.tenants.default_id, session_id)
+    return {"session_id": session_id, "deleted": deleted}
+
+@app.get("/tenants")
+async def list_tenants():
+    """등록된 테넌트 목록과 로딩 상태"""
+    if not services:
+        raise HTTPException(status_code=503, detail="RAG 서비스가 초기화되지 않았습니다.")
+    return {
+        "default": services.tenants.default_id,
+        "max_loaded": Config.MAX_LOADED_TENANTS,
+        "tenants": services.tenants.describe()
+    }
+
+@app.get("/metrics")
+def get_metrics(format: str = "prometheus"):
+    """Prometheus 지표 (요청 수, 처리 중 요청, 단계별 지연 시간, LLM 토큰, 캐시 적중률, 수집 처리량, 컬렉션 크기)
+    
+    ?format=json이면 백분위수(p50/p95/p99)를 포함한 JSON 요약을 반환합니다.
+    """
+    if format == "json":
+        return metrics.snapshot()
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     uvicorn.run(
@@ -0,0 +1,209 @@
+"""조문 구조 기반 청킹 (제N조 단위 부모 청크 + 항/호 단위 자식 청크)"""
+
+import logging
+import re
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import List, Optional
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from src.config import Config
+from src.parent_store import PARENT_CONTENT_KEY
+
+logger = logging.getLogger(__name__)
+
+# 줄 시작의 조문 제목 (예: "제14조(연차휴가)", "제3조의2 【적용 범위】").
+# 본문 속 참조("제5조에 따라")는 제목 뒤에 조사가 붙으므로 제외
+ARTICLE_PATTERN = re.compile(
+    r'^[ \t]*(제\s*\d+\s*조(?:\s*의\s*\d+)?)'
+    r'(?:[ \t]*[(（【\[]\s*([^)）】\]\n]{1,40}?)\s*[)）】\]])?'
+    r'(?![ \t]*(?:에|의|를|을|은|는|와|과|및|부터|까지|에서|또는|내지))',
+    re.M
+)
+# 장/절 제목 (예: "제3장 근로시간") - 조문 범위에서 제외하고 메타데이터로만 기록
+CHAPTER_PATTERN = re.compile(r'^[ \t]*(제\s*\d+\s*[장절](?:\s*의\s*\d+)?)[ \t]*([^\n]{0,40})$', re.M)
+# 항(①) / 호(1. 1)) / 목(가.) 시작 위치
+CLAUSE_PATTERN = re.compile(r'(?:^[ \t]*|(?<=[ \t]))([①-⑳])|^[ \t]*(\d{1,2}[.)](?!\d)|[가-하]\.)', re.M)
+
+
+def make_parent_id(content_hash: str, parent_index: int) -> str:
+    """파일 해시 + 부모 순번으로 부모 청크 ID 생성 (자식 청크 ID와 같은 접두사)"""
+    return f"{content_hash[:16]}-p{parent_index:04d}"
+
+
+def _compact_label(label: str) -> str:
+    return re.sub(r'\s+', '', label)
+
+
+@dataclass
+class _Section:
+    """조문 하나 (또는 첫 조문 앞의 전문)"""
+    start: int
+    end: int
+    body_start: int  # 제목 다음 위치 (항 구분은 여기부터)
+    article: str = ""
+    title: str = ""
+    chapter: str = ""
+
+
+class ArticleChunker:
+    """규정 문서를 조문(제N조) 경계로 나눠 부모 청크를 만들고, 조문 안을 항/호 경계로 나눠 자식 청크 생성
+
+    - 자식 청크는 CHILD_CHUNK_SIZE 안에서 인접한 항/호를 합쳐 임베딩 수를 줄이고 (오버랩 없음),
+      항 하나가 더 길면 문장/줄 단위로 나눕니다. 임베딩 문맥을 위해 조문 제목을 앞에 붙입니다.
+    - 부모 청크는 조문 전체이며, PARENT_MAX_CHARS보다 긴 조문은 항 경계에서 여러 부분으로 나눕니다.
+    - 자식 청크 메타데이터에는 parent_id와 파일 전체 텍스트 기준 오프셋(start_index/end_index,
+      parent_start/parent_end)을 기록하고, 부모 원문은 PARENT_CONTENT_KEY로 실어 보내 저장 시 부모 저장소로 옮깁니다.
+    - 조문 제목이 없는 문서는 None을 반환하므로 호출자가 기존 분할기로 처리합니다.
+    """
+
+    def __init__(self, child_chunk_size: int = None, parent_max_chars: int = None):
+        self.child_chunk_size = child_chunk_size or Config.CHILD_CHUNK_SIZE
+        self.parent_max_chars = parent_max_chars or Config.PARENT_MAX_CHARS
+        self.child_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.child_chunk_size,
+            chunk_overlap=0,
+            separators=["\n\n", "\n", "。", ".", " ", ""],
+            keep_separator="end",  # 문장 끝의 마침표를 다음 청크 앞에 붙이지 않음
+            length_function=len,
+        )
+
+    def split(self, documents: List[Document], content_hash: str) -> Optional[List[Document]]:
+        """한 파일의 문서(PDF는 페이지별)를 자식 청크로 분할 (조문 제목이 없으면 None)"""
+        if not documents:
+            return []
+        texts = [doc.page_content for doc in documents]
+        text = "\n".join(texts)
+        sections = self._sections(text)
+        if sections is None:
+            return None
+
+        # 오프셋 → 원본 문서(페이지) 찾기용 시작 위치
+        page_starts, position = [], 0
+        for page_text in texts:
+            page_starts.append(position)
+            position += len(page_text) + 1
+
+        chunks: List[Document] = []
+        parent_index = 0
+        for section in sections:
+            for part_start, part_end, pieces in self._parent_parts(text, section):
+                parent_id = make_parent_id(content_hash, parent_index)
+                parent_index += 1
+                parent_text = text[part_start:part_end]
+                for child_start, child_end, clause in self._child_spans(text, pieces):
+                    source = documents[bisect_right(page_starts, child_start) - 1]
+                    body = text[child_start:child_end].strip()
+                    heading = section.article + (f"({section.title})" if section.title else "")
+                    # 조문 첫 부분이 아닌 자식 청크는 임베딩 문맥용으로 조문 제목을 붙임
+                    content = body if child_start == section.start or not heading else f"{heading}\n{body}"
+                    metadata = dict(source.metadata)
+                    metadata.update({
+                        'parent_id': parent_id,
+                        'chapter': section.chapter,
+                        'article': section.article,
+                        'article_title': section.title,
+                        'clause': clause,
+                        'start_index': child_start,
+                        'end_index': child_end,
+                        'parent_start': part_start,
+                        'parent_end': part_end,
+                        PARENT_CONTENT_KEY: parent_text,
+                    })
+                    chunks.append(Document(page_content=content, metadata=metadata))
+
+        logger.debug(f"[청킹] 조문 {len(sections)}개 → 부모 {parent_index}개, 자식 {len(chunks)}개")
+        return chunks
+
+    def _sections(self, text: str) -> Optional[List[_Section]]:
+        """조문 경계 (첫 조문 앞의 내용은 전문으로 별도 구분, 장/절 제목 줄은 제외)"""
+        articles = list(ARTICLE_PATTERN.finditer(text))
+        if not articles:
+            return None
+        chapters = list(CHAPTER_PATTERN.finditer(text))
+        boundaries = sorted([m.start() for m in articles] + [m.start() for m in chapters] + [len(text)])
+
+        sections: List[_Section] = []
+        preamble_end = min(articles[0].start(), chapters[0].start() if chapters else len(text))
+        if text[:preamble_end].strip():
+            sections.append(_Section(start=0, end=preamble_end, body_start=0))
+
+        chapter_index = 0
+        current_chapter = ""
+        for match in articles:
+            while chapter_index < len(chapters) and chapters[chapter_index].start() < match.start():
+                chapter = chapters[chapter_index]
+                current_chapter = " ".join(filter(None, [_compact_label(chapter.group(1)), chapter.group(2).strip()]))
+                chapter_index += 1
+            end = boundaries[bisect_right(boundaries, match.start())]
+            sections.append(_Section(
+                start=match.start(),
+                end=end,
+                body_start=match.end(),
+                article=_compact_label(match.group(1)),
+                title=(match.group(2) or "").strip(),
+                chapter=current_chapter
+            ))
+        return sections
+
+    @staticmethod
+    def _trim(text: str, start: int, end: int) -> tuple:
+        """앞뒤 공백을 제외한 범위"""
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return start, end
+
+    def _pieces(self, text: str, section: _Section) -> List[tuple]:
+        """조문을 항/호 경계로 나눈 (시작, 끝, 항/호 번호) 목록 (제목과 첫 항 앞의 본문은 번호 없는 첫 조각)"""
+        cuts, labels = [section.start], [""]
+        for match in CLAUSE_PATTERN.finditer(text, section.body_start, section.end):
+            label = match.group(1) or match.group(2)
+            position = match.start(1) if match.group(1) else match.start(2)
+            if position > cuts[-1]:
+                cuts.append(position)
+                labels.append(label)
+        cuts.append(section.end)
+        pieces = [(*self._trim(text, start, end), label) for start, end, label in zip(cuts, cuts[1:], labels)]
+        return [(start, end, label) for start, end, label in pieces if end > start]
+
+    def _parent_parts(self, text: str, section: _Section) -> List[tuple]:
+        """부모 청크 범위 목록 → [(시작, 끝, 항/호 조각 목록)] (긴 조문은 항 경계에서 PARENT_MAX_CHARS 단위로 분할)"""
+        pieces = self._pieces(text, section)
+        if not pieces:
+            return []
+        parts, current = [], [pieces[0]]
+        for piece in pieces[1:]:
+            if piece[1] - current[0][0] > self.parent_max_chars:
+                parts.append(current)
+                current = []
+            current.append(piece)
+        parts.append(current)
+        return [(part[0][0], part[-1][1], part) for part in parts]
+
+    def _child_spans(self, text: str, pieces: List[tuple]) -> List[tuple]:
+        """항/호 조각을 CHILD_CHUNK_SIZE 안에서 합치고, 더 긴 조각은 분할기로 나눈 (시작, 끝, 첫 항/호 번호) 목록"""
+        spans: List[tuple] = []
+        mergeable = False  # 마지막 자식 청크에 다음 조각을 이어 붙일 수 있는지 (분할된 조각 뒤에는 붙이지 않음)
+        for start, end, label in pieces:
+            if end - start > self.child_chunk_size:
+                spans.extend((child_start, child_end, label) for child_start, child_end in self._split_long(text, start, end))
+                mergeable = False
+            elif mergeable and end - spans[-1][0] <= self.child_chunk_size:
+                spans[-1] = (spans[-1][0], end, spans[-1][2] or label)
+            else:
+                spans.append((start, end, label))
+                mergeable = True
+        return spans
+
+    def _split_long(self, text: str, start: int, end: int) -> List[tuple]:
+        """긴 조각을 분할기로 나누고 원문 오프셋 계산"""
+        spans, cursor = [], start
+        for piece in self.child_splitter.split_text(text[start:end]):
+            position = text.find(piece, cursor, end)
+            if position < 0:
+                position = cursor
+            spans.append((position, position + len(piece)))
+            cursor = position + len(piece)
+        return spans
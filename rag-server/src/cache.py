@@ -0,0 +1,238 @@
+"""질의 임베딩 / 검색 결과 / 답변 캐시"""
+
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """캐시 키용 질문 정규화 (대소문자, 공백, 끝 문장부호 통일)"""
+    return " ".join(query.lower().split()).rstrip("?!.。 ")
+
+
+class VersionCounter:
+    """컬렉션 버전 카운터 (파일 기반, 다른 프로세스의 수집도 감지)
+
+    수집으로 컬렉션이 바뀔 때마다 bump()하고, 캐시는 저장 시점의 버전과 현재 버전이
+    다르면 항목을 무효로 처리합니다.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._value = 0
+        self._mtime: Optional[int] = None
+        self.current()
+
+    def current(self) -> int:
+        """현재 버전 (파일이 바뀌었을 때만 다시 읽음)"""
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return self._value
+        if mtime != self._mtime:
+            with self._lock:
+                try:
+                    self._value = int(self.path.read_text().strip() or 0)
+                    self._mtime = mtime
+                except (ValueError, FileNotFoundError):
+                    pass
+        return self._value
+
+    def bump(self) -> int:
+        """버전 증가 및 저장"""
+        with self._lock:
+            self._value = self.current() + 1
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix('.tmp')
+            tmp_path.write_text(str(self._value))
+            os.replace(tmp_path, self.path)
+            self._mtime = self.path.stat().st_mtime_ns
+            return self._value
+
+
+class LRUCache:
+    """TTL + LRU 캐시 (스레드 안전, 선택적으로 디스크에 저장)"""
+
+    def __init__(self, name: str, max_size: int, ttl_seconds: float, persist_path: Optional[str] = None):
+        self.name = name
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.persist_path = Path(persist_path) if persist_path else None
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (value, version, expires_at)
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    def get(self, key: Hashable, version: int = 0) -> Optional[Any]:
+        """캐시 조회 (만료되었거나 버전이 다르면 None)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, entry_version, expires_at = entry
+                if entry_version == version and expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, value: Any, version: int = 0):
+        """캐시 저장 (가장 오래 사용되지 않은 항목부터 제거)"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, version, time.time() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """전체 항목 삭제"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """적중/미스 통계"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+    def save(self):
+        """만료되지 않은 항목을 디스크에 저장"""
+        if not self.persist_path:
+            return
+        now = time.time()
+        with self._lock:
+            entries = [(key, entry) for key, entry in self._entries.items() if entry[2] > now]
+        self.persist_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.persist_path.with_suffix('.tmp')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entries, f)
+        os.replace(tmp_path, self.persist_path)
+        logger.info(f"[캐시] {self.name} 캐시 저장: {len(entries)}개 항목")
+
+    def load(self):
+        """디스크에 저장된 캐시 로딩"""
+        if not self.persist_path or not self.persist_path.exists():
+            return
+        try:
+            with open(self.persist_path, 'rb') as f:
+                entries = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"[경고] {self.name} 캐시 로딩 실패: {e}")
+            return
+        now = time.time()
+        with self._lock:
+            for key, entry in entries[-self.max_size:]:
+                if entry[2] > now:
+                    self._entries[key] = entry
+        logger.info(f"[캐시] {self.name} 캐시 로딩: {len(self._entries)}개 항목")
+
+
+class SemanticAnswerCache:
+    """유사 질문 답변 캐시 (LLM 호출 생략용)
+
+    질문 임베딩의 코사인 유사도가 threshold 이상이고, 검색된 컨텍스트 청크 ID가 완전히
+    같을 때만 적중으로 처리합니다. 대화 히스토리가 있는 질의에는 사용하지 않습니다.
+    """
+
+    def __init__(self, max_size: int, threshold: float, ttl_seconds: float):
+        self.max_size = max_size
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # (컨텍스트 키, 정규화 질문) -> (임베딩, 답변, 버전, 만료 시각)
+        self._entries: "OrderedDict[Tuple[tuple, str], tuple]" = OrderedDict()
+        # 컨텍스트 키 -> 해당 컨텍스트로 저장된 질문 키 (같은 컨텍스트끼리만 비교)
+        self._by_context: Dict[tuple, set] = {}
+        self.hits = 0
+        self.misses = 0
+        self.similarities: List[float] = []  # 최근 적중 유사도 (threshold 튜닝용)
+
+    def _remove(self, key: Tuple[tuple, str]):
+        del self._entries[key]
+        keys = self._by_context.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_context[key[0]]
+
+    def lookup(self, question: str, embedding: Sequence[float], context_ids: Sequence[str], version: int) -> Optional[dict]:
+        """유사 질문의 저장된 답변 조회 (없으면 None)"""
+        context_key = tuple(context_ids)
+        with self._lock:
+            now = time.time()
+            candidates = []
+            for key in list(self._by_context.get(context_key, ())):
+                vector, answer, entry_version, expires_at = self._entries[key]
+                if entry_version != version or expires_at <= now:
+                    self._remove(key)
+                    continue
+                candidates.append((key, vector))
+            if candidates:
+                # 임베딩은 정규화되어 있으므로 내적 = 코사인 유사도
+                query_vector = np.asarray(embedding, dtype=np.float32)
+                scores = np.stack([vector for _, vector in candidates]) @ query_vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    key = candidates[best][0]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self.similarities = (self.similarities + [float(scores[best])])[-100:]
+                    return self._entries[key][1]
+            self.misses += 1
+            return None
+
+    def store(self, question: str, embedding: Sequence[float], context_ids: Sequence[str], answer: dict, version: int):
+        """답변 저장 (가장 오래 사용되지 않은 항목부터 제거)"""
+        if self.max_size <= 0:
+            return
+        context_key = tuple(context_ids)
+        key = (context_key, normalize_query(question))
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (
+                np.asarray(embedding, dtype=np.float32),
+                answer,
+                version,
+                time.time() + self.ttl_seconds
+            )
+            self._by_context.setdefault(context_key, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        """전체 항목 삭제"""
+        with self._lock:
+            self._entries.clear()
+            self._by_context.clear()
+
+    def stats(self) -> dict:
+        """적중/미스 통계 및 적중 유사도 분포"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "recent_hit_similarity_min": round(min(self.similarities), 4) if self.similarities else None
+        }
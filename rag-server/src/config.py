@@ -11,20 +11,104 @@ class Config:
     # OpenAI 설정
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
     OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "")  # OpenAI 호환 서버 주소 (비우면 OpenAI API)
+    
+    # LLM 클라이언트 설정 (공유 연결 풀 / 재시도 / 헤징 / 동일 요청 병합)
+    LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 60))  # 초, 요청 하나의 읽기/쓰기 타임아웃
+    LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 5))  # 초
+    LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 32))  # keep-alive 연결 풀 크기
+    LLM_KEEPALIVE_SECONDS = float(os.getenv("LLM_KEEPALIVE_SECONDS", 60))  # 유휴 연결 유지 시간
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))  # 연결 오류 / 타임아웃 / 429 / 5xx 재시도 횟수
+    LLM_RETRY_BASE_MS = float(os.getenv("LLM_RETRY_BASE_MS", 500))  # 지수 백오프 시작값 (full jitter)
+    LLM_RETRY_MAX_MS = float(os.getenv("LLM_RETRY_MAX_MS", 8000))  # 백오프 상한
+    LLM_HEDGE_AFTER_MS = float(os.getenv("LLM_HEDGE_AFTER_MS", 0))  # 응답(스트리밍은 첫 청크)이 이보다 늦으면 같은 요청 한 번 더 (0이면 사용 안 함)
+    LLM_COALESCE = os.getenv("LLM_COALESCE", "true").lower() == "true"  # 같은 프롬프트의 동시 요청을 LLM 호출 하나로 병합
     
     # 임베딩 모델 (한국어 최적화)
     EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "jhgan/ko-sroberta-multitask")
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # torch | onnx
+    EMBEDDING_MAX_SEQ_LENGTH = int(os.getenv("EMBEDDING_MAX_SEQ_LENGTH", 128))  # ONNX 백엔드 토큰 길이 (ko-sroberta 기본값)
+    
+    # ONNX 백엔드 설정 (EMBEDDING_BACKEND=onnx)
+    ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "./onnx_models")
+    ONNX_QUANTIZE = os.getenv("ONNX_QUANTIZE", "false").lower() == "true"  # 동적 int8 양자화
+    ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", 0))  # 0이면 ONNX Runtime 기본값
+    ONNX_PARITY_CHECK = os.getenv("ONNX_PARITY_CHECK", "true").lower() == "true"
+    ONNX_PARITY_THRESHOLD = float(os.getenv("ONNX_PARITY_THRESHOLD", 0.99))  # PyTorch 대비 최소 코사인 유사도
     
     # ChromaDB 설정
     CHROMA_DB_PATH = os.getenv("CHROMA_DB_PATH", "./chroma_db")
-    COLLECTION_NAME = "company_documents"
+    COLLECTION_NAME = os.getenv("COLLECTION_NAME", "company_documents")
+    INGEST_MANIFEST_PATH = os.getenv("INGEST_MANIFEST_PATH", os.path.join(CHROMA_DB_PATH, "ingest_manifest.json"))
+    COLLECTION_VERSION_PATH = os.path.join(CHROMA_DB_PATH, "collection_version")
+    KEYWORD_INDEX_PATH = os.getenv("KEYWORD_INDEX_PATH", os.path.join(CHROMA_DB_PATH, "keyword_index.json"))
+    PARENT_STORE_PATH = os.getenv("PARENT_STORE_PATH", os.path.join(CHROMA_DB_PATH, "parent_chunks.jsonl"))  # CHUNK_STRATEGY=article의 부모 청크 저장 위치
+    VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")  # chroma | numpy (메모리 매핑 행렬, 정확한 top-k)
+    NUMPY_INDEX_DIR = os.getenv("NUMPY_INDEX_DIR", os.path.join(CHROMA_DB_PATH, "numpy_index"))  # 컬렉션별 하위 폴더
+    
+    # 멀티 테넌트 설정 (기본 테넌트 = 위의 COLLECTION_NAME / EMBEDDING_MODEL)
+    DEFAULT_TENANT = os.getenv("DEFAULT_TENANT", "default")
+    TENANTS_FILE = os.getenv("TENANTS_FILE", "")  # 추가 테넌트 정의 JSON (테넌트 ID → 컬렉션 / 임베딩 모델)
+    MAX_LOADED_TENANTS = int(os.getenv("MAX_LOADED_TENANTS", 4))  # 동시에 메모리에 올려 둘 테넌트 수 (기본 테넌트 포함)
+    TENANT_IDLE_TIMEOUT = int(os.getenv("TENANT_IDLE_TIMEOUT", 1800))  # 초, 이 시간 동안 사용하지 않은 테넌트 언로드 (0이면 사용 안 함)
     
     # 문서 처리 설정
     CHUNK_SIZE = 500  # 한국어는 토큰 밀도가 높아서 작게
     CHUNK_OVERLAP = 50
+    CHUNK_STRATEGY = os.getenv("CHUNK_STRATEGY", "recursive")  # recursive | article (규정 문서를 조문 단위 부모 + 항/호 단위 자식 청크로 분할, 변경 시 --clear 재수집)
+    CHILD_CHUNK_SIZE = int(os.getenv("CHILD_CHUNK_SIZE", 300))  # article: 임베딩할 자식 청크 최대 길이 (인접한 항/호를 이 길이 안에서 병합)
+    PARENT_MAX_CHARS = int(os.getenv("PARENT_MAX_CHARS", 4000))  # article: 컨텍스트로 반환할 부모 청크 최대 길이 (긴 조문은 항 경계에서 분할)
+    EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 64))  # 수집 시 인코딩/저장 배치 크기
+    INGEST_CHECKPOINT_PATH = os.path.join(CHROMA_DB_PATH, "ingest_checkpoint.json")
+    INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", os.cpu_count() or 1))  # 문서 로딩/청킹 프로세스 수
     
     # 검색 설정
-    TOP_K_RESULTS = 5  # 3 → 5로 증가
+    TOP_K_RESULTS = int(os.getenv("TOP_K_RESULTS", 5))  # 3 → 5로 증가
+    HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", 20))  # 임베딩/BM25 각각에서 가져올 후보 수
+    RRF_K = 60  # Reciprocal Rank Fusion 상수
+    
+    # Cross-encoder 재정렬 (RRF 상위 후보를 질문-청크 쌍으로 다시 채점)
+    RERANKER_ENABLED = os.getenv("RERANKER_ENABLED", "false").lower() == "true"
+    RERANKER_MODEL = os.getenv("RERANKER_MODEL", "bongsoo/klue-cross-encoder-v1")
+    RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", 50))  # 재정렬할 후보 수
+    RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", 16))
+    RERANK_MAX_LENGTH = int(os.getenv("RERANK_MAX_LENGTH", 256))  # 질문 + 청크 토큰 길이
+    RERANK_TIMEOUT_MS = float(os.getenv("RERANK_TIMEOUT_MS", 300))  # 초과 시 RRF 순서 그대로 사용
+    
+    # 프롬프트 토큰 예산 (OPENAI_MODEL 토크나이저 기준)
+    CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", 3000))  # 참고 문서 섹션
+    HISTORY_MAX_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", 1000))  # 이전 대화 섹션 (최근 메시지부터)
+    HISTORY_SUMMARY_ENABLED = os.getenv("HISTORY_SUMMARY_ENABLED", "false").lower() == "true"  # 예산 밖 대화를 요약으로 대체
+    HISTORY_SUMMARY_CACHE_SIZE = int(os.getenv("HISTORY_SUMMARY_CACHE_SIZE", 256))  # 대화 접두부별 요약 캐시 항목 수 (다음 턴에서 이어서 요약)
+    MERGE_ADJACENT_CHUNKS = os.getenv("MERGE_ADJACENT_CHUNKS", "true").lower() == "true"  # 같은 파일의 인접 청크 병합
+    
+    # 서버 측 대화 세션 (요청에 session_id가 있으면 history 대신 서버에 저장된 대화 사용)
+    SESSION_WINDOW_TOKENS = int(os.getenv("SESSION_WINDOW_TOKENS", HISTORY_MAX_TOKENS))  # 세션별 최근 메시지 토큰 윈도우 (밀려난 대화는 요약 또는 삭제)
+    SESSION_TTL = int(os.getenv("SESSION_TTL", 1800))  # 초, 이 시간 동안 사용하지 않은 세션 만료 (0이면 만료 없음)
+    SESSION_MAX_MEMORY_MB = float(os.getenv("SESSION_MAX_MEMORY_MB", 64))  # 전체 세션 메모리 상한 (초과 시 오래 사용하지 않은 세션부터 제거)
+    
+    # 캐시 설정 (질의 임베딩 / 검색 결과)
+    QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", 1024))  # 0이면 캐시 사용 안 함
+    QUERY_CACHE_TTL = int(os.getenv("QUERY_CACHE_TTL", 3600))  # 초
+    QUERY_CACHE_DIR = os.getenv("QUERY_CACHE_DIR", "")  # 지정 시 종료할 때 캐시를 디스크에 저장
+    
+    # 유사 질문 답변 캐시 (히스토리 없는 질의에서 LLM 호출 생략)
+    ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", 512))  # 0이면 사용 안 함
+    ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95))  # 질문 임베딩 코사인 유사도
+    ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", 86400))  # 초
+    
+    # 동시성 설정
+    RAG_WORKER_THREADS = int(os.getenv("RAG_WORKER_THREADS", 4))  # 임베딩/벡터 검색 전용 스레드 풀
+    MAX_CONCURRENT_QUERIES = int(os.getenv("MAX_CONCURRENT_QUERIES", 32))  # 동시 처리 질의 수 상한
+    MAX_CONCURRENT_LLM_CALLS = int(os.getenv("MAX_CONCURRENT_LLM_CALLS", 8))  # 동시 LLM 호출 수 상한
+    BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", 4))  # 배치 질의 하나가 동시에 쓰는 LLM 호출 수 (전체 상한 안에서)
+    MAX_BATCH_QUESTIONS = int(os.getenv("MAX_BATCH_QUESTIONS", 500))  # /query/batch 요청당 최대 질문 수
+    EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", 2))  # 동시 질의 임베딩을 모으는 시간 (0이면 배치 사용 안 함)
+    EMBED_BATCH_MAX = int(os.getenv("EMBED_BATCH_MAX", 32))  # 질의 임베딩 배치 하나의 최대 질문 수
+    
+    # 로깅 설정 (DEBUG에서만 검색된 청크 미리보기 출력)
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # text | json
     
     # 서버 설정
     PORT = int(os.getenv("RAG_PORT", os.getenv("PORT", 8000)))
@@ -0,0 +1,230 @@
+"""프롬프트 컨텍스트 구성 (토큰 예산 내에서 청크 병합 / 히스토리 축약 / 섹션별 토큰 집계)"""
+
+import hashlib
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+from langchain_core.documents import Document
+from src.cache import LRUCache
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+# 메시지 하나당 역할/구분자 오버헤드 (OpenAI chat 포맷 기준 근사값)
+MESSAGE_OVERHEAD_TOKENS = 4
+# 서버 측 세션이 히스토리 맨 앞에 넣는 누적 요약 메시지 표시 (히스토리 예산/재요약 대상이 아님)
+SESSION_SUMMARY_KEY = "session_summary"
+
+
+class TokenCounter:
+    """설정된 모델의 토크나이저로 토큰 수 계산 (tiktoken이 없으면 UTF-8 바이트 수로 근사)"""
+
+    def __init__(self, model: str = None):
+        self.model = model or Config.OPENAI_MODEL
+        self.encoding = None
+        try:
+            import tiktoken
+        except ImportError:
+            logger.warning("[경고] tiktoken이 설치되지 않아 토큰 수를 근사값으로 계산합니다.")
+            return
+        try:
+            self.encoding = tiktoken.encoding_for_model(self.model)
+        except KeyError:
+            self.encoding = tiktoken.get_encoding("o200k_base")
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.encoding is None:
+            # 한글 1글자(3바이트) ≈ 0.75토큰, 영문 4글자 ≈ 1토큰
+            return (len(text.encode('utf-8')) + 3) // 4
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def count_messages(self, messages: List[Dict]) -> int:
+        return sum(self.count(msg['content']) + MESSAGE_OVERHEAD_TOKENS for msg in messages)
+
+
+@dataclass
+class PackedContext:
+    """토큰 예산에 맞춘 프롬프트 구성 요소와 섹션별 토큰 수"""
+    context: str
+    docs: List[Document]
+    history: List[Dict]
+    summary: Optional[str] = None
+    tokens: Dict[str, int] = field(default_factory=dict)
+    merged_chunks: int = 0  # 인접 청크와 합쳐진 청크 수
+    dropped_chunks: int = 0  # 예산 초과로 제외된 청크 수
+    dropped_messages: int = 0  # 예산 초과로 제외(또는 요약)된 이전 메시지 수
+
+
+def _strip_overlap(previous: str, current: str, max_overlap: int) -> str:
+    """앞 청크 끝과 겹치는 current의 앞부분 제거 (청크 오버랩 중복 제거)"""
+    for size in range(min(max_overlap, len(previous), len(current)), 9, -1):
+        if previous.endswith(current[:size]):
+            return current[size:]
+    return current
+
+
+class ContextBuilder:
+    """검색된 청크와 대화 히스토리를 토큰 예산 안에서 프롬프트 섹션으로 구성
+
+    - 같은 파일의 인접 청크(chunk_index 연속)는 오버랩을 제거하고 하나로 병합
+    - 컨텍스트는 검색 순위대로 CONTEXT_MAX_TOKENS까지만 포함
+    - 히스토리는 최근 메시지부터 HISTORY_MAX_TOKENS까지만 포함하고,
+      summarizer가 있으면 제외된 이전 대화를 요약으로 대체
+    - 서버 측 세션의 히스토리(맨 앞에 SESSION_SUMMARY_KEY 메시지)는 세션이 응답 후 요약하므로,
+      세션 요약을 그대로 사용하고 예산에서 제외된 메시지를 요청 중에 다시 요약하지 않음
+    """
+
+    def __init__(
+        self,
+        token_counter: TokenCounter = None,
+        summarizer: Optional[Callable[[Optional[str], List[Dict]], str]] = None
+    ):
+        self.counter = token_counter or TokenCounter()
+        self.summarizer = summarizer
+        self.context_max_tokens = Config.CONTEXT_MAX_TOKENS
+        self.history_max_tokens = Config.HISTORY_MAX_TOKENS
+        # 이전 대화 접두부 해시 -> 요약 (다음 턴에서 이어서 요약, 실행기 스레드에서 함께 사용)
+        self.summary_cache = LRUCache("history_summary", Config.HISTORY_SUMMARY_CACHE_SIZE, Config.QUERY_CACHE_TTL)
+
+    # ------------------------------------------------------------------
+    # 컨텍스트
+    # ------------------------------------------------------------------
+    def merge_chunks(self, docs: List[Document]) -> List[Document]:
+        """같은 파일의 인접/중복 청크 병합 (병합된 청크는 가장 높은 순위 위치에 배치)"""
+        groups: Dict[tuple, List[tuple]] = {}
+        order: List[tuple] = []
+        for rank, doc in enumerate(docs):
+            index = doc.metadata.get('chunk_index')
+            file_key = (doc.metadata.get('source_file'), doc.metadata.get('file_hash'))
+            if index is None or not Config.MERGE_ADJACENT_CHUNKS:
+                key = (file_key, 'rank', rank)
+                groups[key] = [(rank, -1, doc)]
+                order.append(key)
+                continue
+            groups.setdefault(file_key, [])
+            if not groups[file_key]:
+                order.append(file_key)
+            groups[file_key].append((rank, int(index), doc))
+
+        merged: List[tuple] = []  # (최고 순위, Document)
+        for key in order:
+            entries = sorted(groups[key], key=lambda entry: entry[1])
+            run: List[tuple] = []
+            for entry in entries:
+                if run and entry[1] - run[-1][1] > 1:
+                    merged.append(self._merge_run(run))
+                    run = []
+                if run and entry[1] == run[-1][1]:
+                    continue  # 같은 청크 중복
+                run.append(entry)
+            if run:
+                merged.append(self._merge_run(run))
+
+        merged.sort(key=lambda item: item[0])
+        return [doc for _, doc in merged]
+
+    def _merge_run(self, run: List[tuple]) -> tuple:
+        """chunk_index가 연속인 청크들을 하나의 Document로 병합"""
+        best_rank = min(rank for rank, _, _ in run)
+        if len(run) == 1:
+            return best_rank, run[0][2]
+        text = run[0][2].page_content.strip()
+        for _, _, doc in run[1:]:
+            current = doc.page_content.strip()
+            remainder = _strip_overlap(text, current, Config.CHUNK_OVERLAP * 2)
+            text = text + remainder if remainder != current else f"{text}\n{current}"
+        first = run[0][2]
+        metadata = dict(first.metadata)
+        metadata['chunk_indices'] = [index for _, index, _ in run]
+        merged = Document(page_content=text, metadata=metadata, id=first.id)
+        return best_rank, merged
+
+    def _format_context(self, docs: List[Document]) -> tuple:
+        """예산 안에 들어가는 청크만 프롬프트 텍스트로 포맷팅 → (텍스트, 포함된 문서, 토큰 수)"""
+        sections, included, used = [], [], 0
+        for doc in docs:
+            section = f"[문서 {len(sections) + 1}: {doc.metadata.get('source_file', 'Unknown')}]\n{doc.page_content.strip()}\n"
+            tokens = self.counter.count(section)
+            # 최소 1개는 포함 (청크 하나가 예산보다 커도 답변 근거는 필요)
+            if sections and used + tokens > self.context_max_tokens:
+                continue
+            sections.append(section)
+            included.append(doc)
+            used += tokens
+        return "\n".join(sections), included, used
+
+    # ------------------------------------------------------------------
+    # 히스토리
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _prefix_key(messages: List[Dict]) -> str:
+        payload = json.dumps([(msg['role'], msg['content']) for msg in messages], ensure_ascii=False)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def _summarize(self, dropped: List[Dict]) -> Optional[str]:
+        """제외된 이전 대화 요약 (이전 턴의 요약이 있으면 새로 제외된 메시지만 이어서 요약)"""
+        if not self.summarizer or not dropped:
+            return None
+        key = self._prefix_key(dropped)
+        summary = self.summary_cache.get(key)
+        if summary is not None:
+            return summary
+
+        previous_summary, start = None, 0
+        for end in range(len(dropped) - 1, 0, -1):
+            cached = self.summary_cache.get(self._prefix_key(dropped[:end]))
+            if cached is not None:
+                previous_summary, start = cached, end
+                break
+        summary = self.summarizer(previous_summary, dropped[start:])
+        self.summary_cache.set(key, summary)
+        return summary
+
+    def trim_history(self, history: List[Dict]) -> tuple:
+        """최근 메시지부터 예산 안에 들어가는 만큼 유지 → (유지된 메시지, 제외된 메시지)"""
+        kept, used = [], 0
+        for msg in reversed(history):
+            tokens = self.counter.count(msg['content']) + MESSAGE_OVERHEAD_TOKENS
+            if used + tokens > self.history_max_tokens:
+                break
+            kept.append(msg)
+            used += tokens
+        kept.reverse()
+        return kept, history[:len(history) - len(kept)]
+
+    # ------------------------------------------------------------------
+    # 전체 구성
+    # ------------------------------------------------------------------
+    def build(self, query: str, docs: List[Document], history: List[Dict] = None) -> PackedContext:
+        """검색 결과 + 히스토리(마지막 메시지 = 현재 질문 제외)로 프롬프트 구성 요소 생성"""
+        merged_docs = self.merge_chunks(docs)
+        context, included, context_tokens = self._format_context(merged_docs)
+
+        previous = list(history[:-1]) if history else []
+        if previous and previous[0].get(SESSION_SUMMARY_KEY):
+            session_summary = previous.pop(0)['content'] or None
+            kept, dropped = self.trim_history(previous)
+            summary = session_summary
+        else:
+            kept, dropped = self.trim_history(previous)
+            summary = self._summarize(dropped)
+
+        packed = PackedContext(
+            context=context,
+            docs=included,
+            history=kept,
+            summary=summary,
+            merged_chunks=len(docs) - len(merged_docs),
+            dropped_chunks=len(merged_docs) - len(included),
+            dropped_messages=len(dropped)
+        )
+        packed.tokens = {
+            "context": context_tokens,
+            "history": self.counter.count_messages(kept),
+            "summary": self.counter.count(summary) if summary else 0,
+            "question": self.counter.count(query),
+        }
+        return packed
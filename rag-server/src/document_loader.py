@@ -1,27 +1,28 @@
+import importlib
+import logging
+import multiprocessing
 import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path
-from typing import List
+from typing import Dict, Iterator, List, Optional, Tuple
 from langchain_core.documents import Document
-from langchain_community.document_loaders import (
-    PyPDFLoader,
-    Docx2txtLoader,
-    TextLoader,
-    UnstructuredExcelLoader
-)
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from src.config import Config
+from src.manifest import make_chunk_id
+
+logger = logging.getLogger(__name__)
 
 class DocumentProcessor:
     """범용 문서 로더 및 청킹 프로세서"""
     
-    # 지원 파일 형식 매핑
+    # 지원 파일 형식 매핑 (로더 클래스는 실제로 사용할 때 import)
     LOADERS = {
-        '.pdf': PyPDFLoader,
-        '.docx': Docx2txtLoader,
-        '.doc': Docx2txtLoader,
-        '.txt': TextLoader,
-        '.xlsx': UnstructuredExcelLoader,
-        '.xls': UnstructuredExcelLoader,
+        '.pdf': 'PyPDFLoader',
+        '.docx': 'Docx2txtLoader',
+        '.doc': 'Docx2txtLoader',
+        '.txt': 'TextLoader',
+        '.xlsx': 'UnstructuredExcelLoader',
+        '.xls': 'UnstructuredExcelLoader',
     }
     
     def __init__(self):
@@ -31,19 +32,25 @@ class DocumentProcessor:
             separators=["\n\n", "\n", "。", ".", " ", ""],  # 한국어 우선 구분자
             length_function=len,
         )
+        # 규정 문서용 조문 단위 청킹 (조문 제목이 없는 문서는 위 분할기 사용)
+        self.article_chunker = None
+        if Config.CHUNK_STRATEGY == "article":
+            from src.article_chunker import ArticleChunker
+            self.article_chunker = ArticleChunker()
     
-    def load_document(self, file_path: str) -> List[Document]:
-        """단일 문서 로딩"""
+    def load_document(self, file_path: str, base_dir: Optional[str] = None) -> List[Document]:
+        """단일 문서 로딩 (base_dir: 상대 경로 / 부서 메타데이터의 기준인 수집 디렉토리)"""
         path = Path(file_path)
         ext = path.suffix.lower()
         
         if ext not in self.LOADERS:
             raise ValueError(f"지원하지 않는 파일 형식: {ext}")
         
-        loader_class = self.LOADERS[ext]
+        loaders_module = importlib.import_module('langchain_community.document_loaders')
+        loader_class = getattr(loaders_module, self.LOADERS[ext])
         loader = loader_class(file_path)
         
-        print(f"[파일] 로딩 중: {path.name}")
+        logger.info(f"[파일] 로딩 중: {path.name}")
         documents = loader.load()
         
         # 메타데이터 추가
@@ -51,34 +58,149 @@ class DocumentProcessor:
             doc.metadata.update({
                 'source_file': path.name,
                 'file_type': ext,
-                'file_path': str(path.absolute())
+                'file_path': str(path.absolute()),
+                **self.location_metadata(file_path, base_dir)
             })
         
         return documents
     
-    def load_directory(self, directory: str) -> List[Document]:
-        """디렉토리 내 모든 지원 문서 로딩"""
-        all_documents = []
+    @staticmethod
+    def location_metadata(file_path: str, base_dir: Optional[str] = None) -> Dict[str, str]:
+        """수집 디렉토리 기준 상대 경로와 부서 (최상위 하위 폴더명, 바로 아래 파일이면 빈 문자열)"""
+        path = Path(file_path).absolute()
+        relative = Path(path.name)
+        if base_dir:
+            base = Path(base_dir).absolute()
+            if base.is_file():
+                base = base.parent
+            try:
+                relative = path.relative_to(base)
+            except ValueError:
+                pass
+        return {
+            'relative_path': relative.as_posix(),
+            'department': relative.parts[0] if len(relative.parts) > 1 else ''
+        }
+    
+    def list_files(self, directory: str) -> List[str]:
+        """디렉토리 내 지원 문서의 절대 경로 목록 (파일 경로를 주면 해당 파일만)"""
         dir_path = Path(directory)
         
         if not dir_path.exists():
-            print(f"[경고] 디렉토리가 존재하지 않습니다: {directory}")
-            return all_documents
+            logger.warning(f"[경고] 디렉토리가 존재하지 않습니다: {directory}")
+            return []
         
-        for file_path in dir_path.rglob('*'):
-            if file_path.suffix.lower() in self.LOADERS:
-                try:
-                    docs = self.load_document(str(file_path))
-                    all_documents.extend(docs)
-                except Exception as e:
-                    print(f"[오류] 파일 로딩 실패 ({file_path.name}): {e}")
+        if dir_path.is_file():
+            return [str(dir_path.absolute())] if dir_path.suffix.lower() in self.LOADERS else []
         
-        print(f"[완료] 총 {len(all_documents)}개 문서 로딩 완료")
+        return sorted(
+            str(file_path.absolute())
+            for file_path in dir_path.rglob('*')
+            if file_path.is_file() and file_path.suffix.lower() in self.LOADERS
+        )
+    
+    def load_directory(self, directory: str) -> List[Document]:
+        """디렉토리 내 모든 지원 문서 로딩"""
+        all_documents = []
+        
+        for file_path in self.list_files(directory):
+            try:
+                docs = self.load_document(file_path, base_dir=directory)
+                all_documents.extend(docs)
+            except Exception as e:
+                logger.error(f"[오류] 파일 로딩 실패 ({Path(file_path).name}): {e}")
+        
+        logger.info(f"[완료] 총 {len(all_documents)}개 문서 로딩 완료")
         return all_documents
     
     def split_documents(self, documents: List[Document]) -> List[Document]:
         """문서를 청크로 분할"""
-        print(f"[처리] 문서 청킹 중 (chunk_size={Config.CHUNK_SIZE}, overlap={Config.CHUNK_OVERLAP})")
+        logger.info(f"[처리] 문서 청킹 중 (chunk_size={Config.CHUNK_SIZE}, overlap={Config.CHUNK_OVERLAP})")
         chunks = self.text_splitter.split_documents(documents)
-        print(f"[완료] {len(chunks)}개 청크 생성 완료")
+        logger.info(f"[완료] {len(chunks)}개 청크 생성 완료")
+        return chunks
+    
+    def load_and_split(self, file_path: str, content_hash: str, base_dir: Optional[str] = None) -> List[Document]:
+        """단일 파일 로딩 + 청킹 (파일 해시 기반 결정적 청크 ID 부여)"""
+        documents = self.load_document(file_path, base_dir)
+        chunks = None
+        if self.article_chunker is not None:
+            chunks = self.article_chunker.split(documents, content_hash)
+        if chunks is None:
+            chunks = self.text_splitter.split_documents(documents)
+        for index, chunk in enumerate(chunks):
+            chunk.id = make_chunk_id(content_hash, index)
+            chunk.metadata.update({
+                'file_hash': content_hash,
+                'chunk_index': index
+            })
         return chunks
+    
+    def iter_load_and_split(
+        self,
+        files: Dict[str, str],
+        max_workers: int = None,
+        base_dir: Optional[str] = None
+    ) -> Iterator[Tuple[str, str, List[Document], Optional[Exception]]]:
+        """여러 파일을 프로세스 풀에서 병렬로 로딩+청킹하여 완료 순서대로 전달
+        
+        (경로, 파일 해시, 청크 목록, 오류)를 하나씩 yield하므로 전체 문서를 메모리에 쌓지 않습니다.
+        동시에 처리 중인 파일 수는 워커 수의 2배로 제한됩니다.
+        """
+        max_workers = max_workers or Config.INGEST_WORKERS
+        items = iter(files.items())
+        
+        # 워커 1개 또는 파일 1개면 프로세스 생성 비용 없이 현재 프로세스에서 처리
+        if max_workers <= 1 or len(files) <= 1:
+            for path, content_hash in items:
+                try:
+                    yield path, content_hash, self.load_and_split(path, content_hash, base_dir), None
+                except Exception as e:
+                    yield path, content_hash, [], e
+            return
+        
+        logger.info(f"[병렬] {len(files)}개 파일을 {max_workers}개 프로세스로 로딩/청킹")
+        # 서버 프로세스(스레드 풀 / HTTP 클라이언트 / 백그라운드 스레드 보유)를 fork하면 워커가 교착될 수 있으므로 spawn 사용
+        pool = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker
+        )
+        pending = {}
+        
+        def submit_next() -> bool:
+            item = next(items, None)
+            if item is None:
+                return False
+            pending[pool.submit(_load_and_split_in_worker, *item, base_dir)] = item
+            return True
+        
+        try:
+            for _ in range(max_workers * 2):
+                if not submit_next():
+                    break
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, content_hash = pending.pop(future)
+                    try:
+                        yield path, content_hash, future.result(), None
+                    except Exception as e:
+                        yield path, content_hash, [], e
+                    submit_next()
+        finally:
+            # 소비자가 중간에 멈춰도(취소 등) 대기 중인 작업은 버림
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+# 프로세스 풀 워커 전용 프로세서 (워커마다 한 번만 생성)
+_worker_processor: Optional[DocumentProcessor] = None
+
+def _init_worker():
+    """워커 프로세스 초기화"""
+    global _worker_processor
+    _worker_processor = DocumentProcessor()
+
+def _load_and_split_in_worker(file_path: str, content_hash: str, base_dir: Optional[str] = None) -> List[Document]:
+    """워커 프로세스에서 단일 파일 로딩 + 청킹"""
+    return _worker_processor.load_and_split(file_path, content_hash, base_dir)
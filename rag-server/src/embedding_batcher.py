@@ -0,0 +1,87 @@
+"""질의 임베딩 마이크로 배치 스케줄러"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+from src.telemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+IDLE_EXIT_SECONDS = 60  # 이 시간 동안 요청이 없으면 작업 스레드 종료 (다음 요청 때 다시 시작)
+
+
+class QueryEmbeddingBatcher:
+    """동시에 들어온 질의 임베딩 요청을 모아 인코더 한 번 호출(forward pass)로 처리
+
+    첫 요청이 들어오면 window_ms 동안(또는 max_batch개가 찰 때까지) 요청을 더 모은 뒤
+    encode(texts)로 한 번에 인코딩하고, 호출자마다 자기 질문의 벡터를 Future로 돌려줍니다.
+    배치 크기 분포는 rag_embed_batch_size 히스토그램으로 집계합니다.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], List[List[float]]], window_ms: float, max_batch: int):
+        self.encode = encode
+        self.window = window_ms / 1000
+        self.max_batch = max(1, max_batch)
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, text: str) -> Future:
+        """질문을 다음 배치에 추가 (결과는 Future, 비동기 호출자는 asyncio.wrap_future로 대기)"""
+        future: Future = Future()
+        self._queue.put((text, future))
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+                self._thread.start()
+        return future
+
+    def embed(self, text: str) -> List[float]:
+        """질문 하나 임베딩 (배치 처리가 끝날 때까지 블로킹)"""
+        return self.submit(text).result()
+
+    def _next_batch(self) -> Optional[list]:
+        """첫 요청을 기다린 뒤 대기 시간/최대 개수까지 모으기 (유휴 시간 초과 시 None)"""
+        try:
+            batch = [self._queue.get(timeout=IDLE_EXIT_SECONDS)]
+        except queue.Empty:
+            return None
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                # 대기 시간이 지났어도 이미 들어와 있는 요청은 함께 처리
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                with self._lock:
+                    # 종료 직전에 들어온 요청이 있으면 계속 처리
+                    if self._queue.empty():
+                        self._thread = None
+                        return
+                continue
+
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            # 같은 질문은 한 번만 인코딩
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            metrics.observe("rag_embed_batch_size", len(batch))
+            try:
+                vectors = dict(zip(texts, self.encode(texts)))
+            except Exception as e:
+                logger.warning(f"[경고] 질의 임베딩 배치 실패 ({len(batch)}개): {type(e).__name__}: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for text, future in batch:
+                future.set_result(vectors[text])
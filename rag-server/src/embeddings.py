@@ -1,17 +1,215 @@
-from langchain_community.embeddings import HuggingFaceEmbeddings
+import logging
+import sys
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import List, Optional
+from langchain_core.embeddings import Embeddings
 from src.config import Config
+from src.embedding_batcher import QueryEmbeddingBatcher
+
+logger = logging.getLogger(__name__)
+
+# ONNX 백엔드 정합성 검사용 샘플 문장
+PARITY_SAMPLES = [
+    "연차유급휴가는 1년간 80% 이상 출근한 근로자에게 15일을 부여한다.",
+    "출근율은 출근일수를 소정근로일수로 나누어 산정한다.",
+    "급여는 매월 25일에 지급하며, 지급일이 휴일인 경우 전일에 지급한다.",
+    "육아휴직을 신청하려면 휴직 개시 예정일 30일 전까지 신청서를 제출해야 합니다.",
+    "출산전후휴가가 어떻게 되는지 알려줘",
+    "회사의 복지 제도는 무엇인가요?",
+]
+
+class OnnxEmbeddings(Embeddings):
+    """ONNX Runtime 기반 sentence-transformers 임베딩 (mean pooling + L2 정규화)
+
+    최초 실행 시 PyTorch 모델을 ONNX로 변환하여 ONNX_MODEL_DIR에 저장하고,
+    ONNX_QUANTIZE=true면 동적 int8 양자화 모델을 추가로 만들어 사용합니다.
+    """
+
+    def __init__(self, model_name: str):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model_path = self._ensure_model()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if Config.ONNX_INTRA_OP_THREADS > 0:
+            options.intra_op_num_threads = Config.ONNX_INTRA_OP_THREADS
+        self.session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+        logger.info(f"[ONNX] 세션 로딩 완료: {model_path.name} (intra-op 스레드: {Config.ONNX_INTRA_OP_THREADS or '기본값'})")
+
+    def _ensure_model(self) -> Path:
+        """ONNX 모델 파일 준비 (없으면 변환/양자화)"""
+        model_dir = Path(Config.ONNX_MODEL_DIR) / self.model_name.replace("/", "__")
+        fp32_path = model_dir / "model.onnx"
+        int8_path = model_dir / "model.int8.onnx"
+
+        if not fp32_path.exists():
+            self._export(fp32_path)
+        if not Config.ONNX_QUANTIZE:
+            return fp32_path
+
+        if not int8_path.exists():
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            logger.info("[ONNX] 동적 int8 양자화 중...")
+            quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+        return int8_path
+
+    def _export(self, fp32_path: Path):
+        """PyTorch 모델을 ONNX로 변환"""
+        import torch
+        from transformers import AutoModel
+
+        logger.info(f"[ONNX] 모델 변환 중: {self.model_name} → {fp32_path}")
+        fp32_path.parent.mkdir(parents=True, exist_ok=True)
+        model = AutoModel.from_pretrained(self.model_name).eval()
+        sample = self.tokenizer(PARITY_SAMPLES[:2], padding=True, return_tensors="pt")
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                (sample["input_ids"], sample["attention_mask"]),
+                str(fp32_path),
+                input_names=["input_ids", "attention_mask"],
+                output_names=["last_hidden_state"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "last_hidden_state": {0: "batch", 1: "sequence"},
+                },
+                opset_version=14,
+            )
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        """배치 단위 토큰화 → ONNX 추론 → mean pooling"""
+        import numpy as np
+
+        vectors = []
+        for start in range(0, len(texts), Config.EMBED_BATCH_SIZE):
+            batch = texts[start:start + Config.EMBED_BATCH_SIZE]
+            encoded = self.tokenizer(
+                batch,
+                padding=True,
+                truncation=True,
+                max_length=Config.EMBEDDING_MAX_SEQ_LENGTH,
+                return_tensors="np"
+            )
+            feeds = {name: encoded[name].astype(np.int64) for name in self.input_names if name in encoded}
+            hidden = self.session.run(None, feeds)[0]
+            # sentence-transformers와 같은 mean pooling + 정규화
+            mask = encoded["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            vectors.extend(pooled.tolist())
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0]
+
+def _load_torch_embeddings(model_name: str = None) -> Embeddings:
+    """기본 PyTorch(sentence-transformers) 임베딩 (torch는 여기서 처음 import)"""
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(
+        model_name=model_name or Config.EMBEDDING_MODEL,
+        model_kwargs={'device': 'cpu'},
+        encode_kwargs={'normalize_embeddings': True, 'batch_size': Config.EMBED_BATCH_SIZE}
+    )
+
+def check_parity(onnx_embeddings: Embeddings, torch_embeddings: Embeddings = None, samples: List[str] = None) -> dict:
+    """ONNX 임베딩과 PyTorch 임베딩의 코사인 일치도 검사"""
+    samples = samples or PARITY_SAMPLES
+    torch_embeddings = torch_embeddings or _load_torch_embeddings(getattr(onnx_embeddings, "model_name", None))
+    expected = torch_embeddings.embed_documents(samples)
+    actual = onnx_embeddings.embed_documents(samples)
+    # 두 임베딩 모두 정규화되어 있으므로 내적 = 코사인 유사도
+    cosines = [sum(a * b for a, b in zip(u, v)) for u, v in zip(expected, actual)]
+    return {
+        "samples": len(samples),
+        "min_cosine": min(cosines),
+        "mean_cosine": sum(cosines) / len(cosines),
+        "threshold": Config.ONNX_PARITY_THRESHOLD,
+        "passed": min(cosines) >= Config.ONNX_PARITY_THRESHOLD
+    }
 
 class EmbeddingService:
-    """한국어 문서용 임베딩 서비스"""
-    
-    def __init__(self):
-        print(f"[로딩] 임베딩 모델 로딩 중: {Config.EMBEDDING_MODEL}")
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=Config.EMBEDDING_MODEL,
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
-        )
-        print("[완료] 임베딩 모델 로딩 완료")
-    
+    """한국어 문서용 임베딩 서비스 (백엔드: torch | onnx)"""
+
+    _batcher: Optional[QueryEmbeddingBatcher] = None  # 질의 임베딩 마이크로 배치 (처음 사용할 때 생성)
+    _batcher_lock = threading.Lock()
+
+    def __init__(self, model_name: str = None, load_model: bool = True):
+        """load_model=False면 모델 이름만 기록하고 인코더는 로딩하지 않음 (스냅샷처럼 미리 계산된 임베딩만 다룰 때)"""
+        self.model_name = model_name or Config.EMBEDDING_MODEL
+        self.embeddings: Optional[Embeddings] = None
+        if not load_model:
+            logger.info(f"[임베딩] 모델을 로딩하지 않습니다: {self.model_name} (미리 계산된 임베딩만 사용)")
+            return
+        logger.info(f"[로딩] 임베딩 모델 로딩 중: {self.model_name} (백엔드: {Config.EMBEDDING_BACKEND})")
+        if Config.EMBEDDING_BACKEND == "onnx":
+            self.embeddings = self._load_onnx()
+        else:
+            self.embeddings = _load_torch_embeddings(self.model_name)
+        logger.info("[완료] 임베딩 모델 로딩 완료")
+
+    def _load_onnx(self) -> Embeddings:
+        """ONNX 백엔드 로딩 (정합성 검사 실패 시 PyTorch로 대체)"""
+        onnx_embeddings = OnnxEmbeddings(self.model_name)
+        if not Config.ONNX_PARITY_CHECK:
+            return onnx_embeddings
+
+        torch_embeddings = _load_torch_embeddings(self.model_name)
+        result = check_parity(onnx_embeddings, torch_embeddings)
+        logger.info(f"[ONNX] 정합성 검사: 최소 코사인 {result['min_cosine']:.4f}, 평균 {result['mean_cosine']:.4f} "
+                    f"(기준 {result['threshold']})")
+        if not result["passed"]:
+            logger.warning("[경고] ONNX 임베딩이 PyTorch 임베딩과 일치하지 않아 PyTorch 백엔드를 사용합니다.")
+            return torch_embeddings
+        return onnx_embeddings
+
     def get_embeddings(self):
         return self.embeddings
+
+    def _require_model(self) -> Embeddings:
+        if self.embeddings is None:
+            raise RuntimeError(f"임베딩 모델이 로딩되지 않았습니다: {self.model_name} (load_model=False)")
+        return self.embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """문서 청크 배치 인코딩"""
+        return self._require_model().embed_documents(texts)
+
+    def submit_query(self, text: str) -> Optional[Future]:
+        """질의 임베딩을 마이크로 배치에 추가 (EMBED_BATCH_WINDOW_MS가 0이면 None)
+
+        동시에 들어온 질의를 모아 embed_documents 한 번으로 인코딩합니다.
+        두 백엔드 모두 질의/문서 인코딩이 같으므로 embed_query와 같은 벡터가 나옵니다.
+        """
+        if Config.EMBED_BATCH_WINDOW_MS <= 0:
+            return None
+        self._require_model()
+        if self._batcher is None:
+            with self._batcher_lock:
+                if self._batcher is None:
+                    self._batcher = QueryEmbeddingBatcher(
+                        self.embeddings.embed_documents, Config.EMBED_BATCH_WINDOW_MS, Config.EMBED_BATCH_MAX
+                    )
+        return self._batcher.submit(text)
+
+    def embed_query(self, text: str) -> List[float]:
+        """질의 임베딩 (마이크로 배치 사용 시 다른 동시 질의와 함께 인코딩)"""
+        future = self.submit_query(text)
+        return future.result() if future is not None else self._require_model().embed_query(text)
+
+if __name__ == "__main__":
+    # ONNX 모델 변환 + 정합성 검사: python -m src.embeddings --parity
+    if "--parity" in sys.argv:
+        from src.telemetry import setup_logging
+        setup_logging()
+        print(check_parity(OnnxEmbeddings(Config.EMBEDDING_MODEL)))
@@ -1,70 +1,174 @@
 """문서 수집 및 벡터 DB 저장 스크립트"""
 
+import logging
 import sys
+import threading
 from pathlib import Path
+from typing import Callable, Optional
 from src.document_loader import DocumentProcessor
 from src.vector_store import VectorStoreManager
+from src.manifest import IngestManifest
+from src.ingest_writer import IngestWriter
 from src.config import Config
+from src.telemetry import setup_logging
+from src.tenants import UnknownTenantError, load_tenants
+
+logger = logging.getLogger(__name__)
+
+class IngestCancelled(Exception):
+    """수집 작업 취소"""
+
+
+def run_ingestion(
+    directory: str = "./documents",
+    clear_existing: bool = False,
+    processor: DocumentProcessor = None,
+    vector_store: VectorStoreManager = None,
+    on_progress: Optional[Callable[[dict], None]] = None,
+    cancel_event: Optional[threading.Event] = None
+) -> dict:
+    """증분 수집: 신규/변경 파일만 임베딩하고 삭제/변경된 파일의 청크는 제거
+
+    새 청크는 수집이 끝날 때까지 검색에서 숨겨 두었다가 교체/삭제된 청크 제거와 함께
+    한 번에 반영하므로, 수집 중에도 질의는 이전 상태 또는 완료된 상태만 보게 됩니다.
+    cancel_event가 설정되거나 오류가 나면 완료된 파일까지만 반영하고 일부만 저장된 파일은 되돌립니다.
+    """
+    processor = processor or DocumentProcessor()
+    vector_store = vector_store or VectorStoreManager()
+    # 매니페스트 / 체크포인트는 테넌트(컬렉션)별로 관리
+    manifest = IngestManifest(vector_store.tenant.manifest_path)
+    writer = IngestWriter(vector_store, checkpoint_path=vector_store.tenant.checkpoint_path, on_progress=on_progress)
+
+    file_paths = processor.list_files(directory)
+    if not file_paths:
+        raise FileNotFoundError(f"{directory}에서 문서를 찾을 수 없습니다.")
+
+    # 기존 DB 초기화 (옵션): 기존 청크는 바로 지우지 않고 커밋 시점에 삭제
+    if clear_existing:
+        manifest.clear(vector_store.all_ids())
+        writer.clear_checkpoint()
+
+    plan = manifest.plan(directory, file_paths)
+    logger.info(f"[계획] 신규/변경 {len(plan.to_add)}개 (변경 {len(plan.changed)}개), 삭제 {len(plan.removed)}개, "
+                f"변경 없음 {len(plan.unchanged)}개")
+
+    # 신규/변경 파일만 로딩 + 청킹 (병렬) → 배치 인코딩/저장 (파이프라인)
+    failed_files = []
+    recorded_ids = set()
+    cancelled = False
+
+    def loaded_files():
+        for path, content_hash, chunks, error in processor.iter_load_and_split(plan.to_add, base_dir=directory):
+            if cancel_event is not None and cancel_event.is_set():
+                raise IngestCancelled()
+            if error is not None:
+                logger.error(f"[오류] 파일 로딩 실패 ({Path(path).name}): {error}")
+                failed_files.append(path)
+                continue
+            yield path, content_hash, chunks
+
+    def record_committed(committed_files):
+        # 모든 청크가 저장된 파일만 매니페스트에 기록 → 중단 시 다음 실행에서 이어서 처리
+        for path, content_hash, ids in committed_files:
+            manifest.record(path, content_hash, ids)
+            recorded_ids.update(ids)
+        manifest.save()
+
+    error = None
+    vector_store.begin_staging()
+    try:
+        write_stats = writer.write_files(loaded_files(), on_batch_committed=record_committed)
+    except IngestCancelled:
+        logger.info("[취소] 수집 작업이 취소되었습니다. 완료된 파일까지만 반영합니다.")
+        cancelled = True
+    except BaseException as e:
+        logger.error(f"[오류] 수집 작업 실패 - 완료된 파일까지만 반영합니다: {type(e).__name__}: {e}")
+        error = e
+
+    if cancelled or error is not None:
+        write_stats = writer.stats()
+        # 일부만 저장된 파일의 청크 되돌림 (이전 중단에서 남은 청크 포함) → 다음 실행에서 처음부터 다시 처리
+        vector_store.discard_staged(keep_ids=recorded_ids)
+        manifest.pending_deletes.extend(writer.in_progress_ids - recorded_ids)
+        writer.clear_checkpoint()
+
+    # 삭제된 파일 + 교체된 파일의 기존 청크를 새 청크와 함께 한 번에 반영
+    for path in plan.removed:
+        manifest.remove(path)
+    stale_ids = manifest.take_pending_deletes()
+    vector_store.commit_staging(stale_ids)
+    manifest.save()
+    if error is not None:
+        raise error
+
+    stats = vector_store.get_stats()
+    return {
+        "cancelled": cancelled,
+        "added_files": write_stats["committed_files"],
+        "removed_files": len(plan.removed),
+        "unchanged_files": len(plan.unchanged),
+        "failed_files": [Path(path).name for path in failed_files],
+        "added_chunks": write_stats["committed_chunks"] + write_stats["skipped_chunks"],
+        "chunks_per_sec": write_stats["chunks_per_sec"],
+        "deleted_chunks": len(stale_ids),
+        "total_documents": stats.get("total_documents", 0),
+        "collection_name": stats.get("collection_name", "N/A"),
+        "embedding_model": stats.get("embedding_model", "N/A")
+    }
+
+def ingest_documents(directory: str = "./documents", clear_existing: bool = False, tenant_id: Optional[str] = None):
+    """문서를 로딩하고 벡터 스토어에 저장 (tenant_id가 없으면 기본 테넌트 컬렉션)"""
+
+    logger.info("=" * 60)
+    logger.info("[수집] 문서 수집 시작")
+    logger.info("=" * 60)
 
-def ingest_documents(directory: str = "./documents", clear_existing: bool = False):
-    """문서를 로딩하고 벡터 스토어에 저장"""
-    
-    print("=" * 60)
-    print("[수집] 문서 수집 시작")
-    print("=" * 60)
-    
     try:
         # 초기화
-        print("[1/4] 프로세서 초기화 중...")
+        logger.info("[1/3] 프로세서 초기화 중...")
         processor = DocumentProcessor()
-        
-        print("[2/4] 벡터 스토어 초기화 중...")
-        vector_store = VectorStoreManager()
-        
-        # 기존 DB 초기화 (옵션)
-        if clear_existing:
-            vector_store.clear_database()
-        
-        # 문서 로딩
-        print(f"[3/4] 문서 로딩 중 (경로: {directory})...")
-        documents = processor.load_directory(directory)
-        
-        if not documents:
-            print("[오류] 로딩된 문서가 없습니다.")
-            print(f"[안내] {directory} 폴더에 PDF, DOCX, TXT 파일을 추가하세요.")
-            return
-        
-        print(f"[성공] {len(documents)}개 문서 로딩 완료")
-        
-        # 문서 청킹
-        print("[4/4] 문서 청킹 중...")
-        chunks = processor.split_documents(documents)
-        print(f"[성공] {len(chunks)}개 청크 생성 완료")
-        
-        # 벡터 스토어에 저장
-        print("[저장] 벡터 스토어에 저장 중...")
-        vector_store.add_documents(chunks)
-        
+
+        logger.info("[2/3] 벡터 스토어 초기화 중...")
+        tenants = load_tenants()
+        tenant = tenants.get(tenant_id or Config.DEFAULT_TENANT)
+        if tenant is None:
+            raise UnknownTenantError(tenant_id)
+        vector_store = VectorStoreManager(tenant=tenant)
+
+        # 증분 수집 (변경된 파일만 처리)
+        logger.info(f"[3/3] 문서 수집 중 (경로: {directory})...")
+        result = run_ingestion(directory, clear_existing, processor, vector_store)
+
         # 통계 출력
-        stats = vector_store.get_stats()
-        print("\n" + "=" * 60)
-        print("[통계] 수집 완료 통계:")
-        print(f"   - 총 문서 수: {stats.get('total_documents', 0)}개")
-        print(f"   - 컬렉션: {stats.get('collection_name', 'N/A')}")
-        print(f"   - 임베딩 모델: {stats.get('embedding_model', 'N/A')}")
-        print("=" * 60)
-    
+        logger.info("=" * 60)
+        logger.info("[통계] 수집 완료 통계:")
+        logger.info(f"   - 신규/변경 파일: {result['added_files']}개 (청크 {result['added_chunks']}개 추가, {result['chunks_per_sec']} chunks/sec)")
+        logger.info(f"   - 삭제된 파일: {result['removed_files']}개 (청크 {result['deleted_chunks']}개 삭제)")
+        logger.info(f"   - 변경 없는 파일: {result['unchanged_files']}개 (건너뜀)")
+        if result['failed_files']:
+            logger.info(f"   - 실패한 파일: {', '.join(result['failed_files'])}")
+        logger.info(f"   - 총 문서 수: {result['total_documents']}개")
+        logger.info(f"   - 컬렉션: {result['collection_name']}")
+        logger.info(f"   - 임베딩 모델: {result['embedding_model']}")
+        logger.info("=" * 60)
+
+    except UnknownTenantError:
+        logger.error(f"[오류] 등록되지 않은 테넌트: {tenant_id} (TENANTS_FILE 확인)")
+
+    except FileNotFoundError as e:
+        logger.error(f"[오류] {e}")
+        logger.info(f"[안내] {directory} 폴더에 PDF, DOCX, TXT 파일을 추가하세요.")
+
     except Exception as e:
-        print(f"\n[오류] 수집 중 오류 발생:")
-        print(f"   오류 타입: {type(e).__name__}")
-        print(f"   오류 메시지: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"[오류] 수집 중 오류 발생: {type(e).__name__}: {e}")
 
 if __name__ == "__main__":
     # 명령줄 인자 처리
-    doc_dir = sys.argv[1] if len(sys.argv) > 1 else "./documents"
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    doc_dir = args[0] if args else "./documents"
     clear = "--clear" in sys.argv
-    
+    tenant = next((arg.split("=", 1)[1] for arg in sys.argv[1:] if arg.startswith("--tenant=")), None)
+
+    setup_logging()
     Config.validate()
-    ingest_documents(doc_dir, clear_existing=clear)
+    ingest_documents(doc_dir, clear_existing=clear, tenant_id=tenant)
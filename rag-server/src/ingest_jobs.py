@@ -0,0 +1,149 @@
+"""백그라운드 문서 수집 작업 관리 (작업 ID / 진행률 / 취소)"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Optional
+from src.telemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+# 메모리에 보관하는 완료된 작업 수
+MAX_JOB_HISTORY = 50
+
+
+@dataclass
+class IngestJob:
+    """수집 작업 상태 (queued → running → succeeded | failed | cancelled)"""
+    job_id: str
+    directory: str
+    clear_existing: bool
+    tenant: Optional[str] = None
+    status: str = "queued"
+    progress: dict = field(default_factory=dict)
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed", "cancelled")
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "directory": self.directory,
+            "clear_existing": self.clear_existing,
+            "tenant": self.tenant,
+            "status": self.status,
+            "cancel_requested": self.cancel_event.is_set(),
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IngestJobManager:
+    """수집 작업을 전용 스레드 1개에서 순서대로 실행
+
+    수집은 매니페스트/체크포인트/컬렉션을 함께 바꾸므로 동시에 하나만 실행하고,
+    나머지 요청은 대기열에서 기다립니다.
+    """
+
+    def __init__(self, services):
+        self.services = services
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-job")
+
+    def submit(self, directory: str, clear_existing: bool = False, tenant: Optional[str] = None) -> IngestJob:
+        """수집 작업 등록 (즉시 반환, tenant가 없으면 기본 테넌트)"""
+        job = IngestJob(
+            job_id=uuid.uuid4().hex[:12],
+            directory=directory,
+            clear_existing=clear_existing,
+            tenant=tenant or self.services.tenants.default_id
+        )
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._prune()
+        self._executor.submit(self._run, job)
+        logger.info(f"[작업] 수집 작업 등록: {job.job_id} (경로: {directory}, 테넌트: {job.tenant})")
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[IngestJob]:
+        """최근 작업 목록 (최신순)"""
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def cancel(self, job_id: str) -> Optional[IngestJob]:
+        """작업 취소 요청 (실행 중이면 완료된 파일까지만 반영하고 종료)"""
+        job = self._jobs.get(job_id)
+        if job is None or job.finished:
+            return job
+        job.cancel_event.set()
+        logger.info(f"[작업] 수집 작업 취소 요청: {job.job_id}")
+        return job
+
+    def shutdown(self):
+        """대기/실행 중인 작업 취소 후 종료"""
+        for job in self.list():
+            if not job.finished:
+                job.cancel_event.set()
+        self._executor.shutdown(wait=False)
+
+    def _prune(self):
+        """완료된 작업 중 오래된 것부터 제거"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(self._jobs) - MAX_JOB_HISTORY)]:
+            del self._jobs[job_id]
+
+    def _run(self, job: IngestJob):
+        """작업 스레드: 공유 서비스로 증분 수집 실행"""
+        if job.cancel_event.is_set():
+            job.status = "cancelled"
+            job.finished_at = time.time()
+            metrics.inc("rag_ingest_jobs_total", status=job.status)
+            return
+
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            # 문서 로더(PDF/DOCX/Excel)는 수집할 때만 필요하므로 지연 import
+            from src.ingest import run_ingestion
+
+            def on_progress(stats: dict):
+                job.progress = stats
+
+            # 수집하는 동안 테넌트가 언로드되지 않도록 고정
+            with self.services.tenants.acquire(job.tenant) as tenant:
+                job.result = run_ingestion(
+                    job.directory,
+                    job.clear_existing,
+                    processor=self.services.processor,
+                    vector_store=tenant.vector_store,
+                    on_progress=on_progress,
+                    cancel_event=job.cancel_event
+                )
+            job.status = "cancelled" if job.result["cancelled"] else "succeeded"
+        except Exception as e:
+            job.status = "failed"
+            job.error = f"{type(e).__name__}: {e}"
+            logger.exception(f"[오류] 수집 작업 실패 ({job.job_id}): {e}")
+        finally:
+            job.finished_at = time.time()
+            metrics.inc("rag_ingest_jobs_total", status=job.status)
+            logger.info(f"[작업] 수집 작업 종료: {job.job_id} ({job.status})")
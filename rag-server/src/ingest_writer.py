@@ -0,0 +1,198 @@
+"""배치 단위 임베딩 + 파이프라인 저장 (수집 전용 writer)"""
+
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from langchain_core.documents import Document
+from src.config import Config
+from src.telemetry import metrics, stage
+
+logger = logging.getLogger(__name__)
+
+# (경로, 파일 해시, 청크 ID 목록)
+CommittedFile = Tuple[str, str, List[str]]
+
+
+class IngestWriter:
+    """청크를 배치로 인코딩하고, N번째 배치를 저장하는 동안 N+1번째 배치를 인코딩
+
+    - 인코딩은 호출 스레드, 저장(ChromaDB upsert + 키워드 색인)은 전용 스레드 1개에서 실행
+    - 메모리에는 최대 2개 배치만 유지
+    - 배치 저장이 끝날 때마다 체크포인트(완료되지 않은 파일의 저장된 청크 ID)를 기록하여
+      중단 후 재실행 시 이미 저장된 청크는 다시 인코딩하지 않음
+    """
+
+    def __init__(
+        self,
+        vector_store,
+        batch_size: int = None,
+        checkpoint_path: Optional[str] = None,
+        on_progress: Optional[Callable[[dict], None]] = None
+    ):
+        self.vector_store = vector_store
+        self.batch_size = batch_size or Config.EMBED_BATCH_SIZE
+        self.checkpoint_path = Path(checkpoint_path) if checkpoint_path else None
+        self.on_progress = on_progress
+        self.committed_chunks = 0
+        self.skipped_chunks = 0
+        self.committed_files = 0
+        self.in_progress_ids: set = set()  # 완료되지 않은 파일 중 저장된 청크 ID (체크포인트 내용)
+        self._started = time.perf_counter()
+
+    # ------------------------------------------------------------------
+    # 체크포인트
+    # ------------------------------------------------------------------
+    def _load_checkpoint(self) -> set:
+        """이전 실행에서 저장 완료된 청크 ID 로딩"""
+        if not self.checkpoint_path or not self.checkpoint_path.exists():
+            return set()
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+            committed_ids = set(json.load(f).get('committed_ids', []))
+        if committed_ids:
+            logger.info(f"[재개] 체크포인트에서 저장 완료된 청크 {len(committed_ids)}개 확인 (재인코딩 생략)")
+        return committed_ids
+
+    def _save_checkpoint(self, committed_ids: set):
+        """저장 완료된 청크 ID 기록 (임시 파일에 쓴 뒤 교체)"""
+        if not self.checkpoint_path:
+            return
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.checkpoint_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'committed_ids': sorted(committed_ids)}, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def clear_checkpoint(self):
+        """체크포인트 삭제 (수집 정상 완료 또는 --clear 시)"""
+        if self.checkpoint_path and self.checkpoint_path.exists():
+            self.checkpoint_path.unlink()
+
+    # ------------------------------------------------------------------
+    # 저장
+    # ------------------------------------------------------------------
+    def _write_batch(self, batch: List[Tuple[str, Document]], embeddings: List[List[float]]):
+        """writer 스레드: 인코딩된 배치를 벡터 스토어에 저장"""
+        docs = [doc for _, doc in batch]
+        with stage("ingest_write"):
+            self.vector_store.upsert_embeddings(
+                [doc.id for doc in docs],
+                embeddings,
+                [doc.page_content for doc in docs],
+                [doc.metadata for doc in docs]
+            )
+        metrics.inc("rag_ingest_chunks_total", len(docs))
+        metrics.inc("rag_ingest_batches_total")
+
+    def write_files(
+        self,
+        files: Iterable[Tuple[str, str, List[Document]]],
+        on_batch_committed: Optional[Callable[[List[CommittedFile]], None]] = None
+    ) -> dict:
+        """파일 단위 청크 스트림을 배치로 인코딩/저장
+
+        파일의 모든 청크가 저장되면 on_batch_committed로 완료된 파일 목록을 전달합니다.
+        """
+        # 처리량은 인코딩/저장 시작 시점부터 측정 (수집 계획 / 초기화 시간 제외)
+        self._started = time.perf_counter()
+        resumed_ids = self._load_checkpoint()
+        self.in_progress_ids = set(resumed_ids)
+        remaining: Dict[str, int] = {}  # 파일별 아직 저장되지 않은 청크 수
+        file_info: Dict[str, Tuple[str, List[str]]] = {}
+        buffer: List[Tuple[str, Document]] = []
+        pending: Optional[Tuple[Future, List[Tuple[str, Document]]]] = None
+        writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-writer")
+
+        def complete_files(paths: List[str]):
+            completed = []
+            for path in paths:
+                content_hash, ids = file_info.pop(path)
+                del remaining[path]
+                self.in_progress_ids.difference_update(ids)
+                completed.append((path, content_hash, ids))
+            self.committed_files += len(completed)
+            if completed and on_batch_committed:
+                on_batch_committed(completed)
+
+        def finish(pending_write):
+            # N번째 배치 저장 완료 대기 → 완료된 파일 기록 → 체크포인트
+            future, batch = pending_write
+            future.result()
+            finished_paths = []
+            for path, doc in batch:
+                self.in_progress_ids.add(doc.id)
+                remaining[path] -= 1
+                if remaining[path] == 0:
+                    finished_paths.append(path)
+            self.committed_chunks += len(batch)
+            complete_files(finished_paths)
+            self._save_checkpoint(self.in_progress_ids)
+            self._report_progress()
+
+        def flush():
+            nonlocal pending, buffer
+            batch, buffer = buffer, []
+            # N+1번째 배치 인코딩 (N번째 배치는 writer 스레드에서 저장 중)
+            with stage("ingest_embed"):
+                embeddings = self.vector_store.embedding_service.embed_documents(
+                    [doc.page_content for _, doc in batch]
+                )
+            if pending:
+                finish(pending)
+            pending = (writer.submit(self._write_batch, batch, embeddings), batch)
+
+        try:
+            for path, content_hash, chunks in files:
+                todo = [doc for doc in chunks if doc.id not in resumed_ids]
+                self.skipped_chunks += len(chunks) - len(todo)
+                file_info[path] = (content_hash, [doc.id for doc in chunks])
+                remaining[path] = len(todo)
+                if not todo:
+                    # 청크가 없거나 모두 이전 실행에서 저장된 파일
+                    complete_files([path])
+                    continue
+                for doc in todo:
+                    buffer.append((path, doc))
+                    if len(buffer) >= self.batch_size:
+                        flush()
+            if buffer:
+                flush()
+            if pending:
+                finish(pending)
+                pending = None
+        finally:
+            writer.shutdown(wait=True)
+
+        self.clear_checkpoint()
+        return self.stats()
+
+    def write_documents(self, documents: List[Document]) -> List[str]:
+        """파일 구분 없이 청크 목록을 저장 (체크포인트 없음)"""
+        self.write_files([("", "", documents)])
+        return [doc.id for doc in documents]
+
+    # ------------------------------------------------------------------
+    # 진행률
+    # ------------------------------------------------------------------
+    def stats(self) -> dict:
+        """저장 진행 현황 및 처리량"""
+        elapsed = time.perf_counter() - self._started
+        return {
+            "committed_chunks": self.committed_chunks,
+            "skipped_chunks": self.skipped_chunks,
+            "committed_files": self.committed_files,
+            "elapsed_sec": round(elapsed, 2),
+            "chunks_per_sec": round(self.committed_chunks / elapsed, 1) if elapsed > 0 else 0.0
+        }
+
+    def _report_progress(self):
+        """진행률 출력 및 콜백 전달"""
+        stats = self.stats()
+        metrics.set_gauge("rag_ingest_chunks_per_second", stats['chunks_per_sec'])
+        logger.info(f"[저장] 진행: 청크 {stats['committed_chunks']}개, 파일 {stats['committed_files']}개 "
+                    f"({stats['chunks_per_sec']} chunks/sec)")
+        if self.on_progress:
+            self.on_progress(stats)
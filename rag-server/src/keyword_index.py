@@ -0,0 +1,218 @@
+"""BM25 역색인 기반 키워드 검색 (한국어 대응)"""
+
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+
+class KeywordIndex:
+    """ChromaDB 옆에 저장되는 BM25 역색인
+
+    한국어는 조사가 붙고 복합어가 많아 공백 단위 토큰만으로는 매칭이 잘 안 되므로
+    (예: "출근율을" vs "출근율"), 조사를 제거한 어절 + 글자 바이그램을 함께 색인합니다.
+    """
+
+    # BM25 파라미터
+    K1 = 1.5
+    B = 0.75
+
+    # 불용어 (질문에 자주 등장하지만 검색에 의미 없는 단어)
+    STOP_WORDS = {'은', '는', '이', '가', '을', '를', '의', '에', '에서', '로', '으로',
+                  '와', '과', '하고', '하는', '어떻게', '어떤', '무엇', '뭐', '알려줘', '알려주세요'}
+
+    # 어절 끝에서 제거할 조사 (긴 것부터 검사)
+    JOSA_SUFFIXES = sorted([
+        '에서는', '으로는', '에게서', '이라도', '까지는', '부터는',
+        '에서', '에게', '으로', '부터', '까지', '보다', '처럼', '이나', '이란', '라는', '이라', '하고',
+        '은', '는', '이', '가', '을', '를', '의', '에', '로', '와', '과', '도', '만', '나', '란'
+    ], key=len, reverse=True)
+
+    TOKEN_PATTERN = re.compile(r'[가-힣]+|[a-z0-9]+(?:\.[0-9]+)*')
+
+    def __init__(self, index_path: str):
+        self.index_path = Path(index_path)
+        self._lock = threading.RLock()
+        self._loaded_mtime: Optional[float] = None
+        self._reset()
+        self.load()
+
+    def _reset(self):
+        """메모리 상의 색인 초기화"""
+        self.postings: Dict[str, Dict[str, int]] = {}  # term -> {chunk_id: tf}
+        self.doc_lengths: Dict[str, int] = {}
+        self.texts: Dict[str, str] = {}
+        self.metadatas: Dict[str, dict] = {}
+        self.total_length = 0
+
+    @classmethod
+    def _strip_josa(cls, word: str) -> str:
+        """어절 끝의 조사 제거 (어간이 1글자 이하로 줄어들면 유지)"""
+        for suffix in cls.JOSA_SUFFIXES:
+            if word.endswith(suffix) and len(word) - len(suffix) >= 2:
+                return word[:-len(suffix)]
+        return word
+
+    @classmethod
+    def tokenize(cls, text: str, drop_stop_words: bool = False) -> List[str]:
+        """한국어 대응 토큰화: 조사 제거 어절 + 한글 바이그램"""
+        tokens = []
+        for word in cls.TOKEN_PATTERN.findall(text.lower()):
+            if drop_stop_words and word in cls.STOP_WORDS:
+                continue
+            if not ('가' <= word[0] <= '힣'):
+                tokens.append(word)
+                continue
+            stem = cls._strip_josa(word)
+            tokens.append(stem)
+            # 복합어 부분 매칭용 글자 바이그램 (예: 출근율 → 출근, 근율)
+            if len(stem) > 2:
+                tokens.extend(stem[i:i + 2] for i in range(len(stem) - 1))
+        return tokens
+
+    # ------------------------------------------------------------------
+    # 색인 변경
+    # ------------------------------------------------------------------
+    def add(self, ids: List[str], texts: List[str], metadatas: List[dict]):
+        """청크를 색인에 추가 (같은 ID가 있으면 교체)"""
+        with self._lock:
+            for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                if chunk_id in self.doc_lengths:
+                    self._remove(chunk_id)
+                term_counts = Counter(self.tokenize(text))
+                for term, tf in term_counts.items():
+                    self.postings.setdefault(term, {})[chunk_id] = tf
+                length = sum(term_counts.values())
+                self.doc_lengths[chunk_id] = length
+                self.total_length += length
+                self.texts[chunk_id] = text
+                self.metadatas[chunk_id] = metadata or {}
+
+    def delete(self, ids: List[str]):
+        """청크를 색인에서 삭제"""
+        with self._lock:
+            for chunk_id in ids:
+                if chunk_id in self.doc_lengths:
+                    self._remove(chunk_id)
+
+    def _remove(self, chunk_id: str):
+        for term in set(self.tokenize(self.texts[chunk_id])):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(chunk_id)
+        del self.texts[chunk_id]
+        del self.metadatas[chunk_id]
+
+    def clear(self):
+        """색인 전체 삭제"""
+        with self._lock:
+            self._reset()
+            self.save()
+
+    # ------------------------------------------------------------------
+    # 검색
+    # ------------------------------------------------------------------
+    def search(self, query: str, k: int, metadata_filter: Optional[Callable[[dict], bool]] = None) -> List[Tuple[Document, float]]:
+        """BM25 점수 상위 k개 청크 반환 (질의 토큰의 posting만 순회)
+
+        metadata_filter가 있으면 조건을 만족하는 청크만 채점합니다 (청크마다 한 번만 검사).
+        """
+        self._maybe_reload()
+        query_terms = set(self.tokenize(query, drop_stop_words=True))
+
+        with self._lock:
+            n_docs = len(self.doc_lengths)
+            if n_docs == 0 or not query_terms:
+                return []
+            avg_length = self.total_length / n_docs
+
+            scores: Dict[str, float] = {}
+            allowed: Dict[str, bool] = {}
+            for term in query_terms:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, tf in postings.items():
+                    if metadata_filter is not None:
+                        if chunk_id not in allowed:
+                            allowed[chunk_id] = metadata_filter(self.metadatas[chunk_id])
+                        if not allowed[chunk_id]:
+                            continue
+                    norm = tf + self.K1 * (1 - self.B + self.B * self.doc_lengths[chunk_id] / avg_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.K1 + 1) / norm
+
+            top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [
+                (Document(page_content=self.texts[chunk_id], metadata=dict(self.metadatas[chunk_id]), id=chunk_id), score)
+                for chunk_id, score in top
+            ]
+
+    def metadata_values(self, field: str) -> Set[str]:
+        """색인된 청크의 메타데이터 값 목록 (예: relative_path → 수집된 파일 경로)"""
+        self._maybe_reload()
+        with self._lock:
+            return {metadata[field] for metadata in self.metadatas.values() if metadata.get(field)}
+
+    def ids(self) -> List[str]:
+        """색인된 청크 ID 목록"""
+        with self._lock:
+            return list(self.doc_lengths)
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    # ------------------------------------------------------------------
+    # 저장/로딩
+    # ------------------------------------------------------------------
+    def save(self):
+        """색인을 디스크에 저장 (임시 파일에 쓴 뒤 교체)"""
+        with self._lock:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.index_path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'postings': self.postings,
+                    'doc_lengths': self.doc_lengths,
+                    'texts': self.texts,
+                    'metadatas': self.metadatas,
+                }, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+            self._loaded_mtime = self.index_path.stat().st_mtime
+
+    def load(self) -> bool:
+        """디스크에서 색인 로딩 (파일이 없으면 False)"""
+        if not self.index_path.exists():
+            return False
+        with self._lock:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.postings = data['postings']
+            self.doc_lengths = data['doc_lengths']
+            self.texts = data['texts']
+            self.metadatas = data['metadatas']
+            self.total_length = sum(self.doc_lengths.values())
+            self._loaded_mtime = self.index_path.stat().st_mtime
+        return True
+
+    def _maybe_reload(self):
+        """다른 프로세스(수집 스크립트 등)가 색인을 갱신했으면 다시 로딩"""
+        try:
+            mtime = self.index_path.stat().st_mtime
+        except FileNotFoundError:
+            return
+        if mtime != self._loaded_mtime:
+            logger.info(f"[키워드] 변경된 키워드 색인 다시 로딩: {self.index_path}")
+            self.load()
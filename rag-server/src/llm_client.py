@@ -0,0 +1,368 @@
+"""LLM 호출 클라이언트 (공유 연결 풀 / 타임아웃 / 지터 재시도 / 헤징 / 동일 요청 병합)"""
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import random
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+from src.config import Config
+from src.telemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+_http_clients: Optional[tuple] = None
+
+
+def _http_timeout():
+    import httpx
+    return httpx.Timeout(Config.LLM_TIMEOUT, connect=Config.LLM_CONNECT_TIMEOUT)
+
+
+def shared_http_clients() -> tuple:
+    """프로세스 전체에서 공유하는 (동기, 비동기) httpx 클라이언트 (keep-alive 연결 풀)"""
+    global _http_clients
+    if _http_clients is None:
+        import httpx
+        limits = httpx.Limits(
+            max_connections=Config.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=Config.LLM_MAX_CONNECTIONS,
+            keepalive_expiry=Config.LLM_KEEPALIVE_SECONDS
+        )
+        _http_clients = (
+            httpx.Client(limits=limits, timeout=_http_timeout()),
+            httpx.AsyncClient(limits=limits, timeout=_http_timeout())
+        )
+    return _http_clients
+
+
+def create_chat_model():
+    """ChatOpenAI 생성 (재시도는 LLMClient가 하므로 SDK 재시도는 끔)"""
+    from langchain_openai import ChatOpenAI
+
+    http_client, http_async_client = shared_http_clients()
+    return ChatOpenAI(
+        model=Config.OPENAI_MODEL,
+        temperature=0.3,
+        api_key=Config.OPENAI_API_KEY,
+        base_url=Config.OPENAI_BASE_URL or None,
+        stream_usage=True,  # 스트리밍에서도 토큰 사용량 수신
+        timeout=_http_timeout(),
+        max_retries=0,
+        http_client=http_client,
+        http_async_client=http_async_client
+    )
+
+
+def record_llm_usage(usage: Optional[Dict], purpose: str = "answer"):
+    """LLM 호출 수 / 토큰 사용량 집계"""
+    metrics.inc("rag_llm_calls_total", purpose=purpose)
+    if usage:
+        metrics.inc("rag_llm_tokens_total", usage.get("input_tokens", 0), type="prompt", purpose=purpose)
+        metrics.inc("rag_llm_tokens_total", usage.get("output_tokens", 0), type="completion", purpose=purpose)
+
+
+def _retry_reason(error: BaseException) -> Optional[str]:
+    """재시도할 오류면 사유, 아니면 None (연결 오류 / 타임아웃 / 429 / 5xx)"""
+    try:
+        import openai
+    except ImportError:
+        return None
+    if isinstance(error, openai.APITimeoutError):
+        return "timeout"
+    if isinstance(error, openai.APIConnectionError):
+        return "connection"
+    if isinstance(error, openai.RateLimitError):
+        return "rate_limit"
+    if isinstance(error, openai.InternalServerError):
+        return "server_error"
+    return None
+
+
+def _backoff_seconds(attempt: int) -> float:
+    """지수 백오프 + full jitter (동시에 실패한 요청들이 같은 시각에 재시도하지 않도록)"""
+    cap_ms = min(Config.LLM_RETRY_MAX_MS, Config.LLM_RETRY_BASE_MS * (2 ** attempt))
+    return random.uniform(0, cap_ms) / 1000
+
+
+def _message_key(messages: Any, purpose: str) -> str:
+    """동일 요청 판정 키 (프롬프트 전체 = 질문 + 검색된 청크 + 히스토리)"""
+    if isinstance(messages, str):
+        payload = [("user", messages)]
+    else:
+        payload = [
+            (message["role"], message["content"]) if isinstance(message, dict)
+            else (message.type, message.content)
+            for message in messages
+        ]
+    raw = json.dumps([purpose, payload], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _forget_task(inflight: Dict[str, asyncio.Future], key: str, task: asyncio.Future):
+    """완료된 요청을 병합 대상에서 제거 (기다리던 호출자가 모두 취소되었어도 예외는 회수)"""
+    if inflight.get(key) is task:
+        del inflight[key]
+    if not task.cancelled():
+        task.exception()
+
+
+class _SharedStream:
+    """여러 호출자가 함께 받는 스트리밍 응답 (늦게 합류한 호출자는 처음 청크부터 다시 받음)"""
+
+    def __init__(self):
+        self.chunks: List[Any] = []
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Future] = None
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def publish(self, chunk):
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self, error: Optional[BaseException] = None):
+        self.finished = True
+        self.error = error
+        self._notify()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        index = 0
+        while True:
+            if index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+                continue
+            if self.finished:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
+class LLMClient:
+    """채팅 모델 호출 래퍼
+
+    - 같은 프롬프트(같은 질문 + 같은 청크)의 동시 요청은 LLM 호출 하나로 병합 (LLM_COALESCE)
+    - 연결 오류 / 타임아웃 / 429 / 5xx는 지터 백오프로 LLM_MAX_RETRIES번까지 재시도
+      (스트리밍은 첫 청크를 받기 전까지만)
+    - LLM_HEDGE_AFTER_MS 안에 응답(스트리밍은 첫 청크)이 없으면 같은 요청을 한 번 더 보내 먼저 온 쪽 사용
+    - 호출 수 / 토큰 사용량은 실제 LLM 호출 기준으로 한 번만 집계
+    - limiter(동시 LLM 호출 수 제한)는 실제로 호출하는 쪽만 잡고, 합류한 호출자는 결과만 기다림
+    """
+
+    def __init__(self, model=None):
+        self.model = model or create_chat_model()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._streams: Dict[str, _SharedStream] = {}
+
+    # ---- 동기 ----
+
+    def invoke(self, messages, purpose: str = "answer"):
+        """동기 호출 (재시도만 적용, 히스토리 요약 등 스레드 풀 작업용)"""
+        attempt = 0
+        while True:
+            try:
+                response = self.model.invoke(messages)
+                break
+            except Exception as e:
+                reason = _retry_reason(e)
+                if reason is None or attempt >= Config.LLM_MAX_RETRIES:
+                    raise
+                delay = _backoff_seconds(attempt)
+                self._log_retry(reason, attempt, delay, e)
+                time.sleep(delay)
+                attempt += 1
+        record_llm_usage(response.usage_metadata, purpose)
+        return response
+
+    # ---- 비동기 ----
+
+    async def ainvoke(self, messages, purpose: str = "answer", limiter: Optional[asyncio.Semaphore] = None):
+        """비동기 호출 (병합 + 헤징 + 재시도)"""
+        if not Config.LLM_COALESCE:
+            return await self._ainvoke_with_retry(messages, purpose, limiter)
+        key = _message_key(messages, purpose)
+        task = self._inflight.get(key)
+        if task is None:
+            # 먼저 요청한 호출자가 취소되어도 합류한 호출자를 위해 끝까지 실행
+            task = asyncio.ensure_future(self._ainvoke_with_retry(messages, purpose, limiter))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: _forget_task(self._inflight, key, done))
+        else:
+            metrics.inc("rag_llm_coalesced_total", mode="invoke")
+            logger.info("[LLM] 진행 중인 동일 요청에 합류 (LLM 호출 생략)")
+        return await asyncio.shield(task)
+
+    async def _ainvoke_with_retry(self, messages, purpose: str, limiter: Optional[asyncio.Semaphore]):
+        attempt = 0
+        while True:
+            try:
+                async with limiter or contextlib.nullcontext():
+                    response = await self._ainvoke_hedged(messages)
+                break
+            except Exception as e:
+                reason = _retry_reason(e)
+                if reason is None or attempt >= Config.LLM_MAX_RETRIES:
+                    raise
+                delay = _backoff_seconds(attempt)
+                self._log_retry(reason, attempt, delay, e)
+                await asyncio.sleep(delay)
+                attempt += 1
+        record_llm_usage(response.usage_metadata, purpose)
+        return response
+
+    async def _ainvoke_hedged(self, messages):
+        if Config.LLM_HEDGE_AFTER_MS <= 0:
+            return await self.model.ainvoke(messages)
+        primary = asyncio.ensure_future(self.model.ainvoke(messages))
+        done, _ = await asyncio.wait({primary}, timeout=Config.LLM_HEDGE_AFTER_MS / 1000)
+        if done:
+            return primary.result()
+
+        backup = asyncio.ensure_future(self.model.ainvoke(messages))
+        names = {primary: "primary", backup: "backup"}
+        pending = {primary, backup}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        metrics.inc("rag_llm_hedges_total", winner=names[task])
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in (primary, backup):
+                task.cancel()
+
+    # ---- 스트리밍 ----
+
+    async def astream(self, messages, purpose: str = "answer",
+                      limiter: Optional[asyncio.Semaphore] = None) -> AsyncIterator[Any]:
+        """스트리밍 호출 (같은 프롬프트의 스트림은 하나를 여러 호출자가 함께 받음)"""
+        if not Config.LLM_COALESCE:
+            async with limiter or contextlib.nullcontext():
+                async for chunk in self._astream_with_retry(messages, purpose):
+                    yield chunk
+            return
+
+        key = _message_key(messages, purpose)
+        shared = self._streams.get(key)
+        if shared is None:
+            shared = _SharedStream()
+            self._streams[key] = shared
+            shared.task = asyncio.ensure_future(self._pump(key, shared, messages, purpose, limiter))
+        else:
+            metrics.inc("rag_llm_coalesced_total", mode="stream")
+            logger.info("[LLM] 진행 중인 동일 스트리밍 요청에 합류 (LLM 호출 생략)")
+
+        shared.subscribers += 1
+        try:
+            async for chunk in shared.subscribe():
+                yield chunk
+        finally:
+            shared.subscribers -= 1
+            if shared.subscribers == 0 and not shared.finished:
+                # 받는 호출자가 모두 끊기면 LLM 스트림도 중단
+                if self._streams.get(key) is shared:
+                    del self._streams[key]
+                shared.task.cancel()
+
+    async def _pump(self, key: str, shared: _SharedStream, messages, purpose: str,
+                    limiter: Optional[asyncio.Semaphore]):
+        try:
+            async with limiter or contextlib.nullcontext():
+                async for chunk in self._astream_with_retry(messages, purpose):
+                    shared.publish(chunk)
+            shared.finish()
+        except asyncio.CancelledError:
+            shared.finish(asyncio.CancelledError())
+        except Exception as e:
+            shared.finish(e)
+        finally:
+            if self._streams.get(key) is shared:
+                del self._streams[key]
+
+    async def _astream_with_retry(self, messages, purpose: str) -> AsyncIterator[Any]:
+        usage = {"input_tokens": 0, "output_tokens": 0}
+        attempt = 0
+        while True:
+            started = False
+            try:
+                async for chunk in self._astream_hedged(messages):
+                    started = True
+                    if chunk.usage_metadata:
+                        usage["input_tokens"] += chunk.usage_metadata.get("input_tokens", 0)
+                        usage["output_tokens"] += chunk.usage_metadata.get("output_tokens", 0)
+                    yield chunk
+                break
+            except Exception as e:
+                # 이미 전달한 청크가 있으면 다시 시작할 수 없으므로 그대로 실패
+                reason = _retry_reason(e)
+                if started or reason is None or attempt >= Config.LLM_MAX_RETRIES:
+                    raise
+                delay = _backoff_seconds(attempt)
+                self._log_retry(reason, attempt, delay, e)
+                await asyncio.sleep(delay)
+                attempt += 1
+        record_llm_usage(usage, purpose)
+
+    async def _astream_hedged(self, messages) -> AsyncIterator[Any]:
+        """첫 청크가 LLM_HEDGE_AFTER_MS 안에 오지 않으면 두 번째 스트림을 열고 먼저 첫 청크를 준 쪽 사용"""
+        if Config.LLM_HEDGE_AFTER_MS <= 0:
+            async for chunk in self.model.astream(messages):
+                yield chunk
+            return
+
+        streams = {}
+        primary = self.model.astream(messages).__aiter__()
+        first = asyncio.ensure_future(primary.__anext__())
+        streams[first] = ("primary", primary)
+        done, _ = await asyncio.wait({first}, timeout=Config.LLM_HEDGE_AFTER_MS / 1000)
+        if not done:
+            backup = self.model.astream(messages).__aiter__()
+            streams[asyncio.ensure_future(backup.__anext__())] = ("backup", backup)
+
+        winner, error = None, None
+        pending = set(streams)
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None or isinstance(task.exception(), StopAsyncIteration):
+                        winner = task
+                        break
+                    error = task.exception()
+        finally:
+            for task, (_, stream) in streams.items():
+                if task is not winner:
+                    task.cancel()
+                    try:
+                        await stream.aclose()
+                    except Exception:
+                        pass
+        if winner is None:
+            raise error
+        name, stream = streams[winner]
+        if len(streams) > 1:
+            metrics.inc("rag_llm_hedges_total", winner=name)
+        if winner.exception() is not None:  # 빈 스트림
+            return
+        yield winner.result()
+        async for chunk in stream:
+            yield chunk
+
+    @staticmethod
+    def _log_retry(reason: str, attempt: int, delay: float, error: BaseException):
+        metrics.inc("rag_llm_retries_total", reason=reason)
+        logger.warning(f"[LLM] 호출 실패 ({reason}: {type(error).__name__}), "
+                       f"{delay * 1000:.0f}ms 후 재시도 ({attempt + 1}/{Config.LLM_MAX_RETRIES})")
@@ -0,0 +1,124 @@
+"""증분 수집용 파일 매니페스트 (파일별 해시/mtime/청크 ID 기록)"""
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List
+
+
+def file_hash(file_path: str) -> str:
+    """파일 내용의 SHA-256 해시"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_chunk_id(content_hash: str, chunk_index: int) -> str:
+    """파일 해시 + 청크 순번으로 결정적 청크 ID 생성 (재수집 시 같은 ID → 중복 없음)"""
+    return f"{content_hash[:16]}-{chunk_index:05d}"
+
+
+@dataclass
+class IngestPlan:
+    """디렉토리 스캔 결과: 새로 임베딩할 파일 / 삭제된 파일 / 변경 없는 파일"""
+    to_add: Dict[str, str] = field(default_factory=dict)  # 경로 -> 새 해시 (신규 + 변경)
+    changed: List[str] = field(default_factory=list)  # to_add 중 기존에 수집된 파일
+    removed: List[str] = field(default_factory=list)  # 디스크에서 사라진 파일
+    unchanged: List[str] = field(default_factory=list)
+
+
+class IngestManifest:
+    """수집된 파일의 해시/mtime/청크 ID를 JSON으로 관리
+
+    교체되거나 삭제된 파일의 기존 청크 ID는 바로 지우지 않고 pending_deletes에 모아 두었다가
+    수집 커밋 시점에 한 번에 삭제합니다 (중단되어도 다음 수집에서 이어서 삭제).
+    """
+
+    def __init__(self, manifest_path: str):
+        self.manifest_path = Path(manifest_path)
+        self.files: Dict[str, dict] = {}
+        self.pending_deletes: List[str] = []
+        self.load()
+
+    def load(self):
+        """매니페스트 로딩 (파일이 없으면 빈 상태)"""
+        if self.manifest_path.exists():
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.files = data.get('files', {})
+            self.pending_deletes = data.get('pending_deletes', [])
+
+    def save(self):
+        """매니페스트 저장 (임시 파일에 쓴 뒤 교체)"""
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'files': self.files, 'pending_deletes': self.pending_deletes}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+
+    def clear(self, existing_ids: List[str] = ()):
+        """매니페스트 초기화 (--clear 수집 시, 기존 청크는 커밋 시점에 삭제되도록 삭제 대기로 이동)"""
+        self.files = {}
+        self.pending_deletes = list(existing_ids)
+        self.save()
+
+    def plan(self, directory: str, file_paths: List[str]) -> IngestPlan:
+        """현재 파일 목록과 매니페스트를 비교하여 증분 수집 계획 생성"""
+        plan = IngestPlan()
+        current = set(file_paths)
+
+        for path in file_paths:
+            stat = os.stat(path)
+            entry = self.files.get(path)
+            # mtime/크기가 같으면 해시 계산 생략
+            if entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+                plan.unchanged.append(path)
+                continue
+            content_hash = file_hash(path)
+            if entry and entry['hash'] == content_hash:
+                # 내용은 같고 mtime만 바뀐 경우 (복사/touch)
+                entry['mtime'] = stat.st_mtime
+                entry['size'] = stat.st_size
+                plan.unchanged.append(path)
+                continue
+            if entry:
+                plan.changed.append(path)
+            plan.to_add[path] = content_hash
+
+        # 이번에 스캔한 디렉토리 아래에서 사라진 파일
+        root = str(Path(directory).absolute()).rstrip(os.sep) + os.sep
+        for path in self.files:
+            if path not in current and path.startswith(root):
+                plan.removed.append(path)
+
+        return plan
+
+    def take_pending_deletes(self) -> List[str]:
+        """커밋 시 삭제할 청크 ID를 꺼냄 (같은 내용의 다른 파일이 아직 쓰는 ID는 제외)"""
+        kept_ids = {chunk_id for entry in self.files.values() for chunk_id in entry['chunk_ids']}
+        stale_ids = [chunk_id for chunk_id in dict.fromkeys(self.pending_deletes) if chunk_id not in kept_ids]
+        self.pending_deletes = []
+        return stale_ids
+
+    def record(self, path: str, content_hash: str, chunk_ids: List[str]):
+        """파일 수집 완료 기록 (변경된 파일의 기존 청크는 삭제 대기로 이동)"""
+        stat = os.stat(path)
+        previous = self.files.get(path)
+        if previous:
+            self.pending_deletes.extend(previous['chunk_ids'])
+        self.files[path] = {
+            'hash': content_hash,
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'chunk_ids': chunk_ids,
+        }
+
+    def remove(self, path: str):
+        """삭제된 파일 기록 제거 (청크는 삭제 대기로 이동)"""
+        entry = self.files.pop(path, None)
+        if entry:
+            self.pending_deletes.extend(entry['chunk_ids'])
@@ -0,0 +1,185 @@
+"""부모 청크 저장소 (조문 단위 원문, 자식 청크 검색 결과를 조문 전체 컨텍스트로 확장할 때 사용)"""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+# 청킹 → 저장 사이에서만 자식 청크 메타데이터에 실어 보내는 부모 원문 (벡터 스토어에는 저장하지 않음)
+PARENT_CONTENT_KEY = "parent_content"
+
+# 자식 청크 메타데이터 중 부모에도 기록할 항목
+PARENT_METADATA_FIELDS = (
+    'source_file', 'file_type', 'file_path', 'relative_path', 'department', 'file_hash', 'page',
+    'chapter', 'article', 'article_title', 'parent_start', 'parent_end'
+)
+
+
+def _id_prefix(chunk_id: str) -> str:
+    """청크/부모 ID의 파일 해시 부분 (같은 파일의 청크와 부모는 같은 접두사)"""
+    return chunk_id.rsplit('-', 1)[0]
+
+
+class ParentStore:
+    """부모 청크를 JSON Lines 파일에 추가 기록하는 저장소 (스레드 안전)
+
+    저장은 배치마다 줄을 덧붙이기만 하므로 수집이 중단되어도 이미 저장된 자식 청크의 부모는 남습니다.
+    삭제는 삭제 표시 줄로 기록하고, 삭제된 줄이 살아 있는 줄보다 많아지면 파일을 다시 씁니다.
+    자식 청크가 삭제되면 같은 파일(ID 접두사)의 부모도 함께 삭제합니다.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._parents: Dict[str, dict] = {}  # 부모 ID -> {"text", "metadata"}
+        self._dead_lines = 0
+        self._signature: Optional[Tuple[int, int]] = None
+        self.load()
+
+    def __len__(self) -> int:
+        self._maybe_reload()
+        return len(self._parents)
+
+    # ---- 읽기 ----
+
+    def load(self):
+        """파일 전체를 다시 읽기 (없으면 빈 상태)"""
+        with self._lock:
+            self._parents, self._dead_lines = {}, 0
+            try:
+                stat = self.path.stat()
+            except FileNotFoundError:
+                self._signature = None
+                return
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 기록 도중 중단된 마지막 줄
+                        self._dead_lines += 1
+                        continue
+                    if record.get('deleted'):
+                        self._dead_lines += 1 + (self._parents.pop(record['id'], None) is not None)
+                    else:
+                        self._dead_lines += record['id'] in self._parents
+                        self._parents[record['id']] = {"text": record['text'], "metadata": record.get('metadata', {})}
+            self._signature = (stat.st_mtime_ns, stat.st_size)
+
+    def _maybe_reload(self):
+        """다른 프로세스(수집 작업)가 파일을 바꿨으면 다시 읽기"""
+        try:
+            stat = self.path.stat()
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            signature = None
+        if signature != self._signature:
+            self.load()
+
+    def get(self, parent_id: str) -> Optional[Document]:
+        """부모 청크 (없으면 None)"""
+        self._maybe_reload()
+        entry = self._parents.get(parent_id)
+        if entry is None:
+            return None
+        return Document(page_content=entry['text'], metadata=dict(entry['metadata']), id=parent_id)
+
+    def export(self) -> Dict[str, dict]:
+        """전체 부모 청크 (스냅샷 내보내기용)"""
+        self._maybe_reload()
+        with self._lock:
+            return dict(self._parents)
+
+    # ---- 쓰기 ----
+
+    def extract(self, metadatas: List[dict]) -> List[dict]:
+        """자식 청크 메타데이터에서 부모 원문을 떼어 저장하고, 벡터 스토어에 저장할 메타데이터 반환"""
+        parents: Dict[str, dict] = {}
+        cleaned = []
+        for metadata in metadatas:
+            if PARENT_CONTENT_KEY not in metadata:
+                cleaned.append(metadata)
+                continue
+            parent_id = metadata.get('parent_id')
+            if parent_id and parent_id not in parents:
+                parents[parent_id] = {
+                    "text": metadata[PARENT_CONTENT_KEY],
+                    "metadata": {key: metadata[key] for key in PARENT_METADATA_FIELDS if key in metadata},
+                }
+            cleaned.append({key: value for key, value in metadata.items() if key != PARENT_CONTENT_KEY})
+        if parents:
+            self.add(parents)
+        return cleaned
+
+    def add(self, parents: Dict[str, dict]):
+        """부모 청크 추가 (같은 ID면 교체)"""
+        if not parents:
+            return
+        with self._lock:
+            self._maybe_reload()
+            lines = []
+            for parent_id, entry in parents.items():
+                if self._parents.get(parent_id) == entry:
+                    continue
+                self._dead_lines += parent_id in self._parents
+                self._parents[parent_id] = entry
+                lines.append(json.dumps({"id": parent_id, **entry}, ensure_ascii=False))
+            self._append(lines)
+
+    def delete_for_chunks(self, chunk_ids: Iterable[str], live_ids: Iterable[str] = ()):
+        """삭제된 자식 청크와 같은 파일의 부모 청크 삭제 (live_ids와 같은 파일이면 유지)"""
+        prefixes = {_id_prefix(chunk_id) for chunk_id in chunk_ids}
+        if prefixes:
+            prefixes -= {_id_prefix(chunk_id) for chunk_id in live_ids}
+        if not prefixes:
+            return
+        with self._lock:
+            self._maybe_reload()
+            removed = [parent_id for parent_id in self._parents if _id_prefix(parent_id) in prefixes]
+            if not removed:
+                return
+            for parent_id in removed:
+                del self._parents[parent_id]
+            self._dead_lines += len(removed)
+            self._append([json.dumps({"id": parent_id, "deleted": True}) for parent_id in removed])
+            if self._dead_lines > max(len(self._parents), 1000):
+                self.compact()
+
+    def clear(self):
+        with self._lock:
+            self._parents, self._dead_lines = {}, 0
+            if self.path.exists():
+                self.path.unlink()
+            self._signature = None
+
+    def compact(self):
+        """살아 있는 부모 청크만 새 파일에 쓴 뒤 교체"""
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for parent_id, entry in self._parents.items():
+                    f.write(json.dumps({"id": parent_id, **entry}, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.path)
+            self._dead_lines = 0
+            stat = self.path.stat()
+            self._signature = (stat.st_mtime_ns, stat.st_size)
+            logger.info(f"[부모 청크] 저장소 정리 완료 ({len(self._parents)}개)")
+
+    def _append(self, lines: List[str]):
+        if not lines:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        stat = self.path.stat()
+        self._signature = (stat.st_mtime_ns, stat.st_size)
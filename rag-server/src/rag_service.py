@@ -1,9 +1,19 @@
-from typing import List, Dict
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, AsyncIterator, Tuple
 from langchain_core.documents import Document
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from src.config import Config
 from src.vector_store import VectorStoreManager
+from src.cache import LRUCache, SemanticAnswerCache, normalize_query
+from src.context_builder import ContextBuilder, MESSAGE_OVERHEAD_TOKENS, SESSION_SUMMARY_KEY
+from src.llm_client import LLMClient
+from src.search_filter import SearchFilter
+from src.telemetry import RequestTrace, run_in_executor, stage, stage_summary, trace_request
+
+logger = logging.getLogger(__name__)
 
 class RAGService:
     """RAG 검색 및 응답 생성 서비스"""
@@ -24,72 +34,216 @@ class RAGService:
 
 **답변:**"""
     
-    def __init__(self):
+    SUMMARY_PROMPT = """다음은 사용자와 AI 어시스턴트의 이전 대화입니다.
+이후 질문에 답하는 데 필요한 사실, 사용자의 상황과 요청을 중심으로 5문장 이내로 요약하세요.
+
+**기존 요약:**
+{previous_summary}
+
+**추가된 대화:**
+{transcript}
+
+**요약:**"""
+    
+    def __init__(self, vector_store: VectorStoreManager = None, shared_with: Optional["RAGService"] = None):
+        """shared_with: LLM / 재정렬 모델 / 스레드 풀 / 동시성 제한을 함께 쓸 서비스 (테넌트별 서비스용)"""
         Config.validate()
-        self.vector_store = VectorStoreManager()
-        self.llm = ChatOpenAI(
-            model=Config.OPENAI_MODEL,
-            temperature=0.3,
-            api_key=Config.OPENAI_API_KEY
-        )
+        self.vector_store = vector_store or VectorStoreManager()
+        self._shared_with = shared_with
+        # 공유 연결 풀 / 재시도 / 동일 요청 병합을 처리하는 LLM 클라이언트
+        self.llm = shared_with.llm if shared_with else LLMClient()
         self.prompt = ChatPromptTemplate.from_template(self.PROMPT_TEMPLATE)
-        print(f"[RAG] RAG 서비스 초기화 완료 (모델: {Config.OPENAI_MODEL})")
-    
-    def _format_documents(self, docs: List[Document]) -> str:
-        """검색된 문서를 프롬프트용 텍스트로 포맷팅"""
-        formatted = []
-        for i, doc in enumerate(docs, 1):
-            source = doc.metadata.get('source_file', 'Unknown')
-            content = doc.page_content.strip()
-            formatted.append(f"[문서 {i}: {source}]\n{content}\n")
-        return "\n".join(formatted)
-    
-    def retrieve(self, query: str, k: int = None) -> List[Document]:
-        """질문과 관련된 문서 검색 (하이브리드: 키워드 + 임베딩)"""
+        # 토큰 예산 내 프롬프트 구성 (인접 청크 병합 / 히스토리 축약)
+        self.context_builder = ContextBuilder(
+            summarizer=self._summarize_history if Config.HISTORY_SUMMARY_ENABLED else None
+        )
+        # 검색 결과 캐시 (컬렉션 버전이 바뀌면 자동 무효화)
+        self.retrieval_cache = LRUCache(
+            "retrieval",
+            Config.QUERY_CACHE_SIZE,
+            Config.QUERY_CACHE_TTL,
+            os.path.join(self.vector_store.tenant.cache_dir, "retrieval.pkl") if self.vector_store.tenant.cache_dir else None
+        )
+        # 유사 질문 답변 캐시 (같은 컨텍스트 + 히스토리 없는 질의만)
+        self.answer_cache = SemanticAnswerCache(
+            Config.ANSWER_CACHE_SIZE,
+            Config.ANSWER_CACHE_THRESHOLD,
+            Config.ANSWER_CACHE_TTL
+        )
+        
+        # 세마포어는 이벤트 루프 안에서 처음 사용할 때 생성
+        self._query_semaphore: Optional[asyncio.Semaphore] = None
+        self._llm_semaphore: Optional[asyncio.Semaphore] = None
+        if shared_with:
+            self.reranker = shared_with.reranker
+            self.executor = shared_with.executor
+            return
+        
+        # cross-encoder 재정렬 (설정 시에만 모델 로딩)
+        self.reranker = None
+        if Config.RERANKER_ENABLED:
+            from src.reranker import CrossEncoderReranker
+            self.reranker = CrossEncoderReranker()
+        
+        # 임베딩 + 벡터 검색은 CPU/IO 블로킹 작업이므로 전용 스레드 풀에서 실행
+        self.executor = ThreadPoolExecutor(
+            max_workers=Config.RAG_WORKER_THREADS,
+            thread_name_prefix="rag-worker"
+        )
+        logger.info(f"[RAG] RAG 서비스 초기화 완료 (모델: {Config.OPENAI_MODEL})")
+    
+    def _get_semaphores(self):
+        """동시 질의/LLM 호출 제한용 세마포어 반환 (공유 서비스가 있으면 그 제한을 함께 사용)"""
+        if self._shared_with is not None:
+            return self._shared_with._get_semaphores()
+        if self._query_semaphore is None:
+            self._query_semaphore = asyncio.Semaphore(Config.MAX_CONCURRENT_QUERIES)
+            self._llm_semaphore = asyncio.Semaphore(Config.MAX_CONCURRENT_LLM_CALLS)
+        return self._query_semaphore, self._llm_semaphore
+    
+    def close(self):
+        """스레드 풀 종료 및 캐시 저장 (공유 중인 스레드 풀은 소유한 서비스가 종료)"""
+        if self._shared_with is None:
+            self.executor.shutdown(wait=False)
+        self.retrieval_cache.save()
+        self.vector_store.query_embedding_cache.save()
+    
+    def get_cache_stats(self) -> Dict:
+        """캐시 적중/미스 통계"""
+        return {
+            "query_embedding": self.vector_store.query_embedding_cache.stats(),
+            "retrieval": self.retrieval_cache.stats(),
+            "answer": self.answer_cache.stats(),
+            "history_summary": self.context_builder.summary_cache.stats(),
+            "collection_version": self.vector_store.version.current()
+        }
+    
+    @staticmethod
+    def _retrieval_key(query: str, k: int, search_filter: Optional[SearchFilter]) -> tuple:
+        """검색 결과 캐시 키 (같은 질문이라도 검색 범위가 다르면 별도 항목)"""
+        return normalize_query(query), k, search_filter.cache_key() if search_filter else None
+    
+    def retrieve(self, query: str, k: int = None, search_filter: Optional[SearchFilter] = None) -> List[Document]:
+        """질문과 관련된 문서 검색 (하이브리드: BM25 키워드 + 임베딩, RRF 결합)
+        
+        search_filter가 있으면 해당 파일/형식/경로/부서의 청크 안에서만 검색합니다.
+        """
         if k is None:
             k = Config.TOP_K_RESULTS
         
-        # 임베딩 기반 검색
-        semantic_results = self.vector_store.similarity_search(query, k)
+        with stage("retrieve"):
+            cache_key, version = self._retrieval_key(query, k, search_filter), self.vector_store.version.current()
+            cached = self.retrieval_cache.get(cache_key, version)
+            if cached is not None:
+                logger.debug(f"[캐시] 검색 결과 캐시 적중: {query[:50]}")
+                return list(cached)
+            
+            candidates = self._candidate_count()
+            semantic_results = self.vector_store.similarity_search(query, candidates, search_filter)
+            keyword_results = self.vector_store.keyword_search(query, candidates, search_filter)
+            results = self._select_results(query, semantic_results, keyword_results, k)
+            self.retrieval_cache.set(cache_key, results, version)
+            return list(results)
+    
+    def retrieve_batch(self, queries: List[str], k: int = None, search_filter: Optional[SearchFilter] = None) -> List[List[Document]]:
+        """질문 여러 개 검색 (질문 순서대로 결과 반환)
+        
+        캐시에 없는 질문은 모아서 인코더 한 번 호출로 임베딩하고 벡터 검색도 한 번에 수행합니다.
+        BM25 검색과 RRF 결합/재정렬은 질문별로 실행합니다.
+        """
+        if k is None:
+            k = Config.TOP_K_RESULTS
         
-        # 키워드 기반 재순위화
-        # 질문에 포함된 주요 키워드가 많이 포함된 문서를 우선
-        keywords = self._extract_keywords(query)
-        print(f"[키워드] 추출된 키워드: {keywords}")
+        with stage("retrieve"):
+            version = self.vector_store.version.current()
+            cache_keys = [self._retrieval_key(query, k, search_filter) for query in queries]
+            results = [self.retrieval_cache.get(cache_key, version) for cache_key in cache_keys]
+            pending = [i for i, cached in enumerate(results) if cached is None]
+            if pending:
+                candidates = self._candidate_count()
+                embeddings = self.vector_store.embed_queries([queries[i] for i in pending])
+                semantic_batches = self.vector_store.similarity_search_by_vectors(embeddings, candidates, search_filter)
+                for i, semantic_results in zip(pending, semantic_batches):
+                    keyword_results = self.vector_store.keyword_search(queries[i], candidates, search_filter)
+                    results[i] = self._select_results(queries[i], semantic_results, keyword_results, k)
+                    self.retrieval_cache.set(cache_keys[i], results[i], version)
+            logger.info(f"[배치] 검색 완료: {len(queries)}개 질문 (캐시 적중 {len(queries) - len(pending)}개)")
+            return [list(docs) for docs in results]
+    
+    def _candidate_count(self) -> int:
+        """임베딩/BM25 검색 각각에서 가져올 후보 수 (재정렬 시 더 많이)"""
+        if self.reranker is None:
+            return Config.HYBRID_CANDIDATES
+        return max(Config.HYBRID_CANDIDATES, Config.RERANK_CANDIDATES)
+    
+    def _select_results(self, query: str, semantic_results: List[Document], keyword_results: List[Document], k: int) -> List[Document]:
+        """RRF로 결합 후 (설정 시) cross-encoder로 재정렬하여 상위 k개 선택
         
-        # 각 문서에 키워드 매칭 점수 부여
-        scored_docs = []
-        for i, doc in enumerate(semantic_results, 1):
-            keyword_score = sum(1 for kw in keywords if kw in doc.page_content)
-            scored_docs.append((doc, keyword_score))
-            
-            # 검색된 청크 내용 출력
-            print(f"\n[검색 {i}] 키워드 매칭: {keyword_score}개")
-            print(f"   파일: {doc.metadata.get('source_file', 'Unknown')}")
-            print(f"   내용 미리보기: {doc.page_content[:150]}...")
+        조문 단위로 수집된 경우 자식 청크를 부모(조문)로 확장하므로, 같은 조문의 자식이 겹쳐도
+        서로 다른 조문 k개가 남도록 후보를 더 많이 남긴 뒤 확장합니다.
+        """
+        depth = self._candidate_count() if len(self.vector_store.parent_store) else k
+        if self.reranker is None:
+            ranked = self._fuse_results(semantic_results, keyword_results, depth)
+        else:
+            candidates = self._fuse_results(semantic_results, keyword_results, Config.RERANK_CANDIDATES, verbose=False)
+            with stage("rerank"):
+                ranked = self.reranker.rerank(query, candidates, depth)
+        return self.vector_store.expand_to_parents(ranked, k)
+    
+    def _fuse_results(self, semantic_results: List[Document], keyword_results: List[Document], k: int, verbose: bool = True) -> List[Document]:
+        """Reciprocal Rank Fusion으로 임베딩/키워드 검색 결과 결합"""
+        scores: Dict[str, float] = {}
+        docs: Dict[str, Document] = {}
+        for results in (semantic_results, keyword_results):
+            for rank, doc in enumerate(results, 1):
+                scores[doc.id] = scores.get(doc.id, 0.0) + 1.0 / (Config.RRF_K + rank)
+                docs.setdefault(doc.id, doc)
         
-        # 키워드 매칭 점수가 높은 순으로 재정렬
-        scored_docs.sort(key=lambda x: x[1], reverse=True)
+        semantic_ranks = {doc.id: rank for rank, doc in enumerate(semantic_results, 1)}
+        keyword_ranks = {doc.id: rank for rank, doc in enumerate(keyword_results, 1)}
+        ranked_ids = sorted(scores, key=scores.get, reverse=True)[:k]
+        if not verbose or not logger.isEnabledFor(logging.DEBUG):
+            return [docs[chunk_id] for chunk_id in ranked_ids]
         
-        print(f"\n[재정렬] 키워드 매칭 점수 기준으로 재정렬 완료")
+        for i, chunk_id in enumerate(ranked_ids, 1):
+            doc = docs[chunk_id]
+            # 검색된 청크 내용 (문서 내용이 로그에 남지 않도록 debug 레벨에서만)
+            logger.debug(f"[검색 {i}] RRF 점수: {scores[chunk_id]:.4f} "
+                         f"(임베딩 순위: {semantic_ranks.get(chunk_id, '-')}, 키워드 순위: {keyword_ranks.get(chunk_id, '-')}), "
+                         f"파일: {doc.metadata.get('source_file', 'Unknown')}, "
+                         f"내용 미리보기: {doc.page_content[:150]}...")
         
-        return [doc for doc, score in scored_docs]
+        logger.debug(f"[재정렬] RRF 기준으로 {len(ranked_ids)}개 청크 선택 완료")
+        return [docs[chunk_id] for chunk_id in ranked_ids]
     
-    def _extract_keywords(self, query: str) -> List[str]:
-        """질문에서 주요 키워드 추출"""
-        # 불용어 제거 및 의미있는 키워드만 추출
-        stop_words = {'은', '는', '이', '가', '을', '를', '의', '에', '에서', '로', '으로', 
-                      '와', '과', '하고', '하는', '어떻게', '어떤', '무엇', '뭐', '알려줘', '알려주세요'}
-        words = query.split()
-        keywords = [w for w in words if len(w) > 1 and w not in stop_words]
-        return keywords
+    def _summarize_history(self, previous_summary: Optional[str], messages: List[Dict]) -> str:
+        """토큰 예산에서 제외된 이전 대화 요약 (이전 요약이 있으면 이어서 요약)"""
+        transcript = "\n".join(f"{msg['role']}: {msg['content']}" for msg in messages)
+        prompt = self.SUMMARY_PROMPT.format(
+            previous_summary=previous_summary or "(없음)",
+            transcript=transcript
+        )
+        logger.info(f"[요약] 이전 대화 {len(messages)}개 메시지 요약 중...")
+        response = self.llm.invoke(prompt, purpose="summary")
+        return response.content.strip()
     
-    def generate_answer(self, query: str, context_docs: List[Document], history: List[Dict] = None) -> Dict:
-        """검색된 문서를 기반으로 답변 생성"""
-        context = self._format_documents(context_docs)
+    @staticmethod
+    def _message_text(message) -> str:
+        return message['content'] if isinstance(message, dict) else message.content
+    
+    def _build_messages(self, query: str, context_docs: List[Document], history: List[Dict] = None) -> list:
+        """프롬프트 메시지 구성 (토큰 예산 내 컨텍스트 + 최근 대화 히스토리)"""
+        with stage("prompt_build"):
+            return self._pack_messages(query, context_docs, history)
+    
+    def _pack_messages(self, query: str, context_docs: List[Document], history: List[Dict] = None) -> list:
+        """토큰 예산에 맞춘 컨텍스트/히스토리로 메시지 생성 및 섹션별 토큰 로그"""
+        packed = self.context_builder.build(query, context_docs, history)
+        context = packed.context
         
         # 대화 히스토리가 있는 경우 메시지 직접 구성
-        if history and len(history) > 0:
+        if packed.history or packed.summary:
             messages = []
             # 시스템 프롬프트
             messages.append({
@@ -97,8 +251,15 @@ class RAGService:
                 "content": "당신은 회사 문서를 기반으로 답변하는 AI 어시스턴트입니다. 제공된 문서 내용을 참고하여 사용자의 질문에 답변하세요."
             })
             
-            # 이전 대화 히스토리 추가 (마지막 메시지 제외)
-            for msg in history[:-1]:
+            # 예산에서 제외된 이전 대화는 요약으로 대체
+            if packed.summary:
+                messages.append({
+                    "role": "system",
+                    "content": f"이전 대화 요약:\n{packed.summary}"
+                })
+            
+            # 이전 대화 히스토리 추가 (예산 안의 최근 메시지)
+            for msg in packed.history:
                 messages.append({
                     "role": msg['role'],
                     "content": msg['content']
@@ -115,18 +276,26 @@ class RAGService:
                 "role": "user",
                 "content": current_prompt
             })
-            
-            print(f"[GPT] GPT 호출 중... (질문: {query[:50]}..., 히스토리: {len(history)}개, 총 메시지: {len(messages)}개)")
         else:
             # 히스토리 없는 경우 기존 방식
             messages = self.prompt.format_messages(
                 context=context,
                 question=query
             )
-            print(f"[GPT] GPT 호출 중... (질문: {query[:50]}...)")
         
-        response = self.llm.invoke(messages)
+        counter = self.context_builder.counter
+        packed.tokens["total"] = sum(
+            counter.count(self._message_text(msg)) + MESSAGE_OVERHEAD_TOKENS for msg in messages
+        )
+        logger.info(f"[GPT] GPT 호출 중... (총 메시지: {len(messages)}개, 토큰: {packed.tokens})")
+        if packed.merged_chunks or packed.dropped_chunks or packed.dropped_messages:
+            logger.info(f"[컨텍스트] 인접 청크 병합 {packed.merged_chunks}개, 예산 초과 청크 제외 {packed.dropped_chunks}개, "
+                        f"이전 메시지 {'요약' if packed.summary else '제외'} {packed.dropped_messages}개")
         
+        return messages
+    
+    def _format_sources(self, context_docs: List[Document]) -> List[Dict]:
+        """응답용 출처 목록 생성"""
         # 고유한 파일명만 추출 (중복 제거)
         unique_sources = {}
         for doc in context_docs:
@@ -134,43 +303,286 @@ class RAGService:
             if file_name not in unique_sources:
                 unique_sources[file_name] = doc.page_content[:200] + "..."
         
+        return [
+            {"file": file_name, "content": content}
+            for file_name, content in unique_sources.items()
+        ]
+    
+    def generate_answer(self, query: str, context_docs: List[Document], history: List[Dict] = None) -> Dict:
+        """검색된 문서를 기반으로 답변 생성"""
+        messages = self._build_messages(query, context_docs, history)
+        with stage("llm"):
+            response = self.llm.invoke(messages)
+        
         return {
             "answer": response.content,
-            "sources": [
-                {"file": file_name, "content": content}
-                for file_name, content in unique_sources.items()
-            ]
+            "sources": self._format_sources(context_docs)
         }
     
-    def query(self, question: str, history: List[Dict] = None) -> Dict:
-        """RAG 전체 플로우 실행: 검색 + 답변 생성"""
-        print(f"\n{'='*80}")
-        print(f"[질의] RAG 질의 시작: {question}")
-        if history:
-            print(f"[히스토리] 이전 대화: {len(history)}개")
-        print(f"{'='*80}")
-        
-        # 1. 관련 문서 검색
-        relevant_docs = self.retrieve(question)
-        
-        if not relevant_docs:
-            return {
-                "answer": "죄송합니다. 질문과 관련된 문서를 찾을 수 없습니다.",
-                "sources": []
-            }
-        
-        # 검색된 최종 문서들 출력
-        print(f"\n{'='*80}")
-        print(f"[최종 선택] GPT에 전달될 청크 {len(relevant_docs)}개:")
-        print(f"{'='*80}")
-        for i, doc in enumerate(relevant_docs, 1):
-            print(f"\n[청크 {i}]")
-            print(f"파일: {doc.metadata.get('source_file', 'Unknown')}")
-            print(f"내용:\n{doc.page_content[:300]}...")
-            print(f"{'-'*80}")
+    async def agenerate_answer(self, query: str, context_docs: List[Document], history: List[Dict] = None) -> Dict:
+        """generate_answer의 비동기 버전 (LLM 비동기 API 사용)"""
+        # 토큰 계산 / 히스토리 요약은 블로킹 작업이므로 스레드 풀에서 실행
+        messages = await run_in_executor(self.executor, self._build_messages, query, context_docs, history)
+        _, llm_semaphore = self._get_semaphores()
+        with stage("llm"):
+            # 동시 LLM 호출 수 제한은 실제 호출에만 적용 (같은 프롬프트로 합류한 요청은 대기만)
+            response = await self.llm.ainvoke(messages, limiter=llm_semaphore)
+        
+        return {
+            "answer": response.content,
+            "sources": self._format_sources(context_docs)
+        }
+    
+    async def aretrieve(self, query: str, k: int = None, search_filter: Optional[SearchFilter] = None) -> List[Document]:
+        """retrieve의 비동기 버전 (임베딩 검색과 BM25 검색을 병렬 실행)"""
+        if k is None:
+            k = Config.TOP_K_RESULTS
+        
+        with stage("retrieve"):
+            cache_key, version = self._retrieval_key(query, k, search_filter), self.vector_store.version.current()
+            cached = self.retrieval_cache.get(cache_key, version)
+            if cached is not None:
+                logger.debug(f"[캐시] 검색 결과 캐시 적중: {query[:50]}")
+                return list(cached)
+            
+            candidates = self._candidate_count()
+            
+            async def semantic_search() -> List[Document]:
+                # 질의 임베딩은 동시 요청과 마이크로 배치로 묶이므로 기다리는 동안 스레드를 점유하지 않음
+                embedding = await self.vector_store.aembed_query(query, self.executor)
+                batches = await run_in_executor(
+                    self.executor, self.vector_store.similarity_search_by_vectors, [embedding], candidates, search_filter
+                )
+                return batches[0]
+            
+            semantic_results, keyword_results = await asyncio.gather(
+                semantic_search(),
+                run_in_executor(self.executor, self.vector_store.keyword_search, query, candidates, search_filter)
+            )
+            # 재정렬은 CPU 작업이므로 스레드 풀에서 실행
+            results = await run_in_executor(
+                self.executor, self._select_results, query, semantic_results, keyword_results, k
+            )
+            self.retrieval_cache.set(cache_key, results, version)
+            return list(results)
+    
+    @staticmethod
+    def _has_prior_turns(history: List[Dict] = None) -> bool:
+        """현재 질문 이전에 사용자 발화나 세션 요약이 있는지 (인사말만 있는 첫 질문은 제외)"""
+        return bool(history) and any(
+            msg['role'] == 'user' or (msg.get(SESSION_SUMMARY_KEY) and msg['content']) for msg in history[:-1]
+        )
+    
+    def _lookup_answer(self, question: str, relevant_docs: List[Document], history: List[Dict] = None) -> Tuple[Optional[Dict], Optional[tuple]]:
+        """답변 캐시 조회 → (캐시된 답변, 저장용 키). 멀티턴 질의는 캐시하지 않음"""
+        if Config.ANSWER_CACHE_SIZE <= 0 or self._has_prior_turns(history):
+            return None, None
         
-        # 2. 답변 생성 (대화 히스토리 포함)
-        result = self.generate_answer(question, relevant_docs, history)
-        print(f"\n[완료] RAG 답변 생성 완료\n")
+        embedding = self.vector_store.embed_query(question)
+        context_ids = [doc.id for doc in relevant_docs]
+        version = self.vector_store.version.current()
+        cached = self.answer_cache.lookup(question, embedding, context_ids, version)
+        if cached is not None:
+            logger.info("[캐시] 답변 캐시 적중 - LLM 호출 생략")
+        return cached, (embedding, context_ids, version)
+    
+    def _store_answer(self, question: str, cache_key: Optional[tuple], result: Dict):
+        """답변 캐시 저장"""
+        if cache_key is not None:
+            embedding, context_ids, version = cache_key
+            self.answer_cache.store(question, embedding, context_ids, result, version)
+    
+    def _empty_result(self) -> Dict:
+        """검색 결과가 없을 때의 기본 응답"""
+        return {
+            "answer": "죄송합니다. 질문과 관련된 문서를 찾을 수 없습니다.",
+            "sources": []
+        }
+    
+    def _log_query_start(self, question: str, history: List[Dict] = None, search_filter: Optional[SearchFilter] = None):
+        """질의 시작 로그 (질문 내용은 debug 레벨에서만)"""
+        scope = f", 검색 범위: {search_filter}" if search_filter else ""
+        logger.info(f"[질의] RAG 질의 시작 (질문 {len(question)}자, 히스토리 {len(history) if history else 0}개{scope})")
+        logger.debug(f"[질의] 질문: {question}")
+    
+    def _log_selected_docs(self, relevant_docs: List[Document]):
+        """GPT에 전달될 최종 문서 (미리보기는 debug 레벨에서만)"""
+        logger.info(f"[최종 선택] GPT에 전달될 청크 {len(relevant_docs)}개")
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+        for i, doc in enumerate(relevant_docs, 1):
+            logger.debug(f"[청크 {i}] 파일: {doc.metadata.get('source_file', 'Unknown')}, "
+                         f"내용: {doc.page_content[:300]}...")
+    
+    @staticmethod
+    def _with_timings(result: Dict, trace: RequestTrace) -> Dict:
+        """응답에 request_id와 단계별 소요 시간 추가 (캐시된 dict는 변경하지 않음)"""
+        timings = trace.timings()
+        logger.info(f"[완료] RAG 답변 생성 완료 ({stage_summary(timings)})")
+        return {**result, "request_id": trace.request_id, "timings": timings}
+    
+    def query(self, question: str, history: List[Dict] = None, request_id: Optional[str] = None,
+              search_filter: Optional[SearchFilter] = None) -> Dict:
+        """RAG 전체 플로우 실행: 검색 + 답변 생성 (결과에 request_id와 단계별 timings 포함)"""
+        with trace_request(request_id) as trace:
+            self._log_query_start(question, history, search_filter)
+            
+            # 1. 관련 문서 검색
+            relevant_docs = self.retrieve(question, search_filter=search_filter)
+            
+            if not relevant_docs:
+                return self._with_timings(self._empty_result(), trace)
+            
+            self._log_selected_docs(relevant_docs)
+            
+            # 유사 질문의 답변이 캐시에 있으면 LLM 호출 생략
+            cached, cache_key = self._lookup_answer(question, relevant_docs, history)
+            if cached is not None:
+                return self._with_timings(cached, trace)
+            
+            # 2. 답변 생성 (대화 히스토리 포함)
+            result = self.generate_answer(question, relevant_docs, history)
+            self._store_answer(question, cache_key, result)
+            return self._with_timings(result, trace)
+    
+    async def aquery(self, question: str, history: List[Dict] = None, request_id: Optional[str] = None,
+                     search_filter: Optional[SearchFilter] = None) -> Dict:
+        """query의 비동기 버전: 검색은 스레드 풀, 답변 생성은 LLM 비동기 API"""
+        query_semaphore, _ = self._get_semaphores()
+        with trace_request(request_id) as trace:
+            async with query_semaphore:
+                self._log_query_start(question, history, search_filter)
+                
+                # 1. 관련 문서 검색 (이벤트 루프를 막지 않도록 스레드 풀에서 실행)
+                relevant_docs = await self.aretrieve(question, search_filter=search_filter)
+                
+                if not relevant_docs:
+                    return self._with_timings(self._empty_result(), trace)
+                
+                self._log_selected_docs(relevant_docs)
+                
+                # 유사 질문의 답변이 캐시에 있으면 LLM 호출 생략
+                cached, cache_key = await run_in_executor(
+                    self.executor, self._lookup_answer, question, relevant_docs, history
+                )
+                if cached is not None:
+                    return self._with_timings(cached, trace)
+                
+                # 2. 답변 생성
+                result = await self.agenerate_answer(question, relevant_docs, history)
+                self._store_answer(question, cache_key, result)
+                return self._with_timings(result, trace)
+    
+    async def astream_query(self, question: str, history: List[Dict] = None, request_id: Optional[str] = None,
+                            search_filter: Optional[SearchFilter] = None) -> AsyncIterator[Dict]:
+        """스트리밍 질의: 출처 → 답변 토큰 → 완료(request_id, 단계별 타이밍) 순서로 이벤트 전달"""
+        query_semaphore, llm_semaphore = self._get_semaphores()
+        with trace_request(request_id, kind="stream") as trace:
+            async with query_semaphore:
+                self._log_query_start(question, history, search_filter)
+                
+                # 1. 검색이 끝나는 즉시 출처 전달
+                relevant_docs = await self.aretrieve(question, search_filter=search_filter)
+                
+                if not relevant_docs:
+                    empty = self._empty_result()
+                    yield {"type": "sources", "sources": []}
+                    yield {"type": "token", "content": empty["answer"]}
+                    yield {"type": "done", "request_id": trace.request_id, "timings": trace.timings()}
+                    return
+                
+                self._log_selected_docs(relevant_docs)
+                sources = self._format_sources(relevant_docs)
+                yield {"type": "sources", "sources": sources}
+                
+                # 유사 질문의 답변이 캐시에 있으면 LLM 호출 없이 한 번에 전달
+                cached, cache_key = await run_in_executor(
+                    self.executor, self._lookup_answer, question, relevant_docs, history
+                )
+                if cached is not None:
+                    yield {"type": "token", "content": cached["answer"]}
+                    yield {"type": "done", "cached": True, "request_id": trace.request_id, "timings": trace.timings()}
+                    return
+                
+                # 2. 모델이 생성하는 대로 토큰 전달
+                messages = await run_in_executor(
+                    self.executor, self._build_messages, question, relevant_docs, history
+                )
+                first_token_ms = None
+                answer_parts = []
+                with stage("llm"):
+                    async for chunk in self.llm.astream(messages, limiter=llm_semaphore):
+                        if not chunk.content:
+                            continue
+                        if first_token_ms is None:
+                            first_token_ms = trace.elapsed_ms()
+                        answer_parts.append(chunk.content)
+                        yield {"type": "token", "content": chunk.content}
+                answer = "".join(answer_parts)
+                if answer.strip():
+                    # 빈 응답은 캐시하지 않음 (다음 질의에서 다시 생성)
+                    self._store_answer(question, cache_key, {"answer": answer, "sources": sources})
+                
+                # 3. 완료 프레임 (단계별 소요 시간)
+                timings = trace.timings()
+                if first_token_ms is not None:
+                    # 빈 응답(내용 없는 스트림)이면 첫 토큰 시간 없음
+                    timings["first_token_ms"] = round(first_token_ms, 1)
+                logger.info(f"[완료] RAG 스트리밍 답변 완료 ({stage_summary(timings)})")
+                yield {"type": "done", "request_id": trace.request_id, "timings": timings}
+    
+    async def aquery_batch(self, questions: List[str], search_filter: Optional[SearchFilter] = None,
+                           request_id: Optional[str] = None) -> AsyncIterator[Dict]:
+        """배치 질의: 검색은 한 번에, 답변 생성은 BATCH_LLM_CONCURRENCY개씩 병렬, 결과는 질문 순서대로 전달
         
-        return result
+        질문마다 {"type": "result" | "error", "index", "question", ...}를 전달하고 마지막에 done 이벤트를 보냅니다.
+        대화 히스토리는 사용하지 않으며, 한 질문이 실패해도 나머지 질문은 계속 처리합니다.
+        """
+        query_semaphore, _ = self._get_semaphores()
+        with trace_request(request_id, kind="batch") as trace:
+            async with query_semaphore:
+                scope = f", 검색 범위: {search_filter}" if search_filter else ""
+                logger.info(f"[배치] 배치 질의 시작 (질문 {len(questions)}개{scope})")
+                
+                # 1. 전체 질문 검색 (임베딩 / 벡터 검색 각 한 번)
+                all_docs = await run_in_executor(self.executor, self.retrieve_batch, questions, None, search_filter)
+                
+                # 2. 답변 생성은 배치 안에서 동시 호출 수를 제한 (전체 LLM 동시성 제한도 함께 적용)
+                batch_semaphore = asyncio.Semaphore(Config.BATCH_LLM_CONCURRENCY)
+                
+                async def answer(question: str, relevant_docs: List[Document]) -> Dict:
+                    if not relevant_docs:
+                        return self._empty_result()
+                    async with batch_semaphore:
+                        cached, cache_key = await run_in_executor(
+                            self.executor, self._lookup_answer, question, relevant_docs, None
+                        )
+                        if cached is not None:
+                            return cached
+                        result = await self.agenerate_answer(question, relevant_docs)
+                        self._store_answer(question, cache_key, result)
+                        return result
+                
+                tasks = [asyncio.create_task(answer(question, docs)) for question, docs in zip(questions, all_docs)]
+                failed = 0
+                try:
+                    # 3. 앞 질문의 답변이 끝나는 대로 순서대로 전달 (뒤 질문은 그동안 계속 생성)
+                    for index, (question, task) in enumerate(zip(questions, tasks)):
+                        try:
+                            result = await task
+                        except Exception as e:
+                            failed += 1
+                            logger.exception(f"[오류] 배치 질의 {index}번 처리 중 예외 발생: {type(e).__name__}: {e}")
+                            yield {"type": "error", "index": index, "question": question,
+                                   "message": f"RAG 처리 중 오류: {str(e)}"}
+                            continue
+                        yield {"type": "result", "index": index, "question": question, **result}
+                finally:
+                    # 클라이언트 연결이 끊기면 남은 답변 생성 취소
+                    for task in tasks:
+                        task.cancel()
+                
+                timings = trace.timings()
+                logger.info(f"[완료] 배치 질의 완료 (질문 {len(questions)}개, 실패 {failed}개, {stage_summary(timings)})")
+                yield {"type": "done", "count": len(questions), "failed": failed,
+                       "request_id": trace.request_id, "timings": timings}
@@ -0,0 +1,93 @@
+"""Cross-encoder 재정렬 (질문-청크 쌍 채점, 시간 예산 초과 시 원래 순서 유지)"""
+
+import logging
+import threading
+import time
+from typing import List
+from langchain_core.documents import Document
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class CrossEncoderReranker:
+    """한국어 cross-encoder로 후보 청크를 배치 채점하여 상위 k개 선택
+
+    배치마다 경과 시간을 확인하고, 다음 배치까지 채점하면 RERANK_TIMEOUT_MS를 넘길 것으로
+    예상되면 중단하고 입력(RRF) 순서 그대로 상위 k개를 반환합니다.
+    """
+
+    def __init__(self, model_name: str = None):
+        from sentence_transformers import CrossEncoder
+
+        self.model_name = model_name or Config.RERANKER_MODEL
+        logger.info(f"[로딩] 재정렬 모델 로딩 중: {self.model_name}")
+        self.model = CrossEncoder(self.model_name, max_length=Config.RERANK_MAX_LENGTH, device='cpu')
+        self.batch_size = Config.RERANK_BATCH_SIZE
+        self.timeout_ms = Config.RERANK_TIMEOUT_MS
+        self._lock = threading.Lock()
+        self.reranked = 0
+        self.fallbacks = 0
+        self.total_ms = 0.0
+        # 첫 추론은 느리므로 로딩 시 한 번 실행
+        self.model.predict([("연차 휴가", "연차유급휴가는 15일을 부여한다.")])
+        logger.info("[완료] 재정렬 모델 로딩 완료")
+
+    def rerank(self, query: str, docs: List[Document], k: int) -> List[Document]:
+        """후보 청크 재정렬 (시간 예산 안에 채점하지 못할 배치가 있으면 입력 순서 상위 k개)"""
+        if len(docs) <= 1:
+            return docs[:k]
+
+        started = time.perf_counter()
+        scores: List[float] = []
+        for start in range(0, len(docs), self.batch_size):
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            batches_done = start // self.batch_size
+            # 지금까지의 배치당 평균 시간으로 다음 배치 완료 시각 예측
+            if batches_done and elapsed_ms * (batches_done + 1) / batches_done > self.timeout_ms:
+                return self._fallback(docs, k, elapsed_ms)
+            batch = docs[start:start + self.batch_size]
+            scores.extend(float(score) for score in self.model.predict(
+                [(query, doc.page_content) for doc in batch],
+                batch_size=self.batch_size,
+                show_progress_bar=False
+            ))
+
+        # 모든 후보를 채점했으면 예산을 조금 넘겼더라도 계산한 점수를 사용
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms > self.timeout_ms:
+            logger.debug(f"[재정렬] 마지막 배치가 시간 예산을 넘겨 완료 ({elapsed_ms:.0f}ms > {self.timeout_ms:.0f}ms)")
+
+        order = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)[:k]
+        with self._lock:
+            self.reranked += 1
+            self.total_ms += elapsed_ms
+
+        if logger.isEnabledFor(logging.DEBUG):
+            for rank, i in enumerate(order, 1):
+                doc = docs[i]
+                logger.debug(f"[재정렬 {rank}] 점수: {scores[i]:.4f} (RRF 순위: {i + 1}), "
+                             f"파일: {doc.metadata.get('source_file', 'Unknown')}, "
+                             f"내용 미리보기: {doc.page_content[:150]}...")
+        logger.debug(f"[재정렬] cross-encoder로 {len(docs)}개 후보 중 {len(order)}개 선택 ({elapsed_ms:.0f}ms)")
+        return [docs[i] for i in order]
+
+    def _fallback(self, docs: List[Document], k: int, elapsed_ms: float) -> List[Document]:
+        """시간 예산 초과: RRF 순서 그대로 사용"""
+        with self._lock:
+            self.fallbacks += 1
+            self.total_ms += elapsed_ms
+        logger.warning(f"[경고] 재정렬 시간 예산 초과 ({elapsed_ms:.0f}ms > {self.timeout_ms:.0f}ms) - RRF 순서 사용")
+        return docs[:k]
+
+    def stats(self) -> dict:
+        """재정렬 횟수 / 예산 초과 횟수 / 평균 소요 시간"""
+        calls = self.reranked + self.fallbacks
+        return {
+            "model": self.model_name,
+            "candidates": Config.RERANK_CANDIDATES,
+            "timeout_ms": self.timeout_ms,
+            "reranked": self.reranked,
+            "fallbacks": self.fallbacks,
+            "avg_ms": round(self.total_ms / calls, 1) if calls else 0.0
+        }
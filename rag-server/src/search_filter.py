@@ -0,0 +1,84 @@
+"""검색 범위 필터 (파일 / 형식 / 경로 접두사 / 부서)"""
+
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple
+
+
+def normalize_path(path: str) -> str:
+    """수집 디렉토리 기준 상대 경로 표기 통일 (구분자 '/', 앞의 './' 와 '/' 제거)"""
+    path = path.replace("\\", "/").strip()
+    while path.startswith("./"):
+        path = path[2:]
+    return path.lstrip("/")
+
+
+def _values(values: Optional[Iterable[str]]) -> Tuple[str, ...]:
+    return tuple(sorted({value.strip() for value in values or () if value and value.strip()}))
+
+
+@dataclass(frozen=True)
+class SearchFilter:
+    """검색 범위 제한 (같은 항목의 값들은 OR, 항목끼리는 AND)
+
+    청크 메타데이터(source_file, file_type, department, relative_path)와 비교하며,
+    ChromaDB where 절과 키워드 색인 필터로 각각 변환되어 검색 단계에서 바로 적용됩니다.
+    """
+    source_files: Tuple[str, ...] = ()
+    file_types: Tuple[str, ...] = ()
+    departments: Tuple[str, ...] = ()
+    path_prefix: str = ""
+
+    @classmethod
+    def create(
+        cls,
+        source_files: Optional[Iterable[str]] = None,
+        file_types: Optional[Iterable[str]] = None,
+        departments: Optional[Iterable[str]] = None,
+        path_prefix: Optional[str] = None
+    ) -> Optional["SearchFilter"]:
+        """요청 값으로 필터 생성 (조건이 하나도 없으면 None)"""
+        search_filter = cls(
+            source_files=_values(source_files),
+            # 형식은 '.pdf' 형태로 저장되어 있으므로 'pdf', 'PDF'도 허용
+            file_types=_values(f".{t.strip().lower().lstrip('.')}" for t in file_types or () if t and t.strip()),
+            departments=_values(departments),
+            path_prefix=normalize_path(path_prefix or "")
+        )
+        return None if search_filter.is_empty() else search_filter
+
+    def is_empty(self) -> bool:
+        return not (self.source_files or self.file_types or self.departments or self.path_prefix)
+
+    def matches(self, metadata: dict) -> bool:
+        """청크 메타데이터가 필터 조건을 만족하는지 (키워드 색인용)"""
+        if self.source_files and metadata.get("source_file") not in self.source_files:
+            return False
+        if self.file_types and metadata.get("file_type") not in self.file_types:
+            return False
+        if self.departments and metadata.get("department") not in self.departments:
+            return False
+        if self.path_prefix and not metadata.get("relative_path", "").startswith(self.path_prefix):
+            return False
+        return True
+
+    def to_where(self, prefix_paths: Optional[List[str]] = None) -> Optional[dict]:
+        """ChromaDB where 절 변환
+
+        ChromaDB 메타데이터 필터는 문자열 접두사 비교를 지원하지 않으므로, 경로 접두사는
+        호출자가 해당하는 relative_path 목록(prefix_paths)으로 풀어서 $in 조건으로 전달합니다.
+        """
+        conditions = []
+        for field, values in (
+            ("source_file", self.source_files),
+            ("file_type", self.file_types),
+            ("department", self.departments),
+            ("relative_path", tuple(prefix_paths or ()) if self.path_prefix else ()),
+        ):
+            if values:
+                conditions.append({field: {"$in": list(values)}})
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+    def cache_key(self) -> tuple:
+        return (self.source_files, self.file_types, self.departments, self.path_prefix)
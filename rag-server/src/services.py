@@ -0,0 +1,75 @@
+"""서버 전역 서비스 컨테이너 (임베딩 모델 / 벡터 스토어 / RAG / 수집 작업을 한 번만 생성해 공유)"""
+
+from src.embeddings import EmbeddingService
+from src.vector_store import VectorStoreManager
+from src.rag_service import RAGService
+from src.ingest_jobs import IngestJobManager
+from src.sessions import SessionStore
+from src.telemetry import metrics
+from src.tenants import TenantManager
+
+
+class ServiceContainer:
+    """질의와 수집이 같은 임베딩 모델 / ChromaDB 클라이언트 / 키워드 색인을 사용하도록 묶음
+
+    embedding_service / vector_store / rag_service는 기본 테넌트의 서비스이며,
+    다른 테넌트는 tenants에서 처음 요청될 때 로딩됩니다.
+    """
+
+    def __init__(
+        self,
+        embedding_service: EmbeddingService,
+        vector_store: VectorStoreManager,
+        rag_service: RAGService
+    ):
+        self.embedding_service = embedding_service
+        self.vector_store = vector_store
+        self.rag_service = rag_service
+        self.tenants = TenantManager(embedding_service, vector_store, rag_service)
+        self.jobs = IngestJobManager(self)
+        # 대화 세션은 테넌트와 무관하게 메모리 상한 하나를 공유 (요약은 기본 서비스의 LLM 사용)
+        self.sessions = SessionStore(
+            token_counter=rag_service.context_builder.counter,
+            summarizer=rag_service.context_builder.summarizer
+        )
+        self._processor = None
+        metrics.register_collector(self._collect_metrics)
+
+    @property
+    def processor(self):
+        """문서 프로세서 (첫 수집 때 생성)"""
+        if self._processor is None:
+            from src.document_loader import DocumentProcessor
+            self._processor = DocumentProcessor()
+        return self._processor
+
+    def _collect_metrics(self):
+        """/metrics 조회 시점의 테넌트별 컬렉션 크기 / 캐시 통계 (청크 수는 컬렉션이 바뀔 때만 다시 조회)"""
+        loaded = self.tenants.loaded()
+        yield "rag_tenants_loaded", {}, len(loaded)
+        session_stats = self.sessions.stats()
+        yield "rag_sessions_active", {}, session_stats["sessions"]
+        yield "rag_session_memory_bytes", {}, session_stats["memory_bytes"]
+        for tenant in loaded:
+            vector_store, rag_service = tenant.vector_store, tenant.rag_service
+            labels = {"tenant": tenant.config.tenant_id}
+            yield "rag_collection_chunks", labels, vector_store.document_count()
+            yield "rag_keyword_index_chunks", labels, len(vector_store.keyword_index)
+            yield "rag_collection_version", labels, vector_store.version.current()
+            caches = {
+                "query_embedding": vector_store.query_embedding_cache,
+                "retrieval": rag_service.retrieval_cache,
+                "answer": rag_service.answer_cache,
+            }
+            for name, cache in caches.items():
+                stats = cache.stats()
+                yield "rag_cache_requests_total", {**labels, "cache": name, "result": "hit"}, stats["hits"]
+                yield "rag_cache_requests_total", {**labels, "cache": name, "result": "miss"}, stats["misses"]
+                yield "rag_cache_hit_ratio", {**labels, "cache": name}, stats["hit_rate"]
+                yield "rag_cache_entries", {**labels, "cache": name}, stats["size"]
+    
+    def close(self):
+        """수집 작업 취소, 스레드 풀 정리, 캐시 저장"""
+        self.jobs.shutdown()
+        self.tenants.close()
+        self.rag_service.close()
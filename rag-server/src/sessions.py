@@ -0,0 +1,256 @@
+"""서버 측 대화 세션 (토큰 윈도우 + 누적 요약, TTL 만료, 전체 메모리 상한 LRU 제거)"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+from src.config import Config
+from src.context_builder import MESSAGE_OVERHEAD_TOKENS, SESSION_SUMMARY_KEY, TokenCounter
+from src.telemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+SESSION_OVERHEAD_BYTES = 512  # 세션 하나의 고정 메모리 사용량 근사값 (객체 / 키 / 잠금)
+
+SessionKey = Tuple[str, str]  # (테넌트 ID, 세션 ID)
+
+
+def _message_bytes(message: Dict) -> int:
+    return len(message['content'].encode('utf-8')) + len(message['role']) + 64
+
+
+@dataclass
+class ConversationSession:
+    """세션 하나의 대화 상태
+
+    messages: 토큰 윈도우 안의 최근 메시지 (프롬프트에 그대로 포함)
+    pending: 윈도우에서 밀려났지만 아직 요약에 반영되지 않은 메시지 (요약이 끝날 때까지 그대로 포함)
+    summary: pending 이전의 대화를 누적 요약한 텍스트
+    """
+    tenant_id: str
+    session_id: str
+    messages: List[Dict] = field(default_factory=list)
+    pending: List[Dict] = field(default_factory=list)
+    summary: Optional[str] = None
+    window_tokens: int = 0
+    size_bytes: int = SESSION_OVERHEAD_BYTES
+    turns: int = 0
+    created_at: float = field(default_factory=time.time)
+    last_access: float = field(default_factory=time.monotonic)
+    compacting: bool = False
+
+    def history(self, question: str) -> List[Dict]:
+        """프롬프트용 히스토리 (요약 → 요약 대기 메시지 → 최근 메시지 → 현재 질문)
+
+        맨 앞의 요약 메시지(SESSION_SUMMARY_KEY)는 요약이 아직 없어도 넣어, ContextBuilder가
+        히스토리 예산 밖의 메시지를 요청 중에 다시 요약하지 않도록 합니다 (요약은 응답 후 compact()에서).
+        """
+        history = [{"role": "system", "content": self.summary or "", SESSION_SUMMARY_KEY: True}]
+        history.extend(self.pending)
+        history.extend(self.messages)
+        history.append({"role": "user", "content": question})
+        return history
+
+    def describe(self) -> Dict:
+        return {
+            "tenant": self.tenant_id,
+            "session_id": self.session_id,
+            "turns": self.turns,
+            "messages": len(self.messages),
+            "pending_summary": len(self.pending),
+            "has_summary": bool(self.summary),
+            "window_tokens": self.window_tokens,
+            "size_bytes": self.size_bytes,
+            "created_at": self.created_at,
+            "idle_seconds": round(time.monotonic() - self.last_access, 1),
+        }
+
+
+class SessionStore:
+    """테넌트/세션 ID별 대화 상태 저장소 (스레드 안전)
+
+    - 최근 메시지는 SESSION_WINDOW_TOKENS 안에서만 유지하고, 밀려난 메시지는
+      summarizer(기존 요약, 메시지)로 누적 요약 (summarizer가 없으면 버림)
+    - SESSION_TTL 동안 사용하지 않은 세션은 만료
+    - 전체 세션의 메모리 사용량이 SESSION_MAX_MEMORY_MB를 넘으면 가장 오래 사용하지 않은 세션부터 제거
+    """
+
+    def __init__(
+        self,
+        token_counter: TokenCounter = None,
+        summarizer: Optional[Callable[[Optional[str], List[Dict]], str]] = None,
+        window_tokens: int = None,
+        ttl_seconds: float = None,
+        max_bytes: int = None
+    ):
+        self.counter = token_counter or TokenCounter()
+        self.summarizer = summarizer
+        self.window_tokens = window_tokens if window_tokens is not None else Config.SESSION_WINDOW_TOKENS
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else Config.SESSION_TTL
+        self.max_bytes = max_bytes if max_bytes is not None else int(Config.SESSION_MAX_MEMORY_MB * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[SessionKey, ConversationSession]" = OrderedDict()  # 오래 사용하지 않은 순
+        self.total_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    # ---- 조회 ----
+
+    def open(self, tenant_id: str, session_id: str, seed: Optional[List[Dict]] = None) -> ConversationSession:
+        """세션 조회 (없거나 만료되었으면 새로 생성, seed가 있으면 이전 대화로 채움)"""
+        key = (tenant_id, session_id)
+        now = time.monotonic()
+        with self._lock:
+            self._expire_locked(now)
+            session = self._sessions.get(key)
+            if session is not None:
+                self._sessions.move_to_end(key)
+                session.last_access = now
+                return session
+
+            session = ConversationSession(tenant_id=tenant_id, session_id=session_id)
+            self._sessions[key] = session
+            self.total_bytes += session.size_bytes
+            if seed:
+                # 세션이 만료/제거된 뒤 클라이언트가 히스토리를 다시 보낸 경우
+                for message in seed:
+                    self._append_locked(session, message['role'], message['content'])
+                self._slide_locked(session)
+                self._evict_locked()
+            logger.debug(f"[세션] 새 세션 생성 ({tenant_id}/{session_id}, 이전 메시지 {len(seed or [])}개)")
+            return session
+
+    def get(self, tenant_id: str, session_id: str) -> Optional[ConversationSession]:
+        """세션 조회 (없거나 만료되었으면 None, 마지막 사용 시각은 갱신하지 않음)"""
+        with self._lock:
+            self._expire_locked(time.monotonic())
+            return self._sessions.get((tenant_id, session_id))
+
+    def delete(self, tenant_id: str, session_id: str) -> bool:
+        with self._lock:
+            session = self._sessions.pop((tenant_id, session_id), None)
+            if session is None:
+                return False
+            self.total_bytes -= session.size_bytes
+            return True
+
+    # ---- 갱신 ----
+
+    def append_turn(self, session: ConversationSession, question: str, answer: str) -> bool:
+        """질문/답변 한 턴 추가 → 요약할 메시지가 생겼으면 True (compact()는 응답 후 호출)"""
+        with self._lock:
+            self._append_locked(session, "user", question)
+            self._append_locked(session, "assistant", answer)
+            session.turns += 1
+            session.last_access = time.monotonic()
+            self._slide_locked(session)
+            needs_compaction = bool(session.pending) and self.summarizer is not None and not session.compacting
+            if needs_compaction:
+                session.compacting = True
+            self._evict_locked()
+            return needs_compaction
+
+    def compact(self, session: ConversationSession):
+        """윈도우에서 밀려난 메시지를 기존 요약에 이어서 요약 (LLM 호출 중에는 잠금을 잡지 않음)"""
+        try:
+            while True:
+                with self._lock:
+                    batch, previous_summary = list(session.pending), session.summary
+                if not batch:
+                    return
+                logger.info(f"[세션] 이전 대화 {len(batch)}개 메시지 요약 ({session.tenant_id}/{session.session_id})")
+                summary = self.summarizer(previous_summary, batch)
+                with self._lock:
+                    before = session.size_bytes
+                    # 요약하는 동안 더 밀려난 메시지는 다음 반복에서 요약
+                    session.pending = session.pending[len(batch):]
+                    session.summary = summary
+                    session.size_bytes = self._session_bytes(session)
+                    if (session.tenant_id, session.session_id) in self._sessions:
+                        self.total_bytes += session.size_bytes - before
+        except Exception as e:
+            # 요약에 실패하면 대기 메시지를 버려 윈도우 크기를 유지
+            logger.warning(f"[경고] 세션 대화 요약 실패 - 요약 대기 메시지 제외: {type(e).__name__}: {e}")
+            with self._lock:
+                before = session.size_bytes
+                session.pending = []
+                session.size_bytes = self._session_bytes(session)
+                if (session.tenant_id, session.session_id) in self._sessions:
+                    self.total_bytes += session.size_bytes - before
+        finally:
+            session.compacting = False
+
+    def _append_locked(self, session: ConversationSession, role: str, content: str):
+        message = {"role": role, "content": content}
+        session.messages.append(message)
+        session.window_tokens += self.counter.count(content) + MESSAGE_OVERHEAD_TOKENS
+        size = _message_bytes(message)
+        session.size_bytes += size
+        if (session.tenant_id, session.session_id) in self._sessions:
+            self.total_bytes += size
+
+    def _slide_locked(self, session: ConversationSession):
+        """토큰 윈도우를 넘는 오래된 메시지를 요약 대기열로 이동 (요약기가 없으면 버림)"""
+        while len(session.messages) > 1 and session.window_tokens > self.window_tokens:
+            message = session.messages.pop(0)
+            session.window_tokens -= self.counter.count(message['content']) + MESSAGE_OVERHEAD_TOKENS
+            if self.summarizer is not None:
+                session.pending.append(message)
+            else:
+                size = _message_bytes(message)
+                session.size_bytes -= size
+                if (session.tenant_id, session.session_id) in self._sessions:
+                    self.total_bytes -= size
+
+    @staticmethod
+    def _session_bytes(session: ConversationSession) -> int:
+        size = SESSION_OVERHEAD_BYTES + len((session.summary or "").encode('utf-8'))
+        return size + sum(_message_bytes(message) for message in session.messages + session.pending)
+
+    # ---- 만료 / 제거 ----
+
+    def _remove_locked(self, key: SessionKey, reason: str):
+        session = self._sessions.pop(key)
+        self.total_bytes -= session.size_bytes
+        metrics.inc("rag_session_evictions_total", reason=reason)
+
+    def _expire_locked(self, now: float):
+        """TTL 만료 세션 제거 (마지막 사용 순서로 정렬되어 있으므로 앞에서부터 확인)"""
+        if self.ttl_seconds <= 0:
+            return
+        while self._sessions:
+            key, session = next(iter(self._sessions.items()))
+            if now - session.last_access < self.ttl_seconds:
+                break
+            self._remove_locked(key, "ttl")
+
+    def _evict_locked(self):
+        """메모리 상한 초과 시 가장 오래 사용하지 않은 세션부터 제거 (최근 사용 세션 하나는 유지)"""
+        evicted = 0
+        while self.total_bytes > self.max_bytes and len(self._sessions) > 1:
+            self._remove_locked(next(iter(self._sessions)), "memory")
+            evicted += 1
+        if evicted:
+            logger.info(f"[세션] 메모리 상한 초과로 세션 {evicted}개 제거 "
+                        f"(사용량 {self.total_bytes / 1024 / 1024:.1f}MB / {self.max_bytes / 1024 / 1024:.0f}MB)")
+
+    def cleanup(self) -> int:
+        """만료 세션 정리 → 남은 세션 수"""
+        with self._lock:
+            self._expire_locked(time.monotonic())
+            return len(self._sessions)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._expire_locked(time.monotonic())
+            return {
+                "sessions": len(self._sessions),
+                "memory_bytes": self.total_bytes,
+                "max_memory_bytes": self.max_bytes,
+                "window_tokens": self.window_tokens,
+                "ttl_seconds": self.ttl_seconds,
+                "summary_enabled": self.summarizer is not None,
+            }
@@ -0,0 +1,257 @@
+"""벡터 스토어 스냅샷 내보내기/가져오기 (Arrow IPC / Parquet, 재임베딩 없음)
+
+청크 ID / 본문 / 메타데이터 / 임베딩(float32 또는 float16)을 열 단위 파일 하나로 저장합니다.
+Arrow IPC 파일(.arrow)은 메모리 매핑으로 읽으므로 가져오기 시 전체를 메모리에 올리지 않습니다.
+
+    python -m src.snapshot export snapshot.arrow [--dtype=float16] [--tenant=ID]
+    python -m src.snapshot import snapshot.arrow [--replace] [--force] [--tenant=ID]
+"""
+
+import json
+import logging
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, Optional
+import numpy as np
+from src.config import Config
+from src.manifest import IngestManifest
+from src.telemetry import setup_logging
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT_VERSION = "1"
+EXPORT_PAGE_SIZE = 1000  # 내보내기 시 벡터 스토어에서 한 번에 읽을 청크 수
+DTYPES = {"float32": np.float32, "float16": np.float16}
+
+
+def _is_parquet(path: str) -> bool:
+    return Path(path).suffix.lower() in (".parquet", ".pq")
+
+
+def _schema(dim: int, dtype: str, metadata: dict):
+    import pyarrow as pa
+
+    value_type = pa.float16() if dtype == "float16" else pa.float32()
+    return pa.schema(
+        [
+            pa.field("id", pa.string()),
+            pa.field("document", pa.string()),
+            pa.field("metadata", pa.string()),  # JSON (청크마다 키가 달라서 문자열로 저장)
+            pa.field("embedding", pa.list_(value_type, dim)),
+        ],
+        metadata={key: str(value) for key, value in metadata.items()}
+    )
+
+
+def _iter_pages(vector_store) -> Iterator[dict]:
+    """컬렉션을 EXPORT_PAGE_SIZE 단위로 읽기 (커밋 전 청크 제외)"""
+    hidden = vector_store._hidden_ids
+    offset = 0
+    while True:
+        page = vector_store.backend.get(
+            include=["documents", "metadatas", "embeddings"],
+            limit=EXPORT_PAGE_SIZE,
+            offset=offset
+        )
+        if not page["ids"]:
+            return
+        offset += len(page["ids"])
+        if hidden:
+            keep = [i for i, chunk_id in enumerate(page["ids"]) if chunk_id not in hidden]
+            page = {key: [page[key][i] for i in keep] for key in ("ids", "documents", "metadatas", "embeddings")}
+        yield page
+
+
+def export_snapshot(vector_store, path: str, dtype: str = "float32") -> dict:
+    """컬렉션 전체를 스냅샷 파일로 저장 (확장자가 .parquet면 Parquet, 그 외 Arrow IPC)"""
+    import pyarrow as pa
+
+    if dtype not in DTYPES:
+        raise ValueError(f"지원하지 않는 임베딩 형식: {dtype} (float32 | float16)")
+
+    started = time.perf_counter()
+    tenant = vector_store.tenant
+    manifest = IngestManifest(tenant.manifest_path)
+    metadata = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "tenant": tenant.tenant_id,
+        "collection_name": tenant.collection_name,
+        "embedding_model": vector_store.embedding_service.model_name,
+        "embedding_dtype": dtype,
+        "exported_at": datetime.now().isoformat(timespec="seconds"),
+        # 가져온 뒤 증분 수집이 변경 없는 파일을 다시 임베딩하지 않도록 매니페스트도 함께 저장
+        "ingest_manifest": json.dumps({"files": manifest.files}, ensure_ascii=False),
+        # 조문 단위 수집의 부모 청크 (자식 청크 메타데이터에는 parent_id만 있음)
+        "parent_chunks": json.dumps(vector_store.parent_store.export(), ensure_ascii=False),
+    }
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    writer = None
+    total = 0
+    try:
+        for page in _iter_pages(vector_store):
+            if not page["ids"]:
+                continue
+            embeddings = np.asarray(page["embeddings"], dtype=DTYPES[dtype])
+            dim = embeddings.shape[1]
+            if writer is None:
+                schema = _schema(dim, dtype, {**metadata, "dimension": dim})
+                if _is_parquet(path):
+                    import pyarrow.parquet as pq
+                    writer = pq.ParquetWriter(path, schema)
+                else:
+                    writer = pa.ipc.new_file(path, schema)
+            batch = pa.record_batch(
+                [
+                    pa.array(page["ids"], pa.string()),
+                    pa.array(page["documents"], pa.string()),
+                    pa.array([json.dumps(m or {}, ensure_ascii=False) for m in page["metadatas"]], pa.string()),
+                    pa.FixedSizeListArray.from_arrays(pa.array(embeddings.reshape(-1)), dim),
+                ],
+                schema=schema
+            )
+            if _is_parquet(path):
+                writer.write_batch(batch)
+            else:
+                writer.write(batch)
+            total += len(page["ids"])
+            logger.info(f"[내보내기] {total}개 청크 저장")
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if total == 0:
+        raise ValueError(f"내보낼 청크가 없습니다 (컬렉션: {tenant.collection_name})")
+
+    elapsed = time.perf_counter() - started
+    size_mb = Path(path).stat().st_size / 1024 / 1024
+    logger.info(f"[완료] 스냅샷 내보내기 완료: {path} ({total}개 청크, {size_mb:.1f}MB, {elapsed:.1f}초)")
+    return {"path": str(path), "chunks": total, "size_mb": round(size_mb, 1), "seconds": round(elapsed, 2)}
+
+
+def _collection_dimension(vector_store) -> Optional[int]:
+    """저장된 임베딩 차원 (빈 컬렉션이면 None)"""
+    page = vector_store.backend.get(include=["embeddings"], limit=1)
+    if not page["ids"]:
+        return None
+    return len(page["embeddings"][0])
+
+
+def _open_batches(path: str):
+    """스냅샷 스키마와 레코드 배치 반복자 (Arrow IPC는 메모리 매핑)"""
+    import pyarrow as pa
+
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(path, memory_map=True)
+        return parquet_file.schema_arrow, parquet_file.iter_batches(batch_size=Config.EMBED_BATCH_SIZE * 8)
+    reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+    return reader.schema, (reader.get_batch(i) for i in range(reader.num_record_batches))
+
+
+def import_snapshot(vector_store, path: str, replace: bool = False, force: bool = False) -> dict:
+    """스냅샷의 청크를 임베딩 없이 그대로 저장
+
+    가져오는 동안 새 청크는 검색에서 숨겼다가 끝나면 한 번에 반영합니다.
+    replace=True면 스냅샷에 없는 기존 청크를 삭제하고 수집 매니페스트도 스냅샷 것으로 교체하며,
+    아니면 로컬 매니페스트에 없는 파일 항목만 스냅샷에서 추가합니다.
+    force=False면 임베딩 모델이 다른 스냅샷은 거부합니다 (벡터 공간이 달라 검색 결과가 무의미).
+    """
+    started = time.perf_counter()
+    schema, batches = _open_batches(path)
+    info = {key.decode(): value.decode() for key, value in (schema.metadata or {}).items()}
+    model = vector_store.embedding_service.model_name
+    if info.get("embedding_model") != model and not force:
+        raise ValueError(f"스냅샷 임베딩 모델({info.get('embedding_model')})이 현재 모델({model})과 다릅니다. "
+                         f"--force로 강제할 수 있습니다.")
+
+    dim = int(info["dimension"])
+    # 차원이 다르면 저장 도중 백엔드에서 실패하므로 가져오기 전에 거부 (--force와 무관)
+    existing_dim = _collection_dimension(vector_store)
+    if existing_dim is not None and existing_dim != dim:
+        raise ValueError(f"스냅샷 임베딩 차원({dim})이 현재 컬렉션 차원({existing_dim})과 다릅니다. "
+                         f"컬렉션을 초기화한 뒤 가져오세요.")
+    imported_ids: List[str] = []
+    vector_store.parent_store.add(json.loads(info.get("parent_chunks") or "{}"))
+    vector_store.begin_staging()
+    try:
+        for batch in batches:
+            for start in range(0, batch.num_rows, Config.EMBED_BATCH_SIZE):
+                rows = batch.slice(start, Config.EMBED_BATCH_SIZE)
+                ids = rows.column("id").to_pylist()
+                # 고정 길이 리스트의 값 버퍼를 (행 수, 차원) 행렬로 (Arrow IPC는 복사 없이 매핑된 메모리를 읽음)
+                embeddings = rows.column("embedding").flatten().to_numpy(zero_copy_only=False).reshape(-1, dim)
+                vector_store.upsert_embeddings(
+                    ids,
+                    embeddings.astype(np.float32).tolist(),
+                    rows.column("document").to_pylist(),
+                    [json.loads(m) for m in rows.column("metadata").to_pylist()]
+                )
+                imported_ids.extend(ids)
+            logger.info(f"[가져오기] {len(imported_ids)}개 청크 저장")
+    except BaseException:
+        # 오류/중단 시 가져온 청크까지만 반영
+        vector_store.commit_staging([])
+        raise
+
+    stale_ids: List[str] = []
+    if replace:
+        imported = set(imported_ids)
+        stale_ids = [chunk_id for chunk_id in vector_store.all_ids() if chunk_id not in imported]
+    vector_store.commit_staging(stale_ids)
+
+    # 청크를 가져왔으면 매니페스트도 반영 (다음 증분 수집에서 같은 파일을 다시 임베딩하지 않도록)
+    if imported_ids and info.get("ingest_manifest"):
+        manifest = IngestManifest(vector_store.tenant.manifest_path)
+        snapshot_files = json.loads(info["ingest_manifest"]).get("files", {})
+        if replace:
+            manifest.files = snapshot_files
+            manifest.pending_deletes = []
+        else:
+            # 로컬 매니페스트에 없는 파일만 추가 (로컬에서 수집한 파일 정보는 유지)
+            for path, entry in snapshot_files.items():
+                manifest.files.setdefault(path, entry)
+        manifest.save()
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"[완료] 스냅샷 가져오기 완료: {len(imported_ids)}개 청크, 삭제 {len(stale_ids)}개 ({elapsed:.1f}초)")
+    return {
+        "path": str(path),
+        "chunks": len(imported_ids),
+        "deleted_chunks": len(stale_ids),
+        "embedding_model": info.get("embedding_model"),
+        "exported_at": info.get("exported_at"),
+        "seconds": round(elapsed, 2)
+    }
+
+
+def _option(name: str) -> Optional[str]:
+    return next((arg.split("=", 1)[1] for arg in sys.argv[2:] if arg.startswith(f"--{name}=")), None)
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if len(args) != 2 or args[0] not in ("export", "import"):
+        print(__doc__)
+        sys.exit(1)
+    command, snapshot_path = args
+
+    setup_logging()
+    from src.embeddings import EmbeddingService
+    from src.tenants import load_tenants
+    from src.vector_store import VectorStoreManager
+
+    tenant_id = _option("tenant") or Config.DEFAULT_TENANT
+    tenants = load_tenants()
+    if tenant_id not in tenants:
+        logger.error(f"[오류] 등록되지 않은 테넌트: {tenant_id} (TENANTS_FILE 확인)")
+        sys.exit(1)
+    # 내보내기/가져오기는 저장된 임베딩만 다루므로 인코더는 로딩하지 않음 (모델 이름은 테넌트 설정 기준)
+    tenant = tenants[tenant_id]
+    store = VectorStoreManager(EmbeddingService(tenant.embedding_model, load_model=False), tenant=tenant)
+    if command == "export":
+        export_snapshot(store, snapshot_path, dtype=_option("dtype") or "float32")
+    else:
+        import_snapshot(store, snapshot_path, replace="--replace" in sys.argv, force="--force" in sys.argv)
@@ -0,0 +1,373 @@
+"""구조화 로깅 / 요청별 단계 시간 측정 / 지연 시간 히스토그램 집계"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from src.config import Config
+
+
+# ----------------------------------------------------------------------
+# 요청별 단계 시간
+# ----------------------------------------------------------------------
+class RequestTrace:
+    """요청 하나의 단계별 소요 시간 (같은 단계가 여러 번 실행되면 합산)"""
+
+    def __init__(self, request_id: Optional[str] = None):
+        self.request_id = request_id or uuid.uuid4().hex[:12]
+        self.stages: Dict[str, float] = {}
+        self._started = time.perf_counter()
+
+    def add(self, name: str, elapsed_ms: float):
+        self.stages[name] = self.stages.get(name, 0.0) + elapsed_ms
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._started) * 1000
+
+    def timings(self) -> Dict[str, float]:
+        """응답용 단계별 시간 ({단계}_ms + total_ms)"""
+        timings = {f"{name}_ms": round(ms, 1) for name, ms in self.stages.items()}
+        timings["total_ms"] = round(self.elapsed_ms(), 1)
+        return timings
+
+
+_current_trace: "contextvars.ContextVar[Optional[RequestTrace]]" = contextvars.ContextVar(
+    "rag_request_trace", default=None
+)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def trace_request(request_id: Optional[str] = None, kind: str = "query") -> Iterator[RequestTrace]:
+    """요청 추적 시작 (블록 안의 stage()와 로그에 request_id 연결, 종료 시 지표 집계)"""
+    trace = RequestTrace(request_id)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        metrics.observe_request(kind, trace)
+        try:
+            _current_trace.reset(token)
+        except ValueError:
+            # 스트리밍 응답처럼 다른 컨텍스트에서 종료된 경우
+            _current_trace.set(None)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """단계 시간 측정 (현재 요청에 기록 + 단계별 히스토그램에 집계)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(name, elapsed_ms)
+        metrics.observe_stage(name, elapsed_ms)
+
+
+def run_in_executor(executor, func, *args) -> "asyncio.Future":
+    """현재 요청 컨텍스트(request_id, 단계 기록)를 유지한 채 스레드 풀에서 실행"""
+    loop = asyncio.get_running_loop()
+    return loop.run_in_executor(executor, contextvars.copy_context().run, func, *args)
+
+
+# ----------------------------------------------------------------------
+# 지표
+# ----------------------------------------------------------------------
+class Histogram:
+    """고정 버킷 히스토그램 (기본은 지연 시간 ms, Prometheus 출력 시 초로 변환)
+
+    buckets를 지정하면 배치 크기처럼 단위 없는 값의 분포로 집계합니다.
+    """
+
+    BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+    def __init__(self, buckets: Optional[Tuple[float, ...]] = None):
+        self._lock = threading.Lock()
+        self.buckets = buckets or self.BUCKETS_MS
+        self.is_time = buckets is None
+        self.counts = [0] * (len(self.buckets) + 1)  # 마지막 칸 = +Inf
+        self.count = 0
+        self.sum_ms = 0.0
+
+    def observe(self, value_ms: float):
+        index = bisect_left(self.buckets, value_ms)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum_ms += value_ms
+
+    def percentile(self, q: float) -> Optional[float]:
+        """버킷 안에서 선형 보간한 백분위수 근사값"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= target:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    return float(lower)
+                upper = self.buckets[index]
+                return round(lower + (upper - lower) * (target - seen) / bucket_count, 1)
+            seen += bucket_count
+        return None
+
+    def snapshot(self) -> dict:
+        cumulative, buckets = 0, {}
+        for bound, bucket_count in zip(self.buckets + ("+Inf",), self.counts):
+            cumulative += bucket_count
+            buckets[f"le_{bound}"] = cumulative
+        unit = "_ms" if self.is_time else ""
+        return {
+            "count": self.count,
+            f"sum{unit}": round(self.sum_ms, 1),
+            f"avg{unit}": round(self.sum_ms / self.count, 1) if self.count else None,
+            f"p50{unit}": self.percentile(0.50),
+            f"p95{unit}": self.percentile(0.95),
+            f"p99{unit}": self.percentile(0.99),
+            "buckets": buckets,
+        }
+
+
+# 지표 이름 -> (유형, 설명). Prometheus 출력 시 HELP/TYPE으로 사용
+METRIC_HELP: Dict[str, Tuple[str, str]] = {
+    "rag_http_requests_total": ("counter", "HTTP 요청 수 (엔드포인트/메서드/상태 코드별)"),
+    "rag_http_requests_in_flight": ("gauge", "처리 중인 HTTP 요청 수"),
+    "rag_http_request_duration_seconds": ("histogram", "HTTP 응답 시간 (스트리밍은 응답 시작까지)"),
+    "rag_query_duration_seconds": ("histogram", "RAG 질의 전체 소요 시간"),
+    "rag_stage_duration_seconds": ("histogram", "단계별 소요 시간 (embed, vector_search, keyword_search, rerank, prompt_build, llm, ingest_*)"),
+    "rag_llm_calls_total": ("counter", "LLM 호출 수"),
+    "rag_llm_tokens_total": ("counter", "LLM 토큰 사용량 (prompt/completion)"),
+    "rag_llm_coalesced_total": ("counter", "진행 중인 동일 프롬프트 요청에 합류하여 생략한 LLM 호출 수 (invoke/stream)"),
+    "rag_llm_retries_total": ("counter", "LLM 호출 재시도 수 (사유별: timeout/connection/rate_limit/server_error)"),
+    "rag_llm_hedges_total": ("counter", "헤징 요청을 보낸 LLM 호출 수 (먼저 응답한 쪽: primary/backup)"),
+    "rag_cache_requests_total": ("counter", "캐시 조회 수 (hit/miss)"),
+    "rag_cache_hit_ratio": ("gauge", "캐시 적중률"),
+    "rag_cache_entries": ("gauge", "캐시 항목 수"),
+    "rag_ingest_chunks_total": ("counter", "수집 시 임베딩/저장한 청크 수"),
+    "rag_ingest_batches_total": ("counter", "수집 시 임베딩/저장한 배치 수"),
+    "rag_ingest_chunks_per_second": ("gauge", "최근 수집 작업의 임베딩 처리량"),
+    "rag_ingest_jobs_total": ("counter", "종료된 수집 작업 수 (상태별)"),
+    "rag_collection_chunks": ("gauge", "벡터 스토어에 저장된 청크 수"),
+    "rag_keyword_index_chunks": ("gauge", "키워드 색인에 저장된 청크 수"),
+    "rag_collection_version": ("gauge", "컬렉션 버전 (수집으로 변경될 때마다 증가)"),
+    "rag_tenants_loaded": ("gauge", "메모리에 올라와 있는 테넌트 수"),
+    "rag_tenant_loads_total": ("counter", "테넌트 로딩 수"),
+    "rag_tenant_unloads_total": ("counter", "테넌트 언로드 수 (사유별: capacity/idle)"),
+    "rag_sessions_active": ("gauge", "서버에 저장된 대화 세션 수"),
+    "rag_session_memory_bytes": ("gauge", "대화 세션 메모리 사용량 근사값 (바이트)"),
+    "rag_session_evictions_total": ("counter", "제거된 대화 세션 수 (사유별: ttl/memory)"),
+    "rag_embed_batch_size": ("histogram", "질의 임베딩 마이크로 배치 크기 (인코더 호출 한 번에 묶인 질문 수)"),
+}
+
+# 시간이 아닌 값의 히스토그램 버킷 (그 외 히스토그램은 지연 시간 ms 버킷)
+VALUE_BUCKETS: Dict[str, Tuple[float, ...]] = {
+    "rag_embed_batch_size": (1, 2, 4, 8, 16, 32, 64, 128),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    escaped = (
+        f'{name}="' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for name, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class MetricsRegistry:
+    """카운터 / 게이지 / 지연 시간 히스토그램 집계
+
+    컬렉션 크기나 캐시 통계처럼 다른 객체가 가진 값은 collector로 등록해 두고
+    조회(스크레이프) 시점에 읽습니다.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, LabelKey], Histogram] = {}
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+        self._gauges: Dict[Tuple[str, LabelKey], float] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, Dict[str, object], float]]]] = []
+
+    def observe(self, name: str, value_ms: float, **labels):
+        key = (name, _label_key(labels))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram(VALUE_BUCKETS.get(name)))
+        histogram.observe(value_ms)
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def add_gauge(self, name: str, delta: float, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0.0) + delta
+
+    def register_collector(self, collector: Callable[[], Iterable[Tuple[str, Dict[str, object], float]]]):
+        """조회 시점에 (지표 이름, 라벨, 값)을 반환하는 함수 등록"""
+        self._collectors.append(collector)
+
+    def observe_stage(self, name: str, elapsed_ms: float):
+        self.observe("rag_stage_duration_seconds", elapsed_ms, stage=name)
+
+    def observe_request(self, kind: str, trace: RequestTrace):
+        self.observe("rag_query_duration_seconds", trace.elapsed_ms(), kind=kind)
+
+    def _collect(self) -> Dict[Tuple[str, LabelKey], float]:
+        """collector 값 수집 (실패한 collector는 건너뜀)"""
+        values = {}
+        for collector in list(self._collectors):
+            try:
+                for name, labels, value in collector():
+                    values[(name, _label_key(labels))] = value
+            except Exception as e:
+                logging.getLogger(__name__).warning(f"[경고] 지표 수집 실패: {e}")
+        return values
+
+    def snapshot(self) -> dict:
+        """JSON용 요약 (백분위수 포함)"""
+        def label_text(labels: LabelKey) -> str:
+            return ",".join(f"{name}={value}" for name, value in labels) or "-"
+
+        with self._lock:
+            histograms = dict(self._histograms)
+            scalars = {**self._counters, **self._gauges}
+        scalars.update(self._collect())
+
+        def histograms_of(metric: str) -> dict:
+            return {
+                ",".join(value for _, value in labels) or "-": histogram.snapshot()
+                for (name, labels), histogram in sorted(histograms.items())
+                if name == metric
+            }
+
+        return {
+            "requests": histograms_of("rag_query_duration_seconds"),
+            "stages": histograms_of("rag_stage_duration_seconds"),
+            "http": histograms_of("rag_http_request_duration_seconds"),
+            "embed_batch_size": histograms_of("rag_embed_batch_size"),
+            "values": {
+                f"{name}{{{label_text(labels)}}}": value
+                for (name, labels), value in sorted(scalars.items())
+            },
+        }
+
+    def render_prometheus(self) -> str:
+        """Prometheus 텍스트 포맷 (시간은 초 단위)"""
+        with self._lock:
+            histograms = dict(self._histograms)
+            scalars = {**self._counters, **self._gauges}
+        scalars.update(self._collect())
+
+        families: Dict[str, List[str]] = {}
+        for (name, labels), value in sorted(scalars.items()):
+            families.setdefault(name, []).append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for (name, labels), histogram in sorted(histograms.items()):
+            lines = families.setdefault(name, [])
+            with histogram._lock:
+                counts, total, sum_ms = list(histogram.counts), histogram.count, histogram.sum_ms
+            cumulative = 0
+            scale = 1000 if histogram.is_time else 1
+            for bound, bucket_count in zip(histogram.buckets + (None,), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound is None else _format_value(bound / scale)
+                lines.append(f"{name}_bucket{_format_labels(labels, (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(round(sum_ms / scale, 6))}")
+            lines.append(f"{name}_count{_format_labels(labels)} {total}")
+
+        output = []
+        for name in sorted(families):
+            metric_type, help_text = METRIC_HELP.get(name, ("untyped", name))
+            output.append(f"# HELP {name} {help_text}")
+            output.append(f"# TYPE {name} {metric_type}")
+            output.extend(families[name])
+        return "\n".join(output) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+# ----------------------------------------------------------------------
+# 로깅
+# ----------------------------------------------------------------------
+class _RequestIdFilter(logging.Filter):
+    """로그 레코드에 현재 요청 ID 추가"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace = _current_trace.get()
+        record.request_id = trace.request_id if trace else "-"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """한 줄 JSON 로그 (수집기에서 파싱용)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
+
+
+def setup_logging(level: Optional[str] = None, fmt: Optional[str] = None):
+    """루트 로거 설정 (LOG_LEVEL, LOG_FORMAT=text|json). 여러 번 호출해도 핸들러는 하나만 유지"""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if getattr(handler, "_rag_handler", False):
+            root.removeHandler(handler)
+
+    handler = logging.StreamHandler()
+    handler._rag_handler = True
+    handler.addFilter(_RequestIdFilter())
+    if (fmt or Config.LOG_FORMAT) == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(
+            "%(asctime)s %(levelname)-5s [%(request_id)s] %(name)s: %(message)s", "%H:%M:%S"
+        ))
+    root.addHandler(handler)
+    root.setLevel((level or Config.LOG_LEVEL).upper())
+
+
+def stage_summary(timings: Dict[str, float]) -> str:
+    """로그용 단계별 시간 요약 (값이 없는 단계는 제외)"""
+    return ", ".join(f"{name[:-3]}={ms:.0f}ms" for name, ms in timings.items() if ms is not None)
+
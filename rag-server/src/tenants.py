@@ -0,0 +1,272 @@
+"""멀티 테넌트 (회사/계열사별 컬렉션 + 임베딩 모델) 설정 및 지연 로딩"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, TYPE_CHECKING
+from src.config import Config
+from src.telemetry import metrics
+
+if TYPE_CHECKING:
+    from src.rag_service import RAGService
+    from src.vector_store import VectorStoreManager
+
+logger = logging.getLogger(__name__)
+
+# 테넌트 ID는 경로와 컬렉션 이름에 쓰이므로 영문/숫자/_/-만 허용
+TENANT_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,63}")
+
+
+class UnknownTenantError(KeyError):
+    """등록되지 않은 테넌트"""
+
+
+@dataclass(frozen=True)
+class TenantConfig:
+    """테넌트별 컬렉션 / 임베딩 모델 / 키워드 색인·수집 매니페스트 저장 위치"""
+    tenant_id: str
+    collection_name: str
+    embedding_model: str
+    keyword_index_path: str
+    version_path: str
+    manifest_path: str
+    checkpoint_path: str
+    cache_dir: str = ""  # 질의 캐시 저장 위치 (비어 있으면 저장하지 않음)
+    parent_store_path: str = ""  # 부모 청크 저장 위치 (CHUNK_STRATEGY=article)
+
+
+def default_tenant() -> TenantConfig:
+    """기본 테넌트 (기존 단일 컬렉션 설정과 같은 경로 사용)"""
+    return TenantConfig(
+        tenant_id=Config.DEFAULT_TENANT,
+        collection_name=Config.COLLECTION_NAME,
+        embedding_model=Config.EMBEDDING_MODEL,
+        keyword_index_path=Config.KEYWORD_INDEX_PATH,
+        version_path=Config.COLLECTION_VERSION_PATH,
+        manifest_path=Config.INGEST_MANIFEST_PATH,
+        checkpoint_path=Config.INGEST_CHECKPOINT_PATH,
+        cache_dir=Config.QUERY_CACHE_DIR,
+        parent_store_path=Config.PARENT_STORE_PATH
+    )
+
+
+def _tenant_from_settings(tenant_id: str, settings: dict) -> TenantConfig:
+    """TENANTS_FILE 항목 → 테넌트 설정 (색인/매니페스트는 CHROMA_DB_PATH/tenants/<ID>/ 아래)"""
+    if not TENANT_ID_PATTERN.fullmatch(tenant_id):
+        raise ValueError(f"잘못된 테넌트 ID: {tenant_id!r} (영문/숫자/_/-, 63자 이내)")
+    data_dir = os.path.join(Config.CHROMA_DB_PATH, "tenants", tenant_id)
+    return TenantConfig(
+        tenant_id=tenant_id,
+        collection_name=settings.get("collection", f"{tenant_id}_documents"),
+        embedding_model=settings.get("embedding_model", Config.EMBEDDING_MODEL),
+        keyword_index_path=os.path.join(data_dir, "keyword_index.json"),
+        version_path=os.path.join(data_dir, "collection_version"),
+        manifest_path=os.path.join(data_dir, "ingest_manifest.json"),
+        checkpoint_path=os.path.join(data_dir, "ingest_checkpoint.json"),
+        cache_dir=os.path.join(Config.QUERY_CACHE_DIR, tenant_id) if Config.QUERY_CACHE_DIR else "",
+        parent_store_path=os.path.join(data_dir, "parent_chunks.jsonl")
+    )
+
+
+def load_tenants(path: str = None) -> Dict[str, TenantConfig]:
+    """기본 테넌트 + TENANTS_FILE에 정의된 테넌트
+
+    TENANTS_FILE 형식: {"테넌트 ID": {"collection": "컬렉션 이름", "embedding_model": "모델 이름"}, ...}
+    """
+    tenants = {Config.DEFAULT_TENANT: default_tenant()}
+    path = path or Config.TENANTS_FILE
+    if not path:
+        return tenants
+    with open(path, "r", encoding="utf-8") as f:
+        for tenant_id, settings in json.load(f).items():
+            if tenant_id == Config.DEFAULT_TENANT:
+                logger.warning(f"[경고] 기본 테넌트({tenant_id}) 설정은 TENANTS_FILE에서 바꿀 수 없습니다 - 무시")
+                continue
+            tenants[tenant_id] = _tenant_from_settings(tenant_id, settings or {})
+    return tenants
+
+
+@dataclass
+class TenantServices:
+    """로딩된 테넌트의 벡터 스토어 / RAG 서비스"""
+    config: TenantConfig
+    vector_store: "VectorStoreManager"
+    rag_service: "RAGService"
+    last_used: float = field(default_factory=time.monotonic)
+    pins: int = 0  # 수집 작업 등 언로드하면 안 되는 사용자 수
+
+
+class TenantManager:
+    """테넌트별 벡터 스토어 / RAG 서비스를 처음 요청될 때 로딩하고, 오래 안 쓴 테넌트부터 언로드
+
+    - 기본 테넌트는 서버 시작 시 로딩된 서비스를 그대로 사용하며 언로드하지 않습니다.
+    - 같은 임베딩 모델을 쓰는 테넌트는 모델 하나를 공유하고, 쓰는 테넌트가 없어지면 모델도 해제합니다.
+    - LLM / 재정렬 모델 / 스레드 풀 / 동시성 제한은 기본 테넌트의 RAG 서비스와 공유합니다.
+    - 수집 작업 중인 테넌트(acquire)는 언로드하지 않습니다.
+    """
+
+    def __init__(self, embedding_service, vector_store, rag_service, tenants: Dict[str, TenantConfig] = None):
+        self.tenants = tenants or load_tenants()
+        self.default_id = vector_store.tenant.tenant_id
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._loaded: "OrderedDict[str, TenantServices]" = OrderedDict()
+        self._loaded[self.default_id] = TenantServices(vector_store.tenant, vector_store, rag_service)
+        self._embedding_services = {embedding_service.model_name: embedding_service}
+        self._stop = threading.Event()
+        if len(self.tenants) > 1:
+            logger.info(f"[테넌트] {len(self.tenants)}개 테넌트 등록 (동시 로딩 최대 {Config.MAX_LOADED_TENANTS}개)")
+            if Config.TENANT_IDLE_TIMEOUT > 0:
+                threading.Thread(target=self._idle_loop, name="tenant-idle", daemon=True).start()
+
+    @property
+    def default(self) -> TenantServices:
+        return self._loaded[self.default_id]
+
+    def _config(self, tenant_id: Optional[str]) -> TenantConfig:
+        config = self.tenants.get(tenant_id or self.default_id)
+        if config is None:
+            raise UnknownTenantError(tenant_id)
+        return config
+
+    def get_loaded(self, tenant_id: Optional[str] = None) -> Optional[TenantServices]:
+        """이미 로딩된 테넌트 (로딩되지 않았으면 None, 블로킹 없음)"""
+        config = self._config(tenant_id)
+        with self._lock:
+            services = self._loaded.get(config.tenant_id)
+            if services is not None:
+                self._loaded.move_to_end(config.tenant_id)
+                services.last_used = time.monotonic()
+            return services
+
+    def get(self, tenant_id: Optional[str] = None) -> TenantServices:
+        """테넌트 서비스 반환 (처음이면 로딩, 모델 로딩이 있으므로 이벤트 루프 밖에서 호출)"""
+        services = self.get_loaded(tenant_id)
+        if services is not None:
+            return services
+
+        config = self._config(tenant_id)
+        with self._lock:
+            load_lock = self._load_locks.setdefault(config.tenant_id, threading.Lock())
+        with load_lock:
+            # 기다리는 동안 다른 요청이 로딩을 끝냈으면 그대로 사용
+            services = self.get_loaded(config.tenant_id)
+            if services is not None:
+                return services
+            services = self._load(config)
+            with self._lock:
+                self._loaded[config.tenant_id] = services
+                evicted = self._select_evictions(keep=config.tenant_id)
+        for reason, unloaded in evicted:
+            self._unload(unloaded, reason)
+        return services
+
+    def _idle_loop(self):
+        """유휴 테넌트 주기적 언로드 (다른 테넌트 로딩이 없어도 메모리 반환)"""
+        interval = min(60, Config.TENANT_IDLE_TIMEOUT)
+        while not self._stop.wait(interval):
+            with self._lock:
+                evicted = self._select_evictions(keep=self.default_id)
+            for reason, unloaded in evicted:
+                self._unload(unloaded, reason)
+
+    @contextmanager
+    def acquire(self, tenant_id: Optional[str] = None) -> Iterator[TenantServices]:
+        """사용하는 동안 언로드되지 않도록 고정 (수집 작업용)"""
+        services = self.get(tenant_id)
+        with self._lock:
+            services.pins += 1
+        try:
+            yield services
+        finally:
+            with self._lock:
+                services.pins -= 1
+                services.last_used = time.monotonic()
+
+    def loaded(self) -> List[TenantServices]:
+        with self._lock:
+            return list(self._loaded.values())
+
+    def _embedding_service(self, model_name: str):
+        """임베딩 모델 (같은 모델을 쓰는 테넌트끼리 공유)"""
+        from src.embeddings import EmbeddingService
+
+        with self._lock:
+            service = self._embedding_services.get(model_name)
+        if service is None:
+            service = EmbeddingService(model_name)
+            with self._lock:
+                service = self._embedding_services.setdefault(model_name, service)
+        return service
+
+    def _load(self, config: TenantConfig) -> TenantServices:
+        from src.rag_service import RAGService
+        from src.vector_store import VectorStoreManager
+
+        started = time.perf_counter()
+        logger.info(f"[테넌트] 로딩 중: {config.tenant_id} (컬렉션: {config.collection_name}, 모델: {config.embedding_model})")
+        vector_store = VectorStoreManager(self._embedding_service(config.embedding_model), tenant=config)
+        rag_service = RAGService(vector_store, shared_with=self.default.rag_service)
+        metrics.inc("rag_tenant_loads_total")
+        logger.info(f"[테넌트] 로딩 완료: {config.tenant_id} ({(time.perf_counter() - started) * 1000:.0f}ms)")
+        return TenantServices(config, vector_store, rag_service)
+
+    def _select_evictions(self, keep: str) -> List[tuple]:
+        """언로드할 테넌트 선택 (호출자가 _lock 보유): 유휴 시간 초과 → 개수 초과 시 오래 안 쓴 순서
+
+        기본 테넌트, 고정된 테넌트, 방금 로딩한 테넌트(keep)는 제외합니다.
+        """
+        now = time.monotonic()
+        evicted = []
+        for tenant_id, services in list(self._loaded.items()):
+            if tenant_id in (self.default_id, keep) or services.pins:
+                continue
+            if Config.TENANT_IDLE_TIMEOUT > 0 and now - services.last_used > Config.TENANT_IDLE_TIMEOUT:
+                evicted.append(("idle", self._loaded.pop(tenant_id)))
+        for tenant_id, services in list(self._loaded.items()):
+            if len(self._loaded) <= Config.MAX_LOADED_TENANTS:
+                break
+            if tenant_id in (self.default_id, keep) or services.pins:
+                continue
+            evicted.append(("capacity", self._loaded.pop(tenant_id)))
+        return evicted
+
+    def _unload(self, services: TenantServices, reason: str):
+        """테넌트 언로드: 캐시 저장 후 참조 해제 (처리 중인 질의는 가진 참조로 끝까지 실행)"""
+        services.rag_service.close()
+        with self._lock:
+            in_use = {loaded.vector_store.embedding_service.model_name for loaded in self._loaded.values()}
+            for model_name in [name for name in self._embedding_services if name not in in_use]:
+                del self._embedding_services[model_name]
+                logger.info(f"[테넌트] 사용하지 않는 임베딩 모델 해제: {model_name}")
+        metrics.inc("rag_tenant_unloads_total", reason=reason)
+        logger.info(f"[테넌트] 언로드: {services.config.tenant_id} (사유: {reason})")
+
+    def describe(self) -> List[dict]:
+        """등록된 테넌트 목록과 로딩 상태"""
+        with self._lock:
+            loaded = dict(self._loaded)
+        now = time.monotonic()
+        return [
+            {
+                "tenant": tenant_id,
+                "collection_name": config.collection_name,
+                "embedding_model": config.embedding_model,
+                "loaded": tenant_id in loaded,
+                "idle_seconds": round(now - loaded[tenant_id].last_used, 1) if tenant_id in loaded else None,
+            }
+            for tenant_id, config in self.tenants.items()
+        ]
+
+    def close(self):
+        """유휴 언로드 중지 및 기본 테넌트를 제외한 로딩된 테넌트의 캐시 저장"""
+        self._stop.set()
+        for services in self.loaded():
+            if services.config.tenant_id != self.default_id:
+                services.rag_service.close()
@@ -0,0 +1,461 @@
+"""벡터 저장소 백엔드 (ChromaDB / 메모리 매핑 NumPy 행렬)
+
+VectorStoreManager는 아래 메서드만 사용하므로 Config.VECTOR_BACKEND로 백엔드를 바꿀 수 있습니다.
+    count / get / upsert / delete / query / reset
+query / get 결과는 ChromaDB 컬렉션과 같은 형식(dict of lists)입니다.
+"""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+import numpy as np
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def create_backend(tenant, embedding_service):
+    """Config.VECTOR_BACKEND에 따라 테넌트 컬렉션의 백엔드 생성"""
+    if Config.VECTOR_BACKEND == "numpy":
+        return NumpyBackend(os.path.join(Config.NUMPY_INDEX_DIR, tenant.collection_name))
+    if Config.VECTOR_BACKEND != "chroma":
+        raise ValueError(f"지원하지 않는 VECTOR_BACKEND: {Config.VECTOR_BACKEND} (chroma | numpy)")
+    return ChromaBackend(tenant.collection_name, embedding_service)
+
+
+class ChromaBackend:
+    """ChromaDB 컬렉션 (기본 백엔드)"""
+
+    name = "chroma"
+
+    def __init__(self, collection_name: str, embedding_service):
+        self.collection_name = collection_name
+        self.embedding_service = embedding_service
+        self.store = None  # langchain Chroma (지연 import)
+        self._open()
+
+    def _open(self):
+        from langchain_community.vectorstores import Chroma
+
+        logger.info(f"[DB] ChromaDB 초기화 중: {Config.CHROMA_DB_PATH} (컬렉션: {self.collection_name})")
+        self.store = Chroma(
+            collection_name=self.collection_name,
+            embedding_function=self.embedding_service.get_embeddings(),
+            persist_directory=Config.CHROMA_DB_PATH
+        )
+
+    def count(self) -> int:
+        return self.store._collection.count()
+
+    def get(self, ids: Optional[List[str]] = None, include: Sequence[str] = (),
+            limit: Optional[int] = None, offset: Optional[int] = None) -> dict:
+        return self.store._collection.get(ids=ids, include=list(include), limit=limit, offset=offset)
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str], metadatas: List[dict]):
+        self.store._collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def delete(self, ids: List[str]):
+        self.store.delete(ids=ids)
+
+    def query(self, query_embeddings: List[List[float]], n_results: int, where: Optional[dict] = None) -> dict:
+        return self.store._collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where=where,
+            include=['documents', 'metadatas', 'distances']
+        )
+
+    def reset(self):
+        """컬렉션 삭제 후 빈 컬렉션으로 다시 생성"""
+        self.store.delete_collection()
+        self._open()
+
+
+class _IndexState:
+    """NumPy 인덱스의 읽기 전용 스냅샷 (검색은 시작 시점의 스냅샷을 끝까지 사용)"""
+
+    def __init__(self, meta: dict, previous: Optional["_IndexState"] = None):
+        self.generation = meta.get("generation", 0)
+        self.count = meta.get("count", 0)
+        self.dim = meta.get("dim", 0)
+        self.dead = meta.get("dead", 0)
+        self.vocab: Dict[str, List[str]] = meta.get("vocab", {})
+        self.vectors = np.zeros((0, self.dim), dtype=np.float32)
+        self.alive = np.zeros(0, dtype=np.uint8)
+        self.ends = np.zeros(0, dtype=np.int64)
+        self.records = np.zeros(0, dtype=np.uint8)
+        self.codes: Dict[str, np.ndarray] = {}
+        # 행 번호 → 청크 ID, 청크 ID → 마지막으로 저장된 행 (추가만 되므로 이전 스냅샷 것을 이어서 사용)
+        if previous is not None and previous.generation == self.generation:
+            self.ids, self.row_of, self.ids_bytes = previous.ids, previous.row_of, previous.ids_bytes
+        else:
+            self.ids, self.row_of, self.ids_bytes = [], {}, 0
+
+    @property
+    def records_size(self) -> int:
+        return int(self.ends[self.count - 1]) if self.count else 0
+
+    def record(self, row: int) -> tuple:
+        """행의 (본문, 메타데이터)"""
+        start = int(self.ends[row - 1]) if row else 0
+        document, metadata = json.loads(self.records[start:int(self.ends[row])].tobytes().decode("utf-8"))
+        return document, metadata
+
+    def alive_rows(self) -> np.ndarray:
+        return np.flatnonzero(self.alive[:self.count])
+
+
+class NumpyBackend:
+    """메모리 매핑 NumPy 행렬 백엔드 (정규화된 임베딩 + 내적으로 정확한 top-k)
+
+    컬렉션 디렉토리 구성 (세대 번호 g는 압축할 때마다 증가):
+        meta.json         행 수 / 차원 / 삭제된 행 수 / 필터 필드 값 목록
+        vectors.g         (행 수, 차원) float32 행렬, 행마다 L2 정규화
+        alive.g           행 생존 여부 uint8 (삭제는 제자리에서 0으로 표시)
+        ends.g            레코드 끝 위치 int64
+        records.g         행마다 [본문, 메타데이터] JSON (UTF-8)
+        ids.g             행마다 청크 ID 한 줄
+        codes.<필드>.g    필터 필드(FILTER_FIELDS) 값 번호 int32 (-1은 값 없음)
+
+    모든 파일은 추가만 하고(삭제는 alive 표시) meta.json을 마지막에 교체하므로, 다른 프로세스는
+    meta.json이 바뀌었을 때 늘어난 부분만 다시 매핑합니다. 파일은 읽기 전용 mmap으로 열어서
+    여러 uvicorn 워커가 각자 복사본을 두지 않고 OS 페이지 캐시를 공유합니다.
+    쓰기(수집)는 한 번에 한 프로세스만 해야 합니다.
+    """
+
+    name = "numpy"
+    FILTER_FIELDS = ("source_file", "file_type", "department", "relative_path")
+    COMPACT_MIN_DEAD = 1000  # 삭제된 행이 이 수 이상이고
+    COMPACT_RATIO = 0.3      # 전체의 이 비율을 넘으면 압축
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.meta_path = self.directory / "meta.json"
+        self._lock = threading.Lock()  # 쓰기 / 다시 매핑 직렬화
+        self._meta_signature = None
+        self._state = _IndexState({})
+        self._refresh()
+        logger.info(f"[DB] NumPy 인덱스 로딩: {self.directory} ({self._state.count}행, {self._state.dim}차원)")
+
+    # ---- 읽기 ----
+
+    def _path(self, kind: str, generation: int) -> Path:
+        return self.directory / f"{kind}.{generation}"
+
+    def _map(self, kind: str, generation: int, dtype, shape) -> np.ndarray:
+        if not int(np.prod(shape)):
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self._path(kind, generation), dtype=dtype, mode="r", shape=shape)
+
+    def _refresh(self) -> _IndexState:
+        """meta.json이 바뀌었으면 다시 매핑 (다른 프로세스의 수집 반영), 현재 스냅샷 반환"""
+        signature = self._signature()
+        if signature is None or signature == self._meta_signature:
+            return self._state
+        with self._lock:
+            return self._refresh_locked()
+
+    def _signature(self) -> Optional[tuple]:
+        try:
+            stat = self.meta_path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _refresh_locked(self) -> _IndexState:
+        """_refresh와 같지만 호출자가 _lock 보유 (쓰기 전 최신 상태 확인용)"""
+        signature = self._signature()
+        if signature is not None and signature != self._meta_signature:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            self._state = self._load(meta, self._state)
+            self._meta_signature = signature
+        return self._state
+
+    def _load(self, meta: dict, previous: _IndexState) -> _IndexState:
+        state = _IndexState(meta, previous)
+        g, n = state.generation, state.count
+        state.vectors = self._map("vectors", g, np.float32, (n, state.dim))
+        state.alive = self._map("alive", g, np.uint8, (n,))
+        state.ends = self._map("ends", g, np.int64, (n,))
+        state.records = self._map("records", g, np.uint8, (state.records_size,))
+        for field in self.FILTER_FIELDS:
+            state.codes[field] = self._map(f"codes.{field}", g, np.int32, (n,))
+        # 청크 ID는 이전에 읽은 뒤로 추가된 줄만 읽음
+        if meta.get("ids_bytes", 0) > state.ids_bytes:
+            with open(self._path("ids", g), "rb") as f:
+                f.seek(state.ids_bytes)
+                tail = f.read(meta["ids_bytes"] - state.ids_bytes).decode("utf-8")
+            for chunk_id in tail.splitlines():
+                state.row_of[chunk_id] = len(state.ids)
+                state.ids.append(chunk_id)
+            state.ids_bytes = meta["ids_bytes"]
+        return state
+
+    def count(self) -> int:
+        state = self._refresh()
+        return int(np.count_nonzero(state.alive[:state.count]))
+
+    def get(self, ids: Optional[List[str]] = None, include: Sequence[str] = (),
+            limit: Optional[int] = None, offset: Optional[int] = None) -> dict:
+        state = self._refresh()
+        if ids is None:
+            rows = state.alive_rows()
+        else:
+            rows = [state.row_of[i] for i in ids if i in state.row_of and state.alive[state.row_of[i]]]
+        start = offset or 0
+        rows = list(rows)[start:start + limit] if limit is not None else list(rows)[start:]
+        return self._rows_result(state, rows, include)
+
+    def _rows_result(self, state: _IndexState, rows: Iterable[int], include: Sequence[str]) -> dict:
+        rows = [int(row) for row in rows]
+        result = {"ids": [state.ids[row] for row in rows]}
+        if "documents" in include or "metadatas" in include:
+            records = [state.record(row) for row in rows]
+            if "documents" in include:
+                result["documents"] = [document for document, _ in records]
+            if "metadatas" in include:
+                result["metadatas"] = [metadata for _, metadata in records]
+        if "embeddings" in include:
+            result["embeddings"] = state.vectors[rows].tolist() if rows else []
+        return result
+
+    def _where_mask(self, state: _IndexState, where: dict) -> np.ndarray:
+        """ChromaDB where 절($and / $or / $in / $eq) → 행 마스크"""
+        n = state.count
+        if "$and" in where:
+            mask = np.ones(n, dtype=bool)
+            for condition in where["$and"]:
+                mask &= self._where_mask(state, condition)
+            return mask
+        if "$or" in where:
+            mask = np.zeros(n, dtype=bool)
+            for condition in where["$or"]:
+                mask |= self._where_mask(state, condition)
+            return mask
+        mask = np.ones(n, dtype=bool)
+        for field, condition in where.items():
+            if isinstance(condition, dict):
+                values = condition.get("$in", [condition["$eq"]] if "$eq" in condition else None)
+                if values is None:
+                    raise ValueError(f"NumPy 백엔드가 지원하지 않는 조건: {condition}")
+            else:
+                values = [condition]
+            if field in state.codes:
+                vocab = {value: code for code, value in enumerate(state.vocab.get(field, []))}
+                codes = [vocab[value] for value in values if value in vocab]
+                mask &= np.isin(state.codes[field], codes)
+            else:
+                # 색인하지 않은 필드는 레코드를 직접 확인 (느림)
+                wanted = set(values)
+                mask &= np.fromiter(
+                    (state.record(row)[1].get(field) in wanted for row in range(n)), dtype=bool, count=n
+                )
+        return mask
+
+    def query(self, query_embeddings: List[List[float]], n_results: int, where: Optional[dict] = None) -> dict:
+        """정확한 top-k 검색 (질의 여러 개를 행렬 곱 한 번으로 처리, 거리 = 1 - 코사인 유사도)"""
+        state = self._refresh()
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+        empty = {"ids": [[] for _ in queries], "documents": [[] for _ in queries],
+                 "metadatas": [[] for _ in queries], "distances": [[] for _ in queries]}
+        if not state.count or not len(queries):
+            return empty
+        queries /= np.clip(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12, None)
+
+        mask = state.alive[:state.count].astype(bool)
+        if where:
+            mask &= self._where_mask(state, where)
+        candidates = np.flatnonzero(mask)
+        k = min(n_results, len(candidates))
+        if k <= 0:
+            return empty
+        if len(candidates) < state.count // 2:
+            # 필터로 많이 줄었으면 해당 행만 모아서 계산
+            scores = state.vectors[candidates] @ queries.T
+        else:
+            scores = state.vectors @ queries.T
+            scores[~mask] = -np.inf
+            candidates = None
+        # 열(질의)마다 상위 k개만 골라서 정렬
+        top = np.argpartition(-scores, k - 1, axis=0)[:k]
+        top_scores = np.take_along_axis(scores, top, axis=0)
+        order = np.argsort(-top_scores, axis=0, kind="stable")
+        top = np.take_along_axis(top, order, axis=0)
+        top_scores = np.take_along_axis(top_scores, order, axis=0)
+
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for column in range(len(queries)):
+            rows = top[:, column] if candidates is None else candidates[top[:, column]]
+            rows_result = self._rows_result(state, rows, ("documents", "metadatas"))
+            for key in ("ids", "documents", "metadatas"):
+                result[key].append(rows_result[key])
+            result["distances"].append((1.0 - top_scores[:, column]).tolist())
+        return result
+
+    # ---- 쓰기 ----
+
+    def _write_meta(self, meta: dict):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.meta_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, self.meta_path)
+
+    def _meta(self, state: _IndexState, **changes) -> dict:
+        meta = {
+            "generation": state.generation,
+            "count": state.count,
+            "dim": state.dim,
+            "dead": state.dead,
+            "ids_bytes": state.ids_bytes,
+            "vocab": state.vocab,
+        }
+        meta.update(changes)
+        return meta
+
+    def _mark_dead(self, state: _IndexState, rows: List[int]):
+        """행 삭제 표시 (다른 프로세스의 매핑에도 바로 보임)"""
+        alive = np.memmap(self._path("alive", state.generation), dtype=np.uint8, mode="r+", shape=(state.count,))
+        alive[rows] = 0
+        alive.flush()
+        del alive
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str], metadatas: List[dict]):
+        """행 추가 (이미 있는 ID는 이전 행을 삭제 표시하고 새 행으로 추가)"""
+        if not ids:
+            return
+        if len(set(ids)) != len(ids):
+            # 같은 배치에 중복된 ID는 마지막 것만 저장
+            keep = sorted({chunk_id: i for i, chunk_id in enumerate(ids)}.values())
+            ids, embeddings, documents, metadatas = (
+                [column[i] for i in keep] for column in (ids, embeddings, documents, metadatas)
+            )
+        with self._lock:
+            state = self._refresh_locked()
+            vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+            if state.dim and vectors.shape[1] != state.dim:
+                raise ValueError(f"임베딩 차원 불일치: 인덱스 {state.dim}, 입력 {vectors.shape[1]}")
+            vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+            replaced = [state.row_of[i] for i in ids if i in state.row_of and state.alive[state.row_of[i]]]
+            records = [json.dumps([document, metadata or {}], ensure_ascii=False).encode("utf-8")
+                       for document, metadata in zip(documents, metadatas)]
+            ends = state.records_size + np.cumsum([len(record) for record in records], dtype=np.int64)
+            vocab = {field: list(state.vocab.get(field, [])) for field in self.FILTER_FIELDS}
+            codes = {}
+            for field in self.FILTER_FIELDS:
+                lookup = {value: code for code, value in enumerate(vocab[field])}
+                field_codes = []
+                for metadata in metadatas:
+                    value = (metadata or {}).get(field)
+                    if value is None:
+                        field_codes.append(-1)
+                        continue
+                    if value not in lookup:
+                        lookup[value] = len(vocab[field])
+                        vocab[field].append(value)
+                    field_codes.append(lookup[value])
+                codes[field] = np.asarray(field_codes, dtype=np.int32)
+            id_lines = "".join(f"{chunk_id}\n" for chunk_id in ids).encode("utf-8")
+
+            self.directory.mkdir(parents=True, exist_ok=True)
+            g = state.generation
+            for kind, data in (
+                ("vectors", vectors.tobytes()),
+                ("alive", np.ones(len(ids), dtype=np.uint8).tobytes()),
+                ("ends", ends.tobytes()),
+                ("records", b"".join(records)),
+                ("ids", id_lines),
+                *((f"codes.{field}", codes[field].tobytes()) for field in self.FILTER_FIELDS),
+            ):
+                with open(self._path(kind, g), "ab") as f:
+                    # 중단된 이전 쓰기의 남은 부분은 덮어씀
+                    f.truncate(self._file_size(kind, state))
+                    f.write(data)
+            if replaced:
+                self._mark_dead(state, replaced)
+            self._write_meta(self._meta(
+                state,
+                count=state.count + len(ids),
+                dim=vectors.shape[1],
+                dead=state.dead + len(replaced),
+                ids_bytes=state.ids_bytes + len(id_lines),
+                vocab=vocab
+            ))
+        self._refresh()
+
+    def _file_size(self, kind: str, state: _IndexState) -> int:
+        """meta.json 기준 파일의 유효한 길이"""
+        if kind == "records":
+            return state.records_size
+        if kind == "ids":
+            return state.ids_bytes
+        item_size = {"vectors": 4 * state.dim, "alive": 1, "ends": 8}.get(kind, 4)
+        return state.count * item_size
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            state = self._refresh_locked()
+            rows = sorted({state.row_of[i] for i in ids if i in state.row_of and state.alive[state.row_of[i]]})
+            if not rows:
+                return
+            self._mark_dead(state, rows)
+            dead = state.dead + len(rows)
+            self._write_meta(self._meta(state, dead=dead))
+            state = self._refresh_locked()
+        if dead >= self.COMPACT_MIN_DEAD and dead > state.count * self.COMPACT_RATIO:
+            self.compact()
+
+    def compact(self):
+        """살아 있는 행만 새 세대 파일로 다시 써서 삭제된 행 공간 회수"""
+        with self._lock:
+            state = self._refresh_locked()
+            rows = state.alive_rows()
+            g = state.generation + 1
+            logger.info(f"[DB] NumPy 인덱스 압축: {state.count}행 → {len(rows)}행")
+            self.directory.mkdir(parents=True, exist_ok=True)
+            records = [json.dumps(list(state.record(row)), ensure_ascii=False).encode("utf-8") for row in rows]
+            id_lines = "".join(f"{state.ids[row]}\n" for row in rows).encode("utf-8")
+            vocab = {}
+            files = {
+                "vectors": np.ascontiguousarray(state.vectors[rows]).tobytes(),
+                "alive": np.ones(len(rows), dtype=np.uint8).tobytes(),
+                "ends": np.cumsum([len(record) for record in records], dtype=np.int64).tobytes(),
+                "records": b"".join(records),
+                "ids": id_lines,
+            }
+            for field in self.FILTER_FIELDS:
+                # 더 이상 쓰이지 않는 값은 목록에서 제거하고 번호를 다시 매김
+                old_codes = np.asarray(state.codes[field][rows])
+                used = sorted(set(old_codes.tolist()) - {-1})
+                remap = np.full(len(state.vocab.get(field, [])) + 1, -1, dtype=np.int32)
+                remap[used] = np.arange(len(used), dtype=np.int32)
+                vocab[field] = [state.vocab[field][code] for code in used]
+                files[f"codes.{field}"] = remap[old_codes].astype(np.int32).tobytes()
+            for kind, data in files.items():
+                with open(self._path(kind, g), "wb") as f:
+                    f.write(data)
+            self._write_meta({"generation": g, "count": len(rows), "dim": state.dim, "dead": 0,
+                              "ids_bytes": len(id_lines), "vocab": vocab})
+            # 이전 세대 파일 삭제 (다른 프로세스가 매핑 중이어도 POSIX에서는 매핑이 유지됨)
+            self._remove_generation(state.generation)
+        self._refresh()
+
+    def _remove_generation(self, generation: int):
+        for path in self.directory.glob(f"*.{generation}"):
+            try:
+                path.unlink()
+            except OSError as e:
+                logger.warning(f"[경고] 이전 인덱스 파일 삭제 실패: {path} ({e})")
+
+    def reset(self):
+        """인덱스 전체 삭제"""
+        with self._lock:
+            generation = self._refresh_locked().generation
+            self._write_meta(self._meta(_IndexState({}), generation=generation + 1))
+            self._remove_generation(generation)
+        self._refresh()
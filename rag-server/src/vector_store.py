@@ -1,66 +1,335 @@
-from typing import List, Optional
-from langchain_community.vectorstores import Chroma
+import asyncio
+import logging
+import os
+import threading
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple
 from langchain_core.documents import Document
 from src.config import Config
 from src.embeddings import EmbeddingService
+from src.keyword_index import KeywordIndex
+from src.parent_store import ParentStore
+from src.ingest_writer import IngestWriter
+from src.cache import LRUCache, VersionCounter, normalize_query
+from src.search_filter import SearchFilter
+from src.tenants import TenantConfig, default_tenant
+from src.vector_backends import create_backend
+from src.telemetry import run_in_executor, stage
+
+logger = logging.getLogger(__name__)
 
 class VectorStoreManager:
-    """ChromaDB 벡터 스토어 관리자"""
+    """벡터 스토어 관리자 (테넌트 하나 = 컬렉션 하나, 저장소는 Config.VECTOR_BACKEND)"""
     
-    def __init__(self):
-        self.embedding_service = EmbeddingService()
-        self.vector_store: Optional[Chroma] = None
+    def __init__(self, embedding_service: EmbeddingService = None, tenant: TenantConfig = None):
+        self.tenant = tenant or default_tenant()
+        self.embedding_service = embedding_service or EmbeddingService(self.tenant.embedding_model)
+        self.backend = None  # ChromaBackend | NumpyBackend
+        self.keyword_index = KeywordIndex(self.tenant.keyword_index_path)
+        # 조문 단위 부모 청크 (CHUNK_STRATEGY=article로 수집한 경우, 검색 결과를 조문 전체로 확장)
+        self.parent_store = ParentStore(self.tenant.parent_store_path or Config.PARENT_STORE_PATH)
+        # 컬렉션이 바뀔 때마다 증가 → 검색 결과 캐시 무효화 기준
+        self.version = VersionCounter(self.tenant.version_path)
+        # 질의 임베딩은 컬렉션과 무관하므로 버전 없이 캐시
+        self.query_embedding_cache = LRUCache(
+            "query_embedding",
+            Config.QUERY_CACHE_SIZE,
+            Config.QUERY_CACHE_TTL,
+            os.path.join(self.tenant.cache_dir, "query_embedding.pkl") if self.tenant.cache_dir else None
+        )
+        # 수집 작업 중 새로 저장된 청크는 커밋 전까지 검색에서 숨김 (원자적 반영)
+        self._staging = False
+        self._hidden_ids: frozenset = frozenset()
+        self._staged_keyword: List[tuple] = []  # 커밋 시 키워드 색인에 반영할 (ids, texts, metadatas)
+        self._staging_lock = threading.Lock()
+        # 청크 수 캐시 (count()는 블로킹이므로 컬렉션 버전이 바뀔 때만 다시 조회)
+        self._count = 0
+        self._count_version: Optional[int] = None
+        # 수집된 파일 경로 목록 캐시 (경로 접두사 필터용, 컬렉션 버전이 바뀔 때만 다시 계산)
+        self._paths: Tuple[Optional[int], List[str]] = (None, [])
         self._initialize_store()
     
     def _initialize_store(self):
         """벡터 스토어 초기화 (기존 DB 로드 또는 신규 생성)"""
-        print(f"[DB] ChromaDB 초기화 중: {Config.CHROMA_DB_PATH}")
-        self.vector_store = Chroma(
-            collection_name=Config.COLLECTION_NAME,
-            embedding_function=self.embedding_service.get_embeddings(),
-            persist_directory=Config.CHROMA_DB_PATH
-        )
+        self.backend = create_backend(self.tenant, self.embedding_service)
         
         # 기존 문서 수 확인
         try:
-            count = self.vector_store._collection.count()
-            print(f"[완료] ChromaDB 로딩 완료 (저장된 문서: {count}개)")
+            count = self.backend.count()
+            logger.info(f"[완료] 벡터 스토어 로딩 완료 ({self.backend.name}, 저장된 문서: {count}개)")
         except:
-            print("[완료] ChromaDB 초기화 완료 (신규)")
+            logger.info(f"[완료] 벡터 스토어 초기화 완료 ({self.backend.name}, 신규)")
+            return
+        
+        # 키워드 색인이 없거나 (기존 DB / 수집 중단) 청크 수가 다르면 저장된 청크로 색인 재생성
+        if count != len(self.keyword_index):
+            self.rebuild_keyword_index()
     
-    def add_documents(self, documents: List[Document]) -> List[str]:
-        """문서를 벡터 스토어에 추가"""
+    def rebuild_keyword_index(self):
+        """벡터 스토어에 저장된 전체 청크로 키워드 색인 재생성"""
+        logger.info("[키워드] 키워드 색인 생성 중...")
+        results = self.backend.get(include=['documents', 'metadatas'])
+        self.keyword_index.clear()
+        self.keyword_index.add(results['ids'], results['documents'], results['metadatas'])
+        self.keyword_index.save()
+        logger.info(f"[완료] 키워드 색인 생성 완료 ({len(self.keyword_index)}개 청크)")
+    
+    def add_documents(self, documents: List[Document], save_index: bool = True) -> List[str]:
+        """문서를 배치 단위로 임베딩하여 벡터 스토어와 키워드 색인에 추가 (Document.id가 있으면 해당 ID로 upsert)"""
         if not documents:
-            print("[경고] 추가할 문서가 없습니다.")
+            logger.warning("[경고] 추가할 문서가 없습니다.")
             return []
         
-        print(f"[저장] {len(documents)}개 문서를 벡터 스토어에 저장 중...")
-        ids = self.vector_store.add_documents(documents)
-        print(f"[완료] 저장 완료 (IDs: {len(ids)}개)")
+        logger.info(f"[저장] {len(documents)}개 문서를 벡터 스토어에 저장 중...")
+        for doc in documents:
+            doc.id = doc.id or str(uuid.uuid4())
+        ids = IngestWriter(self).write_documents(documents)
+        if save_index:
+            self.keyword_index.save()
+        logger.info(f"[완료] 저장 완료 (IDs: {len(ids)}개)")
         return ids
     
-    def similarity_search(self, query: str, k: int = None) -> List[Document]:
-        """유사도 검색"""
+    def upsert_embeddings(self, ids: List[str], embeddings: List[List[float]], texts: List[str], metadatas: List[dict]):
+        """미리 계산된 임베딩으로 청크 저장 (키워드 색인은 메모리에만 반영, 저장은 호출자가 수행)"""
+        if self._staging:
+            # 새 청크는 커밋 전까지 검색에서 숨김 (같은 ID = 같은 내용이므로 기존 청크는 그대로 노출)
+            existing = set(self.backend.get(ids=ids)['ids'])
+            self._hidden_ids = self._hidden_ids | frozenset(i for i in ids if i not in existing)
+        # 부모 원문은 벡터 스토어 메타데이터가 아닌 부모 저장소에 저장
+        metadatas = self.parent_store.extract(metadatas)
+        self.backend.upsert(ids, embeddings, texts, metadatas)
+        if self._staging:
+            self._staged_keyword.append((ids, texts, metadatas))
+            return
+        self.keyword_index.add(ids, texts, metadatas)
+        self.version.bump()
+    
+    def begin_staging(self):
+        """수집 작업 시작: 이후 저장되는 새 청크는 commit_staging 전까지 검색에서 제외"""
+        with self._staging_lock:
+            self._staging = True
+            self._hidden_ids = frozenset()
+            self._staged_keyword = []
+    
+    def commit_staging(self, stale_ids: List[str]):
+        """수집 작업 커밋: 숨겨 둔 청크를 공개하고 교체/삭제된 청크를 제거"""
+        with self._staging_lock:
+            for ids, texts, metadatas in self._staged_keyword:
+                self.keyword_index.add(ids, texts, metadatas)
+            if stale_ids:
+                logger.info(f"[삭제] {len(stale_ids)}개 청크 삭제 중...")
+                self.backend.delete(stale_ids)
+                self.keyword_index.delete(stale_ids)
+                self._delete_parents(stale_ids)
+            self._staged_keyword = []
+            self._hidden_ids = frozenset()
+            self._staging = False
+            self.keyword_index.save()
+            self.version.bump()
+    
+    def discard_staged(self, keep_ids: Iterable[str]):
+        """keep_ids를 제외한 커밋 전 청크 삭제 (취소된 작업에서 일부만 저장된 파일)"""
+        with self._staging_lock:
+            discard = self._hidden_ids - set(keep_ids)
+            if not discard:
+                return
+            logger.info(f"[취소] 미완료 파일의 청크 {len(discard)}개 삭제")
+            self.backend.delete(list(discard))
+            staged = []
+            for ids, texts, metadatas in self._staged_keyword:
+                rows = [row for row in zip(ids, texts, metadatas) if row[0] not in discard]
+                if rows:
+                    staged.append(tuple(list(column) for column in zip(*rows)))
+            self._staged_keyword = staged
+            self._hidden_ids = self._hidden_ids - discard
+            self._delete_parents(discard, live_ids=self._hidden_ids)
+    
+    def all_ids(self) -> List[str]:
+        """저장된 전체 청크 ID"""
+        return self.backend.get()['ids']
+    
+    def delete_documents(self, ids: List[str], save_index: bool = True):
+        """청크 ID로 벡터 스토어와 키워드 색인에서 삭제"""
+        if not ids:
+            return
+        logger.info(f"[삭제] {len(ids)}개 청크 삭제 중...")
+        self.backend.delete(ids)
+        self.keyword_index.delete(ids)
+        self._delete_parents(ids)
+        self.version.bump()
+        if save_index:
+            self.keyword_index.save()
+    
+    def _delete_parents(self, deleted_ids: Iterable[str], live_ids: Iterable[str] = ()):
+        """삭제된 청크의 부모 청크 삭제 (같은 파일의 청크가 남아 있으면 유지)"""
+        if not len(self.parent_store):
+            return
+        self.parent_store.delete_for_chunks(deleted_ids, live_ids=[*self.keyword_index.ids(), *live_ids])
+    
+    def expand_to_parents(self, docs: List[Document], k: int) -> List[Document]:
+        """자식 청크 검색 결과를 부모 청크(조문 전체)로 바꾸고 같은 부모는 한 번만 포함 (순위는 가장 높은 자식 기준)"""
+        if not len(self.parent_store):
+            return docs[:k]
+        results: List[Document] = []
+        positions: Dict[str, int] = {}  # 부모 ID -> results 위치
+        for doc in docs:
+            parent_id = doc.metadata.get('parent_id')
+            if parent_id in positions:
+                results[positions[parent_id]].metadata['matched_chunks'] += 1
+                continue
+            if len(results) >= k:
+                continue
+            parent = self.parent_store.get(parent_id) if parent_id else None
+            if parent is None:
+                # 기존 방식으로 수집된 청크 / 부모가 없는 청크는 그대로 사용
+                results.append(doc)
+                continue
+            parent.metadata.update({'parent_id': parent_id, 'matched_chunks': 1})
+            positions[parent_id] = len(results)
+            results.append(parent)
+        return results
+    
+    def embed_query(self, query: str) -> List[float]:
+        """질의 임베딩 (정규화된 질문 기준 캐시)"""
+        key = normalize_query(query)
+        embedding = self.query_embedding_cache.get(key)
+        if embedding is None:
+            with stage("embed"):
+                embedding = self.embedding_service.embed_query(query)
+            self.query_embedding_cache.set(key, embedding)
+        return embedding
+    
+    async def aembed_query(self, query: str, executor=None) -> List[float]:
+        """embed_query의 비동기 버전 (마이크로 배치 결과를 스레드를 점유하지 않고 대기)"""
+        key = normalize_query(query)
+        embedding = self.query_embedding_cache.get(key)
+        if embedding is not None:
+            return embedding
+        with stage("embed"):
+            future = self.embedding_service.submit_query(query)
+            if future is None:
+                embedding = await run_in_executor(executor, self.embedding_service.embed_query, query)
+            else:
+                embedding = await asyncio.wrap_future(future)
+        self.query_embedding_cache.set(key, embedding)
+        return embedding
+    
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """질의 여러 개 임베딩 (캐시에 없는 질문만 모아 인코더 한 번 호출, 같은 질문은 한 번만 계산)"""
+        keys = [normalize_query(query) for query in queries]
+        embeddings = [self.query_embedding_cache.get(key) for key in keys]
+        missing: Dict[str, str] = {}
+        for key, query, embedding in zip(keys, queries, embeddings):
+            if embedding is None:
+                missing.setdefault(key, query)
+        if not missing:
+            return embeddings
+        # 두 임베딩 백엔드 모두 질의/문서 인코딩이 같으므로 embed_documents로 한 번에 계산
+        with stage("embed"):
+            vectors = self.embedding_service.get_embeddings().embed_documents(list(missing.values()))
+        computed = dict(zip(missing, vectors))
+        for key, vector in computed.items():
+            self.query_embedding_cache.set(key, vector)
+        return [embedding if embedding is not None else computed[key] for key, embedding in zip(keys, embeddings)]
+    
+    def _relative_paths(self) -> List[str]:
+        """수집된 파일의 상대 경로 목록 (정렬, 컬렉션 버전이 같으면 캐시된 값)"""
+        version = self.version.current()
+        cached_version, paths = self._paths
+        if cached_version != version:
+            paths = sorted(self.keyword_index.metadata_values('relative_path'))
+            self._paths = (version, paths)
+        return paths
+    
+    def _where_clause(self, search_filter: Optional[SearchFilter]) -> Tuple[Optional[dict], bool]:
+        """검색 필터 → ChromaDB where 절 (경로 접두사에 해당하는 파일이 없으면 검색할 필요 없음)"""
+        if search_filter is None:
+            return None, True
+        prefix_paths = None
+        if search_filter.path_prefix:
+            prefix_paths = [path for path in self._relative_paths() if path.startswith(search_filter.path_prefix)]
+            if not prefix_paths:
+                return None, False
+        return search_filter.to_where(prefix_paths), True
+    
+    def similarity_search(self, query: str, k: int = None, search_filter: Optional[SearchFilter] = None) -> List[Document]:
+        """유사도 검색 (결과 Document.id에 청크 ID 포함, 필터는 벡터 스토어 where 절로 적용)"""
+        where, searchable = self._where_clause(search_filter)
+        if not searchable:
+            return []
+        return self._search_by_vectors([self.embed_query(query)], k, where)[0]
+    
+    def similarity_search_by_vectors(
+        self,
+        query_embeddings: List[List[float]],
+        k: int = None,
+        search_filter: Optional[SearchFilter] = None
+    ) -> List[List[Document]]:
+        """질의 임베딩 여러 개를 한 번에 검색 (질의 순서대로 결과 목록 반환)"""
+        where, searchable = self._where_clause(search_filter)
+        if not searchable:
+            return [[] for _ in query_embeddings]
+        return self._search_by_vectors(query_embeddings, k, where)
+    
+    def _search_by_vectors(self, query_embeddings: List[List[float]], k: Optional[int], where: Optional[dict]) -> List[List[Document]]:
+        """where 절이 계산된 벡터 검색"""
+        k = k or Config.TOP_K_RESULTS
+        if not query_embeddings:
+            return []
+        # 커밋 전 청크가 있으면 그만큼 더 가져와서 제외
+        hidden = self._hidden_ids
+        with stage("vector_search"):
+            results = self.backend.query(query_embeddings, k + min(len(hidden), 4 * k), where)
+        batches = [
+            [
+                Document(page_content=text, metadata=metadata or {}, id=chunk_id)
+                for chunk_id, text, metadata in zip(ids, documents, metadatas)
+                if chunk_id not in hidden
+            ][:k]
+            for ids, documents, metadatas in zip(results['ids'], results['documents'], results['metadatas'])
+        ]
+        logger.debug(f"[검색] 검색 완료: {[len(docs) for docs in batches]}개 관련 문서 발견")
+        return batches
+    
+    def keyword_search(self, query: str, k: int = None, search_filter: Optional[SearchFilter] = None) -> List[Document]:
+        """BM25 키워드 검색 (필터 조건을 만족하는 청크만 채점)"""
         k = k or Config.TOP_K_RESULTS
-        results = self.vector_store.similarity_search(query, k=k)
-        print(f"[검색] 검색 완료: {len(results)}개 관련 문서 발견")
+        metadata_filter = search_filter.matches if search_filter else None
+        with stage("keyword_search"):
+            results = [doc for doc, score in self.keyword_index.search(query, k, metadata_filter)]
+        logger.debug(f"[키워드] BM25 검색 완료: {len(results)}개 관련 문서 발견")
         return results
     
     def clear_database(self):
         """벡터 스토어 초기화 (모든 문서 삭제)"""
-        print("[초기화] 벡터 스토어 초기화 중...")
-        self.vector_store.delete_collection()
-        self._initialize_store()
-        print("[완료] 초기화 완료")
+        logger.info("[초기화] 벡터 스토어 초기화 중...")
+        self.backend.reset()
+        self.keyword_index.clear()
+        self.parent_store.clear()
+        self.version.bump()
+        logger.info("[완료] 초기화 완료")
+    
+    def document_count(self) -> int:
+        """저장된 청크 수 (컬렉션 버전이 같으면 캐시된 값)"""
+        version = self.version.current()
+        if version != self._count_version:
+            self._count = self.backend.count()
+            self._count_version = version
+        return self._count
     
     def get_stats(self) -> dict:
         """벡터 스토어 통계"""
         try:
-            count = self.vector_store._collection.count()
+            count = self.document_count()
             return {
                 "total_documents": count,
-                "collection_name": Config.COLLECTION_NAME,
-                "embedding_model": Config.EMBEDDING_MODEL
+                "keyword_index_documents": len(self.keyword_index),
+                "parent_chunks": len(self.parent_store),
+                "departments": sorted(self.keyword_index.metadata_values('department')),
+                "tenant": self.tenant.tenant_id,
+                "collection_name": self.tenant.collection_name,
+                "embedding_model": self.embedding_service.model_name,
+                "vector_backend": self.backend.name
             }
         except Exception as e:
             return {"error": str(e)}
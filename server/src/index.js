@@ -27,6 +27,29 @@ const systemPrompt =
 // RAG 서버 설정
 const RAG_SERVER_URL = process.env.RAG_SERVER_URL || 'http://localhost:8000';
 const USE_RAG = process.env.USE_RAG === 'true'; // RAG 사용 여부
+const RAG_STREAM = process.env.RAG_STREAM !== 'false'; // RAG 스트리밍 응답 사용 여부
+const RAG_TENANT = process.env.RAG_TENANT || ''; // RAG 서버 테넌트 ID (비어 있으면 기본 테넌트)
+const RAG_SESSIONS = process.env.RAG_SESSIONS !== 'false'; // RAG 서버 측 대화 세션 사용 여부 (history는 세션이 없을 때 시드로만 사용)
+const ragHeaders = {
+  'Content-Type': 'application/json',
+  ...(RAG_TENANT && { 'X-Tenant-ID': RAG_TENANT })
+};
+
+// RAG 서버 스트리밍 응답(NDJSON)을 한 줄씩 파싱하여 이벤트로 전달
+const readRagStream = async (body, onEvent) => {
+  const decoder = new TextDecoder();
+  let buffer = '';
+  for await (const chunk of body) {
+    buffer += decoder.decode(chunk, { stream: true });
+    let newlineIndex;
+    while ((newlineIndex = buffer.indexOf('\n')) >= 0) {
+      const line = buffer.slice(0, newlineIndex).trim();
+      buffer = buffer.slice(newlineIndex + 1);
+      if (line) onEvent(JSON.parse(line));
+    }
+  }
+  if (buffer.trim()) onEvent(JSON.parse(buffer));
+};
 
 const app = express();
 app.use(cors());
@@ -71,18 +94,25 @@ io.on('connection', (socket) => {
       if (USE_RAG) {
         console.log('[RAG] RAG 서버로 질의 전송:', message.content);
         
-        // 대화 히스토리를 RAG 서버로 전달 (시스템 프롬프트 제외)
-        const conversationHistory = history
-          .filter(msg => msg.role !== 'system')
-          .map(msg => ({ role: msg.role, content: msg.content }));
+        // 대화 히스토리 전체를 전달 (시스템 프롬프트 제외)
+        // 세션 사용 시 RAG 서버는 보관 중인 대화를 쓰고, history는 세션이 없을 때
+        // (서버 재시작 / TTL 만료 / 메모리 상한 제거) 새 세션을 채우는 데만 사용
+        const conversation = {
+          history: history
+            .filter(msg => msg.role !== 'system')
+            .map(msg => ({ role: msg.role, content: msg.content })),
+          ...(RAG_SESSIONS && { session_id: socket.id })
+        };
         
         // RAG 서버에 질의
-        const ragResponse = await fetch(`${RAG_SERVER_URL}/query`, {
+        const ragResponse = await fetch(`${RAG_SERVER_URL}${RAG_STREAM ? '/query/stream' : '/query'}`, {
           method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
+          headers: ragHeaders,
           body: JSON.stringify({ 
             question: message.content,
-            history: conversationHistory
+            ...conversation,
+            // 검색 범위 필터 (파일/형식/경로/부서, 클라이언트가 지정한 경우만)
+            ...(message.filters && { filters: message.filters })
           })
         });
 
@@ -92,7 +122,26 @@ io.on('connection', (socket) => {
           throw new Error(`RAG 서버 오류: ${ragResponse.status} - ${errorText}`);
         }
 
-        const ragResult = await ragResponse.json();
+        let ragResult;
+        if (RAG_STREAM) {
+          // 출처 → 토큰 → 완료 순서로 도착하는 이벤트를 Socket.IO로 바로 전달
+          ragResult = { answer: '', sources: [] };
+          await readRagStream(ragResponse.body, (event) => {
+            if (event.type === 'sources') {
+              ragResult.sources = event.sources;
+              socket.emit('assistantSources', { sources: event.sources });
+            } else if (event.type === 'token') {
+              ragResult.answer += event.content;
+              socket.emit('assistantToken', { content: event.content });
+            } else if (event.type === 'done') {
+              console.log('[RAG] 스트리밍 완료:', event.timings);
+            } else if (event.type === 'error') {
+              throw new Error(event.message);
+            }
+          });
+        } else {
+          ragResult = await ragResponse.json();
+        }
         responseContent = ragResult.answer;
 
         // 출처 정보가 있으면 추가
@@ -129,6 +178,11 @@ io.on('connection', (socket) => {
 
   socket.on('disconnect', () => {
     conversationStore.delete(socket.id);
+    if (USE_RAG && RAG_SESSIONS) {
+      // RAG 서버 세션도 정리 (실패해도 TTL로 만료됨)
+      fetch(`${RAG_SERVER_URL}/sessions/${encodeURIComponent(socket.id)}`, { method: 'DELETE', headers: ragHeaders })
+        .catch((error) => console.warn('[경고] RAG 세션 삭제 실패:', error?.message));
+    }
   });
 });
 